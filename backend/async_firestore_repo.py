@@ -0,0 +1,189 @@
+"""
+Async variants of the firestore_repo read paths, built on the Firestore
+AsyncClient (or local_store.AsyncLocalClient for the memory/sqlite backends).
+
+Conversion, cursor and cache handling are shared with firestore_repo, so both
+implementations return identical data. Only reads have async variants:
+loan, document, profile and payment writes stay on the sync client in
+firestore_repo (they run in transactions/batches and are a small share of the
+traffic), and their endpoints run in Starlette's threadpool in either mode.
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from firebase import init_firebase_async
+import firestore_repo
+from firestore_repo import (
+    _build_loan_query, _check_rebuilt, _loan_page, _loan_snapshot_to_dict, _dashboard_summary,
+    _document_snapshot_to_dict, _profile_snapshot_to_dict, _notice_snapshot_to_dict,
+    _due_filters, _payment_page, _payments_query, _search_candidates_query, _search_read_fields, _search_result,
+)
+import search_index
+from metrics import firestore_op
+from portfolio_cache import loan_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _user_col(uid: str, name: str):
+    db = init_firebase_async()
+    return db.collection('users').document(uid).collection(name)
+
+
+async def _collect(stream) -> List[Any]:
+    return [snapshot async for snapshot in stream]
+
+
+@firestore_op("read")
+async def get_loans_for_user(uid: str) -> List[Dict[str, Any]]:
+    """Get all loans for a specific user"""
+    try:
+        cached = loan_cache.get(uid)
+        if cached is not None:
+            return cached
+        generation = loan_cache.generation(uid)
+
+        out = []
+        async for d in _user_col(uid, 'loans').stream():
+            converted_data = _loan_snapshot_to_dict(d)
+            if converted_data:
+                out.append(converted_data)
+
+        logger.info(f"Retrieved {len(out)} loans for user {uid}")
+        loan_cache.put(uid, out, generation)
+        return out
+    except Exception as e:
+        logger.error(f"Error getting loans for user {uid}: {e}")
+        return []
+
+
+@firestore_op("read")
+async def get_loan_for_user(uid: str, loan_id: str, fields: List[str] = None) -> Dict[str, Any]:
+    """Async firestore_repo.get_loan_for_user"""
+    snapshot = await _user_col(uid, 'loans').document(loan_id).get(field_paths=fields)
+    if not snapshot.exists:
+        return None
+    return _loan_snapshot_to_dict(snapshot, fields)
+
+
+@firestore_op("read")
+async def query_loans_for_user(uid: str, limit: int = 50, cursor: str = None, status: str = None,
+                               loan_type: str = None, order_by: str = None,
+                               fields: List[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """Async firestore_repo.query_loans_for_user"""
+    query, order_field = _build_loan_query(_user_col(uid, 'loans'), cursor, status, loan_type, order_by, fields)
+    if limit is not None:
+        # Fetch one extra document to learn whether another page exists
+        query = query.limit(limit + 1)
+    docs = await _collect(query.stream())
+    out, next_cursor = _loan_page(docs, limit, fields, order_field)
+    logger.info(f"Retrieved page of {len(out)} loans for user {uid}")
+    return out, next_cursor
+
+
+@firestore_op("read")
+async def query_due_loans_for_user(uid: str, date_from: str = None, date_to: str = None, overdue: bool = False,
+                                   limit: int = 50, cursor: str = None,
+                                   fields: List[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """Async firestore_repo.query_due_loans_for_user"""
+    query, order_field = _build_loan_query(_user_col(uid, 'loans'), cursor, order_by='nextDueDate', fields=fields,
+                                           filters=_due_filters(date_from, date_to, overdue))
+    docs = await _collect(query.limit(limit + 1).stream())
+    out, next_cursor = _loan_page(docs, limit, fields, order_field)
+    logger.info(f"Retrieved page of {len(out)} due loans for user {uid}")
+    return out, next_cursor
+
+
+@firestore_op("read")
+async def search_loans_for_user(uid: str, q: str, limit: int = 20,
+                                fields: List[str] = None) -> List[Dict[str, Any]]:
+    """Async firestore_repo.search_loans_for_user"""
+    lookup = search_index.query_token(q)
+    if lookup is None:
+        return []
+    col = _user_col(uid, 'loans')
+    read_fields = _search_read_fields(fields)
+
+    async def count(token):
+        query = col.where(search_index.TOKENS_FIELD, 'array_contains', token)
+        return (await query.count().get())[0][0].value
+
+    async def candidates(token):
+        docs = await _collect(_search_candidates_query(col, token, read_fields).stream())
+        return [loan for loan in (_loan_snapshot_to_dict(d, read_fields) for d in docs) if loan]
+
+    token, kind = lookup
+    out = search_index.rank(await candidates(token), q, limit)
+    if not out and kind == 'name':
+        words = search_index.word_tokens(q)
+        if words:
+            counts = [await count(word) for word in words]
+            rarest = words[counts.index(min(counts))]
+            out = search_index.rank(await candidates(rarest), q, limit)
+    if not out and kind == 'name':
+        trigram = search_index.trigram_token(q)
+        if trigram:
+            out = search_index.rank(await candidates(trigram), q, limit)
+    out = _search_result(out, fields)
+    logger.info(f"Search matched {len(out)} loans for user {uid}")
+    return out
+
+
+@firestore_op("read")
+async def get_payments_for_loan(uid: str, loan_id: str, limit: int = 50,
+                                cursor: str = None) -> Tuple[List[Dict[str, Any]], str]:
+    """Async firestore_repo.get_payments_for_loan"""
+    col = _user_col(uid, 'loans').document(loan_id).collection('payments')
+    docs = await _collect(_payments_query(col, limit, cursor).stream())
+    out, next_cursor = _payment_page(docs, limit)
+    logger.info(f"Retrieved {len(out)} payments for loan {loan_id} of user {uid}")
+    return out, next_cursor
+
+
+@firestore_op("read")
+async def get_dashboard_summary_for_user(uid: str) -> Dict[str, Any]:
+    """Read the materialized aggregates (never scans the loans)"""
+    snapshot = await _user_col(uid, 'stats').document('dashboard').get()
+    data = (snapshot.to_dict() if snapshot.exists else None) or {}
+    _check_rebuilt(uid, data)
+    return _dashboard_summary(data)
+
+
+@firestore_op("read")
+async def get_documents_for_user(uid: str, loan_id: str) -> List[Dict[str, Any]]:
+    """Get all documents for a specific loan"""
+    try:
+        q = _user_col(uid, 'documents').where('loan_id', '==', loan_id).stream()
+        out = [doc for doc in map(_document_snapshot_to_dict, await _collect(q)) if doc]
+        logger.info(f"Retrieved {len(out)} documents for loan {loan_id} of user {uid}")
+        return out
+    except Exception as e:
+        logger.error(f"Error getting documents for loan {loan_id} of user {uid}: {e}")
+        return []
+
+
+@firestore_op("read")
+async def get_profile_for_loan(uid: str, loan_id: str) -> Dict[str, Any]:
+    """Get profile for a specific loan"""
+    try:
+        q = _user_col(uid, 'profiles').where('loan_id', '==', str(loan_id)).limit(1).stream()
+        profiles = [profile for profile in map(_profile_snapshot_to_dict, await _collect(q)) if profile]
+        logger.info(f"Retrieved {len(profiles)} profiles for loan {loan_id}")
+        return profiles[0] if profiles else None
+    except Exception as e:
+        logger.error(f"Error getting profile for loan {loan_id} of user {uid}: {e}")
+        return None
+
+
+@firestore_op("read")
+async def get_notices_for_user(uid: str) -> List[Dict[str, Any]]:
+    """Get all notices for a user"""
+    try:
+        q = _user_col(uid, 'notices').stream()
+        out = [notice for notice in map(_notice_snapshot_to_dict, await _collect(q)) if notice]
+        logger.info(f"Retrieved {len(out)} notices for user {uid}")
+        return out
+    except Exception as e:
+        logger.error(f"Error getting notices for user {uid}: {e}")
+        return []
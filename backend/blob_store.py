@@ -0,0 +1,204 @@
+"""
+Content-addressed storage for document files and profile photos.
+
+Firestore records only keep the SHA-256 of the bytes plus their size and
+MIME type; the bytes live in a blob store. LocalBlobStore keeps them on the
+filesystem under SAVKAR_BLOB_DIR (default: backend/blobs), sharded by the
+first two byte pairs of the hash. Identical uploads are stored once.
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import unquote_to_bytes
+
+CHUNK_SIZE = 64 * 1024
+BLOB_URL_PREFIX = "/blobs/"
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def parse_data_url(content: str) -> Tuple[str, bytes]:
+    """Split a data URL (or plain text) into (mime_type, raw bytes)"""
+    if not content.startswith('data:'):
+        return 'text/plain', content.encode('utf-8')
+    header, _, payload = content.partition(',')
+    meta = header[len('data:'):].split(';')
+    mime_type = meta[0] or 'text/plain'
+    if 'base64' in meta[1:]:
+        try:
+            return mime_type, base64.b64decode(payload)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 payload in data URL: {e}")
+    return mime_type, unquote_to_bytes(payload)
+
+
+# Leading bytes of the formats users upload, for serving /blobs/<hash>
+_MAGIC_NUMBERS = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+
+def sniff_mime_type(head: bytes) -> str:
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class LocalBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if not _DIGEST_RE.match(digest):
+            raise BlobNotFound(digest)
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data: bytes) -> str:
+        """Store bytes and return their SHA-256 hex digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def exists(self, digest: str) -> bool:
+        try:
+            return os.path.exists(self._path(digest))
+        except BlobNotFound:
+            return False
+
+    def size(self, digest: str) -> int:
+        try:
+            return os.path.getsize(self._path(digest))
+        except OSError:
+            raise BlobNotFound(digest)
+
+    def local_path(self, digest: str) -> str:
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise BlobNotFound(digest)
+        return path
+
+    def iter_chunks(self, digest: str, start: int = 0, end: Optional[int] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive; end=None reads to EOF) in chunks"""
+        with open(self.local_path(digest), 'rb') as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def read_head(self, digest: str, length: int = 16) -> bytes:
+        with open(self.local_path(digest), 'rb') as f:
+            return f.read(length)
+
+    def delete(self, digest: str):
+        try:
+            os.remove(self._path(digest))
+        except (OSError, BlobNotFound):
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> LocalBlobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                root = os.getenv("SAVKAR_BLOB_DIR") or os.path.join(os.path.dirname(__file__), 'blobs')
+                _store = LocalBlobStore(root)
+    return _store
+
+
+def reset_blob_store():
+    """Forget the configured store so the next get_blob_store() re-reads SAVKAR_BLOB_DIR"""
+    global _store
+    _store = None
+
+
+def store_content(content: str) -> Dict[str, Any]:
+    """Move a data URL into the blob store, returning hash, size and MIME type"""
+    mime_type, data = parse_data_url(content)
+    digest = get_blob_store().put(data)
+    return {'hash': digest, 'size': len(data), 'mime_type': mime_type}
+
+
+def blob_url(digest: str) -> str:
+    return f"{BLOB_URL_PREFIX}{digest}"
+
+
+def digest_from_url(value: str) -> Optional[str]:
+    if isinstance(value, str) and value.startswith(BLOB_URL_PREFIX):
+        digest = value[len(BLOB_URL_PREFIX):]
+        if _DIGEST_RE.match(digest):
+            return digest
+    return None
+
+
+def externalize_photo(data: Dict[str, Any]):
+    """Replace an inline profile_photo in data with profile_photo_hash/size/mime.
+
+    profile_photo itself is written as None so a legacy inline photo is
+    dropped from the document on the next write.
+    """
+    if 'profile_photo' not in data:
+        return
+    photo = data['profile_photo']
+    data['profile_photo'] = None
+    digest = digest_from_url(photo)
+    if digest:
+        # Unchanged photo sent back by the client as its /blobs/ URL
+        data['profile_photo_hash'] = digest
+        return
+    if not photo:
+        data['profile_photo_hash'] = None
+        data['profile_photo_size'] = None
+        data['profile_photo_mime'] = None
+        return
+    stored = store_content(photo)
+    data['profile_photo_hash'] = stored['hash']
+    data['profile_photo_size'] = stored['size']
+    data['profile_photo_mime'] = stored['mime_type']
+
+
+def inline_photo_url(data: Dict[str, Any]):
+    """Expose a stored photo hash as profile_photo = /blobs/<hash> for API responses"""
+    digest = data.get('profile_photo_hash')
+    if digest:
+        data['profile_photo'] = blob_url(digest)
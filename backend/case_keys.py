@@ -0,0 +1,86 @@
+"""
+snake_case <-> camelCase key conversion shared by the models (alias
+generation) and the repository (stored documents -> API dicts).
+
+Keys are looked up in plain dicts: the fields of the registered schemas are
+converted once at import time, and any other key is converted on first use
+and remembered, up to MAX_CACHED_KEYS entries per direction. Converting a
+document is then one dict lookup per key instead of splitting and
+re-capitalizing (or running two regexes over) every key of every document.
+"""
+
+import re
+from typing import Any, Dict
+
+MAX_CACHED_KEYS = 4096
+
+_CAMEL_BOUNDARY_RE = re.compile(r'(.)([A-Z][a-z]+)')
+_LOWER_UPPER_RE = re.compile(r'([a-z0-9])([A-Z])')
+
+_camel: Dict[str, str] = {}
+_snake: Dict[str, str] = {}
+
+
+def _remember(cache: Dict[str, str], key: str, value: str) -> str:
+    if len(cache) < MAX_CACHED_KEYS:
+        cache[key] = value
+    return value
+
+
+def to_camel(snake_str: str) -> str:
+    """first_name -> firstName"""
+    cached = _camel.get(snake_str)
+    if cached is not None:
+        return cached
+    components = snake_str.split('_')
+    # We capitalize the first letter of each component except the first one
+    # with the 'title' method and join them together.
+    return _remember(_camel, snake_str, components[0] + ''.join(x.title() for x in components[1:]))
+
+
+def to_snake(name: str) -> str:
+    """firstName -> first_name"""
+    cached = _snake.get(name)
+    if cached is not None:
+        return cached
+    s1 = _CAMEL_BOUNDARY_RE.sub(r'\1_\2', name)
+    return _remember(_snake, name, _LOWER_UPPER_RE.sub(r'\1_\2', s1).lower())
+
+
+def register(*models) -> None:
+    """Precompute the key maps of pydantic models' fields (both directions)"""
+    for model in models:
+        for name in model.model_fields:
+            camel = to_camel(name)
+            _camel[name] = camel
+            _snake[camel] = name
+            _snake[name] = name
+
+
+def camel_keys(data: Any, deep: bool = True) -> Any:
+    """Copy of data with camelCase keys; deep also converts nested dicts and
+    dicts inside lists (a top-level list converts each item)"""
+    if not data:
+        return data
+    if isinstance(data, list):
+        return [camel_keys(item, deep) for item in data]
+    if not isinstance(data, dict):
+        return data
+    get = _camel.get
+    if not deep:
+        return {get(key) or to_camel(key): value for key, value in data.items()}
+    converted = {}
+    for key, value in data.items():
+        camel_key = get(key) or to_camel(key)
+        if isinstance(value, dict):
+            value = camel_keys(value)
+        elif isinstance(value, list):
+            value = [camel_keys(item) if isinstance(item, dict) else item for item in value]
+        converted[camel_key] = value
+    return converted
+
+
+def snake_keys(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a dict with snake_case keys (top level only)"""
+    get = _snake.get
+    return {get(key) or to_snake(key): value for key, value in data.items()}
@@ -0,0 +1,144 @@
+"""
+Conditional and ranged file responses for document and blob downloads.
+
+build_file_response() answers If-None-Match / If-Modified-Since with 304,
+serves a single "bytes=" Range with 206 (honouring If-Range), and otherwise
+streams the whole file. Content is produced by an `open_range(start, end)`
+callable yielding chunks, so only one chunk is held in memory at a time.
+"""
+
+import base64
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# Multiple of 3 bytes so every base64 slice decodes on a 4-character boundary
+DECODE_CHUNK_BYTES = 48 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range "bytes=" header into inclusive (start, end).
+
+    Returns None when the header is absent, malformed or asks for several
+    ranges (the whole file is served then), and raises RangeNotSatisfiable
+    when the range lies outside the file.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+    first, _, last = spec.partition('-')
+    try:
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def base64_decoded_size(encoded: str) -> int:
+    padding = len(encoded) - len(encoded.rstrip('='))
+    return len(encoded) // 4 * 3 - padding
+
+
+def iter_base64_range(encoded: str, start: int, end: int,
+                      chunk_bytes: int = DECODE_CHUNK_BYTES) -> Iterator[bytes]:
+    """Decode bytes start..end (inclusive) of a base64 string chunk by chunk"""
+    position = start - start % 3
+    while position <= end:
+        char_start = position // 3 * 4
+        char_end = char_start + chunk_bytes // 3 * 4
+        decoded = base64.b64decode(encoded[char_start:char_end])
+        if not decoded:
+            break
+        lo = start - position if position < start else 0
+        hi = end - position + 1
+        yield decoded[lo:hi]
+        position += len(decoded)
+
+
+def strong_etag(value: str) -> str:
+    return f'"{value}"'
+
+
+def content_etag(text: str) -> str:
+    return strong_etag(hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def _not_modified_since(header: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def build_file_response(request: Request, size: int, media_type: str, etag: str,
+                        open_range: Callable[[int, int], Iterator[bytes]],
+                        last_modified: Optional[datetime] = None,
+                        headers: Optional[Dict[str, str]] = None) -> Response:
+    base_headers = dict(headers or {})
+    base_headers['ETag'] = etag
+    base_headers['Accept-Ranges'] = 'bytes'
+    if last_modified is not None:
+        base_headers['Last-Modified'] = http_date(last_modified)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=base_headers)
+    elif _not_modified_since(request.headers.get('if-modified-since', ''), last_modified):
+        return Response(status_code=304, headers=base_headers)
+
+    byte_range = None
+    if_range = request.headers.get('if-range')
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get('range'), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**base_headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        if size == 0:
+            return Response(content=b'', media_type=media_type, headers=base_headers)
+        base_headers['Content-Length'] = str(size)
+        return StreamingResponse(open_range(0, size - 1), media_type=media_type, headers=base_headers)
+
+    start, end = byte_range
+    base_headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    base_headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(open_range(start, end), status_code=206, media_type=media_type, headers=base_headers)
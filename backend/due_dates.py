@@ -0,0 +1,66 @@
+"""
+Next due date and days overdue of a loan, stored on the loan document so
+due/overdue lists are an indexed range query instead of a client-side scan.
+
+Instalments fall monthly on the start date's day of month (a loan started
+on the last day of a month is due on the last day of every month, as in
+Dashboard.jsx). paid_amount // emi instalments count as paid; the next one
+is due next, and once the term is over the balance is due on end_date.
+Closed or fully paid loans have no due date.
+"""
+
+import calendar
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def instalment_date(start: date, months: int) -> date:
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    month += 1
+    last_day = calendar.monthrange(year, month)[1]
+    if start.day == calendar.monthrange(start.year, start.month)[1]:
+        return date(year, month, last_day)
+    return date(year, month, min(start.day, last_day))
+
+
+def next_due_date(loan: Dict[str, Any]) -> Optional[date]:
+    status = loan.get('status')
+    if getattr(status, 'value', status) == 'Closed':
+        return None
+    start = _parse_date(loan.get('start_date'))
+    if start is None:
+        return None
+    total = float(loan.get('total_loan') or 0)
+    paid = float(loan.get('paid_amount') or 0)
+    if total > 0 and paid >= total:
+        return None
+
+    emi = float(loan.get('emi') or 0)
+    paid_instalments = int(paid // emi) if emi > 0 else 0
+    due = instalment_date(start, paid_instalments + 1)
+    end = _parse_date(loan.get('end_date'))
+    if end is not None and end >= start and due > end:
+        return end
+    return due
+
+
+def due_fields(loan: Dict[str, Any], today: date = None) -> Dict[str, Any]:
+    """next_due_date (ISO string or None) and days_overdue to store on the loan"""
+    today = today or datetime.utcnow().date()
+    due = next_due_date(loan)
+    return {
+        'next_due_date': due.isoformat() if due else None,
+        'days_overdue': max((today - due).days, 0) if due else 0,
+    }
@@ -1,20 +1,72 @@
 import os
 import json
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-except Exception:
-    # firebase-admin not installed; initialization will fail at runtime if used
-    firebase_admin = None
-    credentials = None
-    firestore = None
+import logging
+import threading
+
+import tracing
+
+logger = logging.getLogger(__name__)
 
 _firebase_app = None
 _db = None
+# Serializes initialization; the startup thread and the first request may race
+_init_lock = threading.RLock()
+
+# Storage backend: "firestore" (default), "memory" or "sqlite"
+STORAGE_BACKEND_ENV = "SAVKAR_STORAGE_BACKEND"
+SQLITE_PATH_ENV = "SAVKAR_SQLITE_PATH"
+
+def get_storage_backend():
+    return os.getenv(STORAGE_BACKEND_ENV, "firestore").strip().lower()
+
+def _import_firebase_admin():
+    """firebase_admin (with google-auth and the Firestore client) is imported on
+    first use, not at module import, so workers start without paying for it"""
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+    except Exception:
+        # firebase-admin not installed
+        raise RuntimeError("firebase-admin package is not installed. Please install firebase-admin.")
+    return firebase_admin, credentials, firestore
+
+def reset_firebase():
+    """Forget the cached app/client so the next init_firebase() re-reads the config"""
+    global _firebase_app, _db, _async_db
+    with _init_lock:
+        _firebase_app = None
+        _db = None
+        _async_db = None
+
+def is_initialized() -> bool:
+    return _db is not None
+
+_async_db = None
+
+def init_firebase_async():
+    """Return an AsyncClient for the configured storage backend.
+    Shares the app (and, for local backends, the data) with init_firebase()."""
+    global _async_db
+    if _async_db is not None:
+        return _async_db
+    with _init_lock:
+        if _async_db is not None:
+            return _async_db
+        app, db = init_firebase()
+        if get_storage_backend() in ("memory", "sqlite"):
+            import local_store
+            _async_db = local_store.AsyncLocalClient(db)
+        else:
+            from firebase_admin import firestore_async
+            _async_db = firestore_async.client(app=app)
+            tracing.instrument_firestore_client(_async_db)
+        return _async_db
 
 def init_firebase():
     """Initialize firebase-admin and Firestore client. Uses
     GOOGLE_APPLICATION_CREDENTIALS or FIREBASE_SERVICE_ACCOUNT_JSON env vars.
+    When SAVKAR_STORAGE_BACKEND is "memory" or "sqlite" a local client from
+    local_store is returned instead.
     Returns (app, db).
     """
     global _firebase_app, _db
@@ -22,9 +74,21 @@ def init_firebase():
     # Return existing app if already initialized
     if _firebase_app and _db:
         return _firebase_app, _db
+    with _init_lock:
+        if _firebase_app and _db:
+            return _firebase_app, _db
+        return _init_firebase()
 
-    if firebase_admin is None:
-        raise RuntimeError("firebase-admin package is not installed. Please install firebase-admin.")
+def _init_firebase():
+    global _firebase_app, _db
+    backend = get_storage_backend()
+    if backend in ("memory", "sqlite"):
+        import local_store
+        _firebase_app = local_store.LocalApp()
+        _db = local_store.create_local_client(backend, os.getenv(SQLITE_PATH_ENV))
+        return _firebase_app, _db
+
+    firebase_admin, credentials, firestore = _import_firebase_admin()
 
     # Check if any Firebase app is already initialized
     if len(firebase_admin._apps) > 0:
@@ -32,6 +96,7 @@ def init_firebase():
         try:
             _firebase_app = firebase_admin.get_app()  # Gets the default app
             _db = firestore.client(app=_firebase_app)  # Explicitly pass the app
+            tracing.instrument_firestore_client(_db)
             return _firebase_app, _db
         except ValueError:
             # No default app exists, continue with initialization
@@ -42,17 +107,14 @@ def init_firebase():
     
     # Try to get from file first
     service_account_path = os.path.join(os.path.dirname(__file__), 'service-account.json')
-    print(f"Looking for service account file at: {service_account_path}")
-    print(f"File exists: {os.path.exists(service_account_path)}")
-    
     if os.path.exists(service_account_path):
-        print("Using service account file for authentication")
+        logger.info(f"Using service account file for authentication: {service_account_path}")
         cred = credentials.Certificate(service_account_path)
     else:
         # Try to get from environment variable
         sa_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         if sa_path and os.path.exists(sa_path):
-            print(f"Using service account from environment variable: {sa_path}")
+            logger.info(f"Using service account from environment variable: {sa_path}")
             cred = credentials.Certificate(sa_path)
         else:
             # Try to get from JSON environment variable
@@ -61,12 +123,12 @@ def init_firebase():
                 try:
                     sa_json = json.loads(sa_json_str)
                     cred = credentials.Certificate(sa_json)
-                    print("Using service account from FIREBASE_SERVICE_ACCOUNT_JSON environment variable")
+                    logger.info("Using service account from FIREBASE_SERVICE_ACCOUNT_JSON environment variable")
                 except json.JSONDecodeError:
                     raise ValueError("Failed to decode FIREBASE_SERVICE_ACCOUNT_JSON. Please check the format.")
             else:
                 # Fallback to Application Default Credentials
-                print("Using Application Default Credentials")
+                logger.info("Using Application Default Credentials")
                 cred = credentials.ApplicationDefault()
 
     options = {
@@ -76,8 +138,8 @@ def init_firebase():
     }
     
     # Initialize the app as the DEFAULT app (without a name)
-    print("Initializing Firebase app...")
     _firebase_app = firebase_admin.initialize_app(cred, options)  # No name parameter
     _db = firestore.client(app=_firebase_app)  # Explicitly pass the app
-    print("Firebase app initialized successfully")
+    tracing.instrument_firestore_client(_db)
+    logger.info("Firebase app initialized")
     return _firebase_app, _db
\ No newline at end of file
@@ -1,31 +1,50 @@
 from firebase import init_firebase
 from datetime import datetime
-from typing import Dict, Any, List
-import uuid
-from google.cloud.firestore_v1 import Transaction
+from typing import Dict, Any, List, Tuple
+import base64
+import contextvars
+import json
 import logging
-import re
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from portfolio_cache import loan_cache
+from due_dates import due_fields
+from case_keys import camel_keys, to_snake
+import search_index
+from structured_log import Redacted, configure_logging
+from metrics import firestore_op
+from blob_store import externalize_photo, inline_photo_url, store_content
 from models import (
-    LoanRecord, LoanCreate, LoanUpdate,
+    to_camel,
+    LoanRecord, LoanCreate, LoanUpdate, LoanSummary, LoanStatus,
     Document, DocumentCreate,
     LegalNotice, NoticeCreate, NoticeUpdate,
     Profile, ProfileCreate, ProfileUpdate,
-    Jamindar
+    Jamindar,
+    Payment, PaymentReceipt
 )
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Fixed user ID for the savkar
 SAVKAR_USER_ID = "savkar_user_001"
 
-# Helper functions for key conversion
-def camel_to_snake(name):
-    """Convert camelCase to snake_case"""
-    s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+# Write paths build their response from the data they just wrote (all
+# timestamps are assigned here, not by the server) instead of reading the
+# document back. Set SAVKAR_WRITE_READBACK=1 to restore the extra get().
+WRITE_READBACK = os.getenv("SAVKAR_WRITE_READBACK", "0") == "1"
+
+def _firestore():
+    """google.cloud.firestore_v1, imported on first use: it takes longer to
+    import than the rest of the API, and init_firebase() on the startup
+    thread has usually loaded it before the first request needs it."""
+    from google.cloud import firestore_v1
+    return firestore_v1
 
+# Helper functions for key conversion
 def convert_jamindar_keys(data, conversion_func):
     """Convert keys in Jamindar objects"""
     if not isinstance(data, list):
@@ -57,6 +76,10 @@ def _loans_col(uid):
         logger.error(f"Error getting loans collection: {e}")
         return None
 
+def _payments_col(uid, loan_id):
+    col = _loans_col(uid)
+    return col.document(loan_id).collection('payments') if col else None
+
 def _docs_col(uid):
     try:
         _, db = init_firebase()
@@ -90,8 +113,15 @@ def _notices_col(uid):
         logger.error(f"Error getting notices collection: {e}")
         return None
 
+# Users whose document is known to exist in this process. Reads never need
+# the parent user document, so only the first write per user pays the check.
+_known_users = set()
+_known_users_lock = threading.Lock()
+
 def ensure_user_exists(uid):
     """Create a user document if it doesn't exist"""
+    if uid in _known_users:
+        return True
     try:
         _, db = init_firebase()
         if not db:
@@ -101,50 +131,195 @@ def ensure_user_exists(uid):
         user_doc = db.collection('users').document(uid)
         if not user_doc.get().exists:
             logger.info(f"Creating user document for {uid}")
-            user_doc.set({
-                'created_at': datetime.utcnow(),
-                'uid': uid
-            })
+            summary_ref = _summary_ref(uid)
+
+            @_firestore().transactional
+            def _create_user(transaction):
+                if user_doc.get(transaction=transaction).exists:
+                    return
+                summary_exists = summary_ref.get(transaction=transaction).exists
+                transaction.set(user_doc, {
+                    'created_at': datetime.utcnow(),
+                    'uid': uid
+                })
+                if not summary_exists:
+                    # A new user has no loans, so zero aggregates are exact
+                    transaction.set(summary_ref, dict(dict.fromkeys(SUMMARY_FIELDS, 0), generation=0,
+                                                      updated_at=datetime.utcnow(), rebuilt_at=datetime.utcnow()))
+
+            _create_user(db.transaction())
+        with _known_users_lock:
+            _known_users.add(uid)
         return True
     except Exception as e:
         logger.error(f"Error ensuring user exists: {e}")
         return False
 
-def _convert_keys_to_camel_case(data: Dict[str, Any]) -> Dict[str, Any]:
-    if not data:
-        return data
-        
-    if isinstance(data, list):
-        return [_convert_keys_to_camel_case(item) for item in data]
+# Dashboard aggregates are materialized in users/{uid}/stats/dashboard and
+# adjusted with Increment transforms in the same batch/transaction as the
+# loan write, so the dashboard never has to scan the loans collection.
+# Every adjustment also increments `generation`, which lets a rebuild detect
+# loan writes that landed while it was scanning.
+SUMMARY_STATUS_FIELDS = {
+    'Active': 'active_records',
+    'Pending': 'pending_records',
+    'Closed': 'closing_records',
+}
+SUMMARY_FIELDS = ('total_loan_issued', 'recovered_amount', 'active_records', 'pending_records', 'closing_records')
+
+def _summary_ref(uid):
+    _, db = init_firebase()
+    return db.collection('users').document(uid).collection('stats').document('dashboard')
+
+def _loan_contribution(loan: Dict[str, Any]) -> Dict[str, float]:
+    """What a single stored loan adds to the dashboard aggregates"""
+    contribution = dict.fromkeys(SUMMARY_FIELDS, 0)
+    if not loan:
+        return contribution
+    contribution['total_loan_issued'] = float(loan.get('total_loan', loan.get('totalLoan')) or 0)
+    contribution['recovered_amount'] = float(loan.get('paid_amount', loan.get('paidAmount')) or 0)
+    status = loan.get('status')
+    status_field = SUMMARY_STATUS_FIELDS.get(getattr(status, 'value', status))
+    if status_field:
+        contribution[status_field] = 1
+    return contribution
+
+def _stage_summary_update(writer, uid: str, old_loan, new_loan):
+    """Queue the aggregate delta for old_loan -> new_loan on a batch or transaction"""
+    old = _loan_contribution(old_loan)
+    new = _loan_contribution(new_loan)
+    _stage_summary_delta(writer, uid, {f: new[f] - old[f] for f in SUMMARY_FIELDS})
+
+def _stage_summary_delta(writer, uid: str, delta: Dict[str, float]):
+    increments = {f: _firestore().Increment(delta[f]) for f in SUMMARY_FIELDS if delta[f]}
+    if increments:
+        increments['generation'] = _firestore().Increment(1)
+        increments['updated_at'] = datetime.utcnow()
+        writer.set(_summary_ref(uid), increments, merge=True)
+
+# Scans a rebuild may repeat while loan writes keep changing the aggregates
+REBUILD_MAX_ATTEMPTS = 5
+
+def _scan_dashboard_summary(col) -> Tuple[Dict[str, float], int]:
+    totals = dict.fromkeys(SUMMARY_FIELDS, 0)
+    loan_count = 0
+    for d in col.stream():
+        loan_count += 1
+        for field, value in _loan_contribution(d.to_dict()).items():
+            totals[field] += value
+    return totals, loan_count
+
+@firestore_op("write")
+def rebuild_dashboard_summary(uid: str) -> Dict[str, Any]:
+    """Recompute the aggregates from every loan, store them and report drift.
+
+    The scan is not a transaction (it may read thousands of loans), so the
+    result is only stored, in a transaction, if the summary's generation is
+    still the one read before the scan; otherwise a loan write landed
+    meanwhile and the scan is repeated.
+    """
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to rebuild dashboard summary for user {uid}")
+    _, db = init_firebase()
+    summary_ref = _summary_ref(uid)
+
+    for attempt in range(1, REBUILD_MAX_ATTEMPTS + 1):
+        generation = (summary_ref.get().to_dict() or {}).get('generation') or 0
+        totals, loan_count = _scan_dashboard_summary(col)
+
+        @_firestore().transactional
+        def _store(transaction):
+            previous = summary_ref.get(transaction=transaction).to_dict() or {}
+            if (previous.get('generation') or 0) != generation:
+                return None
+            transaction.set(summary_ref, dict(totals, generation=generation,
+                                              updated_at=datetime.utcnow(), rebuilt_at=datetime.utcnow()))
+            return previous
+
+        previous = _store(db.transaction())
+        if previous is not None:
+            break
+        logger.info(f"Loans of user {uid} changed during dashboard rebuild, rescanning (attempt {attempt})")
+    else:
+        raise Exception(f"Failed to rebuild dashboard summary for user {uid}: "
+                        f"loans kept changing for {REBUILD_MAX_ATTEMPTS} scans")
+
+    drift = {
+        field: totals[field] - (previous.get(field) or 0)
+        for field in SUMMARY_FIELDS
+        if abs(totals[field] - (previous.get(field) or 0)) > 1e-6
+    }
+    if drift:
+        logger.warning(f"Dashboard summary for user {uid} had drifted: {drift}")
+    logger.info(f"Rebuilt dashboard summary for user {uid} from {loan_count} loans")
+    return {'uid': uid, 'loan_count': loan_count, 'summary': totals, 'drift': drift, 'attempts': attempt}
+
+# Users whose never-rebuilt summary was already reported
+_unbuilt_summaries = set()
+
+def _check_rebuilt(uid: str, data: Dict[str, Any]):
+    """Warn (once per user) when the aggregates only cover loans written
+    since they were introduced; scripts/rebuild_dashboard_summary.py fixes it"""
+    if 'rebuilt_at' in data or uid in _unbuilt_summaries:
+        return
+    _unbuilt_summaries.add(uid)
+    logger.warning(f"Dashboard summary for user {uid} has never been rebuilt; run "
+                   f"scripts/rebuild_dashboard_summary.py --uid {uid} to include older loans")
+
+@firestore_op("read")
+def get_dashboard_summary_for_user(uid: str) -> Dict[str, Any]:
+    """Read the materialized aggregates (never scans the loans)"""
+    snapshot = _summary_ref(uid).get()
+    data = (snapshot.to_dict() if snapshot.exists else None) or {}
+    _check_rebuilt(uid, data)
+    return _dashboard_summary(data)
+
+def _dashboard_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {field: data.get(field) or 0 for field in SUMMARY_FIELDS}
+    summary['pending_amount'] = summary['total_loan_issued'] - summary['recovered_amount']
+    return summary
+
+def _written_record(doc_ref, written: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored fields of a document this process just wrote"""
+    if WRITE_READBACK or written is None:
+        return doc_ref.get().to_dict()
+    return dict(written)
+
+def _loan_snapshot_to_dict(d, fields: List[str] = None) -> Dict[str, Any]:
+    """Convert a loan document snapshot into the camelCase dict the API returns.
+    With `fields` (stored names) only those fields and the id are returned."""
+    data = d.to_dict()
+    if data is None or (not data and fields is None):
+        return None
+    inline_photo_url(data)
+    data.pop(search_index.TOKENS_FIELD, None)
+    if fields is not None:
+        data = {key: value for key, value in data.items() if key in fields}
+    data['id'] = d.id
     
-    if not isinstance(data, dict):
-        return data
-        
-    converted = {}
-    for key, value in data.items():
-        if '_' in key:
-            parts = key.split('_')
-            camel_key = parts[0] + ''.join(part.capitalize() for part in parts[1:])
-        else:
-            camel_key = key
-            
-        # Recursively convert nested objects
-        if isinstance(value, dict):
-            converted[camel_key] = _convert_keys_to_camel_case(value)
-        elif isinstance(value, list):
-            converted[camel_key] = [_convert_keys_to_camel_case(item) if isinstance(item, dict) else item for item in value]
-        else:
-            converted[camel_key] = value
-            
-    return converted
+    # Convert Firestore timestamps to ISO strings
+    if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
+        data['created_at'] = data['created_at'].isoformat()
+    if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
+        data['updated_at'] = data['updated_at'].isoformat()
+    
+    # Ensure loan_type is included with default value if missing
+    if 'loan_type' not in data and (fields is None or 'loan_type' in fields):
+        data['loan_type'] = 'Cash Loan'
+    
+    # Convert snake_case keys to camelCase for frontend compatibility
+    return camel_keys(data, deep=False)
+
+@firestore_op("read")
 def get_loans_for_user(uid: str) -> List[Dict[str, Any]]:
     """Get all loans for a specific user"""
     try:
-        # First ensure the user exists
-        if not ensure_user_exists(uid):
-            logger.error(f"Failed to ensure user {uid} exists")
-            return []
-            
+        cached = loan_cache.get(uid)
+        if cached is not None:
+            return cached
+        generation = loan_cache.generation(uid)
+
         col = _loans_col(uid)
         if not col:
             logger.error(f"Failed to get loans collection for user {uid}")
@@ -153,42 +328,345 @@ def get_loans_for_user(uid: str) -> List[Dict[str, Any]]:
         docs = col.stream()
         out = []
         for d in docs:
-            data = d.to_dict()
-            if data:
-                data['id'] = d.id
-                
-                # Convert Firestore timestamps to ISO strings
-                if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
-                    data['created_at'] = data['created_at'].isoformat()
-                if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
-                    data['updated_at'] = data['updated_at'].isoformat()
-                
-                # Ensure loan_type is included with default value if missing
-                if 'loan_type' not in data:
-                    data['loan_type'] = 'Cash Loan'
-                
-                # Convert snake_case keys to camelCase for frontend compatibility
-                converted_data = {}
-                for key, value in data.items():
-                    if '_' in key:
-                        parts = key.split('_')
-                        camel_key = parts[0] + ''.join(part.capitalize() for part in parts[1:])
-                    else:
-                        camel_key = key
-                    converted_data[camel_key] = value
-                
+            converted_data = _loan_snapshot_to_dict(d)
+            if converted_data:
                 out.append(converted_data)
         
         logger.info(f"Retrieved {len(out)} loans for user {uid}")
+        loan_cache.put(uid, out, generation)
         return out
     except Exception as e:
         logger.error(f"Error getting loans for user {uid}: {e}")
         return []
 
+@firestore_op("read")
+def count_loans_for_user(uid: str) -> int:
+    """Number of loans, from a server-side count aggregation (no documents are read)"""
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to count loans for user {uid}")
+    return int(col.count().get()[0][0].value)
+
+@firestore_op("read")
+def get_loan_for_user(uid: str, loan_id: str, fields: List[str] = None) -> Dict[str, Any]:
+    """Get one loan (optionally only `fields`), or None if it does not exist"""
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to get loan for user {uid}")
+    snapshot = col.document(loan_id).get(field_paths=fields)
+    if not snapshot.exists:
+        return None
+    return _loan_snapshot_to_dict(snapshot, fields)
+
+# Sortable loan fields for query_loans_for_user, keyed by their API (camelCase) name
+LOAN_ORDER_FIELDS = {
+    'createdAt': 'created_at',
+    'updatedAt': 'updated_at',
+    'borrowerName': 'borrower_name',
+    'totalLoan': 'total_loan',
+    'paidAmount': 'paid_amount',
+    'emi': 'emi',
+    'startDate': 'start_date',
+    'endDate': 'end_date',
+    'nextDueDate': 'next_due_date',
+    'daysOverdue': 'days_overdue',
+}
+
+# orderBy values that may be combined with status/loanType filters. Each
+# needs a composite index per filter combination (firestore.indexes.json);
+# other sort orders only work unfiltered, where single-field indexes suffice.
+# Filters without orderBy sort by document id and need no composite index.
+FILTERED_LOAN_ORDERS = ('-createdAt', 'createdAt', 'borrowerName', '-totalLoan', 'totalLoan', 'nextDueDate')
+
+# Projectable loan fields: API (camelCase) name -> stored (snake_case) name
+LOAN_FIELDS = {to_camel(name): name for name in LoanRecord.model_fields if name != 'id'}
+# Fields read for LoanSummary; excludes profile_photo, jamindars and payment_records
+LOAN_SUMMARY_FIELDS = [name for name in LoanSummary.model_fields if name != 'id']
+
+def resolve_loan_fields(fields: List[str]) -> List[str]:
+    """Map requested API field names to stored names for a select() projection"""
+    resolved = []
+    for field in fields:
+        field = field.strip()
+        if not field or field == 'id':
+            continue
+        if field not in LOAN_FIELDS:
+            raise ValueError(f"Unknown loan field '{field}'")
+        resolved.append(LOAN_FIELDS[field])
+    return resolved
+
+def _encode_cursor(values: List[Any]) -> str:
+    encoded = [{'__datetime__': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return [
+        datetime.fromisoformat(v['__datetime__']) if isinstance(v, dict) and '__datetime__' in v else v
+        for v in values
+    ]
+
+def _build_loan_query(col, cursor: str = None, status: str = None, loan_type: str = None,
+                      order_by: str = None, fields: List[str] = None, filters: List[Tuple] = None):
+    """Apply filters, ordering, cursor and field mask; returns (query, order_field).
+    filters are extra (field, op, value) conditions, e.g. a range on the order field."""
+    direction = _firestore().Query.ASCENDING
+    order_field = None
+    if order_by and (status or loan_type) and order_by not in FILTERED_LOAN_ORDERS:
+        raise ValueError(f"orderBy '{order_by}' cannot be combined with status or loanType filters; "
+                         f"use one of {', '.join(FILTERED_LOAN_ORDERS)}")
+    if order_by:
+        if order_by.startswith('-'):
+            direction = _firestore().Query.DESCENDING
+            order_by = order_by[1:]
+        if order_by not in LOAN_ORDER_FIELDS:
+            raise ValueError(f"Cannot order loans by '{order_by}'")
+        order_field = LOAN_ORDER_FIELDS[order_by]
+
+    query = col
+    if status:
+        query = query.where('status', '==', status)
+    if loan_type:
+        query = query.where('loan_type', '==', loan_type)
+    for field, op, value in filters or ():
+        query = query.where(field, op, value)
+    if order_field:
+        query = query.order_by(order_field, direction=direction)
+    # Document id as tie-breaker keeps cursors stable for equal sort values
+    query = query.order_by('__name__', direction=direction)
+    if cursor:
+        query = query.start_after(_decode_cursor(cursor))
+    if fields is not None:
+        # The sort field has to be read too so the next cursor can be built
+        selected = list(dict.fromkeys(fields + ([order_field] if order_field else [])))
+        if 'profile_photo' in fields:
+            # Photos are stored in the blob store and referenced by hash
+            selected.append('profile_photo_hash')
+        query = query.select(selected)
+    return query, order_field
+
+def _loan_page(docs, limit: int, fields: List[str], order_field: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Convert fetched snapshots (limit + 1 of them when paging) into (loans, next_cursor)"""
+    page = docs if limit is None else docs[:limit]
+    out = [loan for loan in (_loan_snapshot_to_dict(d, fields) for d in page) if loan]
+
+    next_cursor = None
+    if limit is not None and len(docs) > limit and page:
+        last = page[-1]
+        values = [last.to_dict().get(order_field)] if order_field else []
+        next_cursor = _encode_cursor(values + [last.id])
+    return out, next_cursor
+
+@firestore_op("read")
+def query_loans_for_user(uid: str, limit: int = 50, cursor: str = None, status: str = None,
+                         loan_type: str = None, order_by: str = None,
+                         fields: List[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """Get one page of a user's loans using a Firestore query.
+
+    order_by is an API field name from LOAN_ORDER_FIELDS, prefixed with '-'
+    for descending order. fields is a list of stored field names to read
+    through a select() field mask; other fields are never downloaded.
+    limit=None reads every matching loan. Returns (loans, next_cursor);
+    next_cursor is None on the last page and is passed back as `cursor` to
+    fetch the next one.
+    """
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to query loans for user {uid}")
+    query, order_field = _build_loan_query(col, cursor, status, loan_type, order_by, fields)
+
+    if limit is None:
+        docs = list(query.stream())
+    else:
+        # Fetch one extra document to learn whether another page exists
+        docs = list(query.limit(limit + 1).stream())
+    out, next_cursor = _loan_page(docs, limit, fields, order_field)
+    logger.info(f"Retrieved page of {len(out)} loans for user {uid}")
+    return out, next_cursor
+
+def _due_filters(date_from: str, date_to: str, overdue: bool) -> List[Tuple[str, str, Any]]:
+    filters = []
+    if date_from:
+        filters.append(('next_due_date', '>=', date_from))
+    if date_to:
+        filters.append(('next_due_date', '<=', date_to))
+    if overdue:
+        filters.append(('next_due_date', '<', datetime.utcnow().date().isoformat()))
+    if not filters:
+        # Only loans that have a due date
+        filters.append(('next_due_date', '>', ''))
+    return filters
+
+@firestore_op("read")
+def query_due_loans_for_user(uid: str, date_from: str = None, date_to: str = None, overdue: bool = False,
+                             limit: int = 50, cursor: str = None,
+                             fields: List[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """Page through loans by next_due_date (ISO dates, inclusive range).
+
+    overdue=True keeps only loans whose next due date has passed. Closed
+    and fully paid loans have no next_due_date and never match.
+    """
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to query due loans for user {uid}")
+    query, order_field = _build_loan_query(col, cursor, order_by='nextDueDate', fields=fields,
+                                           filters=_due_filters(date_from, date_to, overdue))
+    docs = list(query.limit(limit + 1).stream())
+    out, next_cursor = _loan_page(docs, limit, fields, order_field)
+    logger.info(f"Retrieved page of {len(out)} due loans for user {uid}")
+    return out, next_cursor
+
+# Most candidates a search token may pull before ranking
+SEARCH_CANDIDATE_LIMIT = 200
+
+def _search_read_fields(fields: List[str]) -> List[str]:
+    # Ranking needs the name and phone even when the caller asked for fewer fields
+    return sorted(set(fields) | {'borrower_name', 'phone_number'}) if fields is not None else None
+
+def _search_candidates_query(col, token: str, read_fields: List[str]):
+    query = col.where(search_index.TOKENS_FIELD, 'array_contains', token)
+    if read_fields is not None:
+        query = query.select(read_fields)
+    return query.limit(SEARCH_CANDIDATE_LIMIT)
+
+def _search_result(out: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    if fields is None:
+        return out
+    keep = {to_camel(name) for name in fields} | {'id'}
+    return [{key: value for key, value in loan.items() if key in keep} for loan in out]
+
+@firestore_op("read")
+def search_loans_for_user(uid: str, q: str, limit: int = 20,
+                          fields: List[str] = None) -> List[Dict[str, Any]]:
+    """Loans whose borrower name or phone matches q, best matches first.
+
+    One array_contains query on search_tokens (the prefix of the whole query,
+    or a phone suffix) pulls at most SEARCH_CANDIDATE_LIMIT candidates, which
+    are ranked in memory. Only when that finds nothing does it fall back to
+    the rarest word of the query (words in another order), then a trigram.
+    """
+    lookup = search_index.query_token(q)
+    if lookup is None:
+        return []
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to search loans for user {uid}")
+    read_fields = _search_read_fields(fields)
+
+    def matching(token):
+        return col.where(search_index.TOKENS_FIELD, 'array_contains', token)
+
+    def candidates(token):
+        docs = _search_candidates_query(col, token, read_fields).stream()
+        return [loan for loan in (_loan_snapshot_to_dict(d, read_fields) for d in docs) if loan]
+
+    token, kind = lookup
+    out = search_index.rank(candidates(token), q, limit)
+    if not out and kind == 'name':
+        words = search_index.word_tokens(q)
+        if words:
+            # A count reads one index entry per 1000 matches, far cheaper than the candidates
+            rarest = min(words, key=lambda word: matching(word).count().get()[0][0].value)
+            out = search_index.rank(candidates(rarest), q, limit)
+    if not out and kind == 'name':
+        trigram = search_index.trigram_token(q)
+        if trigram:
+            out = search_index.rank(candidates(trigram), q, limit)
+    out = _search_result(out, fields)
+    logger.info(f"Search matched {len(out)} loans for user {uid}")
+    return out
+
+@firestore_op("write")
+def rebuild_search_index(uid: str) -> Dict[str, int]:
+    """Recompute search_tokens of every loan (for loans written before the field existed)"""
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to rebuild search index for user {uid}")
+    _, db = init_firebase()
+
+    scanned = changed = 0
+    batch = db.batch()
+    for snapshot in col.select(['borrower_name', 'phone_number', search_index.TOKENS_FIELD]).stream():
+        scanned += 1
+        loan = snapshot.to_dict() or {}
+        tokens = search_index.loan_search_tokens(loan)
+        if loan.get(search_index.TOKENS_FIELD) == tokens:
+            continue
+        batch.update(snapshot.reference, {search_index.TOKENS_FIELD: tokens})
+        changed += 1
+        if len(batch) >= BULK_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+    if len(batch):
+        batch.commit()
+    logger.info(f"Rebuilt search index for user {uid}: {changed} of {scanned} loans changed")
+    return {'scanned': scanned, 'changed': changed}
+
+def _due_changes(loan: Dict[str, Any], today) -> Dict[str, Any]:
+    """due_fields(loan, today) if they differ from the stored values, else None"""
+    fields = due_fields(loan, today)
+    if all(loan.get(name) == value for name, value in fields.items()) and 'next_due_date' in loan:
+        return None
+    return fields
+
+@firestore_op("write")
+def roll_forward_due_dates(uid: str, today=None, backfill: bool = False) -> Dict[str, int]:
+    """Refresh next_due_date/days_overdue of loans whose due date has arrived.
+
+    Loan writes keep both fields current; only days_overdue goes stale as
+    days pass, so the nightly run only touches loans due on or before
+    today. backfill=True recomputes every loan (for loans written before
+    the fields existed).
+    """
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to roll forward due dates for user {uid}")
+    today = today or datetime.utcnow().date()
+    _, db = init_firebase()
+
+    query = col if backfill else col.where('next_due_date', '<=', today.isoformat())
+    query = query.select(['status', 'start_date', 'end_date', 'emi', 'total_loan', 'paid_amount',
+                          'next_due_date', 'days_overdue'])
+    scanned = 0
+    stale = []
+    for snapshot in query.stream():
+        scanned += 1
+        if _due_changes(snapshot.to_dict() or {}, today):
+            stale.append(snapshot.reference)
+
+    # The scan may be stale by the time it is written back, so each chunk
+    # re-reads its loans in a transaction and bumps their version like any
+    # other loan write
+    @_firestore().transactional
+    def _roll_forward(transaction, refs):
+        updated = 0
+        for snapshot in transaction.get_all(refs):
+            loan = snapshot.to_dict() if snapshot.exists else None
+            fields = _due_changes(loan, today) if loan else None
+            if fields:
+                transaction.update(snapshot.reference, dict(fields, version=_next_version(loan)))
+                updated += 1
+        return updated
+
+    changed = 0
+    for start in range(0, len(stale), BULK_BATCH_SIZE):
+        changed += _roll_forward(db.transaction(), stale[start:start + BULK_BATCH_SIZE])
+    if changed:
+        loan_cache.invalidate(uid)
+    logger.info(f"Rolled forward due dates for user {uid}: {changed} of {scanned} loans changed")
+    return {'scanned': scanned, 'changed': changed}
+
+@firestore_op("write")
 def create_loan_for_user(uid: str, loan_data: Dict[str, Any]) -> LoanRecord:
     """Create a new loan for a user"""
     try:
-        logger.info(f"Creating loan for user {uid} with data: {loan_data}")
+        logger.info("Creating loan for user %s with data: %s", uid, Redacted(loan_data))
         
         # First ensure the user exists
         if not ensure_user_exists(uid):
@@ -205,37 +683,126 @@ def create_loan_for_user(uid: str, loan_data: Dict[str, Any]) -> LoanRecord:
         loan_data = dict(loan_data)
         loan_data.setdefault('created_at', now)
         loan_data.setdefault('updated_at', now)
+        externalize_photo(loan_data)
         
         # Ensure loan_type is included with default value if missing
         if 'loan_type' not in loan_data:
             loan_data['loan_type'] = 'Cash Loan'
+        loan_data['version'] = 1
+        loan_data.update(due_fields(loan_data))
+        loan_data[search_index.TOKENS_FIELD] = search_index.loan_search_tokens(loan_data)
         
-        logger.info(f"Setting loan data to Firestore: {loan_data}")
-        doc_ref.set(loan_data)
+        logger.debug("Setting loan data to Firestore: %s", Redacted(loan_data))
+        _, db = init_firebase()
+        batch = db.batch()
+        batch.set(doc_ref, loan_data)
+        _stage_summary_update(batch, uid, None, loan_data)
+        batch.commit()
+        loan_cache.invalidate(uid)
         logger.info(f"Created loan {doc_ref.id} for user {uid}")
         
-        saved = doc_ref.get().to_dict()
+        saved = _written_record(doc_ref, loan_data)
         if saved:
             saved['id'] = doc_ref.id
+            inline_photo_url(saved)
             # Convert timestamps
             for time_field in ['created_at', 'updated_at']:
                 if time_field in saved and hasattr(saved[time_field], 'isoformat'):
                     saved[time_field] = saved[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            saved = _convert_keys_to_camel_case(saved)
+            saved = camel_keys(saved)
             
             try:
                 return LoanRecord(**saved)
             except Exception as e:
                 logger.error(f"Error creating LoanRecord from saved data: {e}")
-                logger.error(f"Saved data: {saved}")
+                logger.error("Saved data: %s", Redacted(saved))
                 raise Exception(f"Failed to create loan for user {uid}: {e}")
         raise Exception(f"Failed to retrieve saved loan for user {uid}")
     except Exception as e:
         logger.error(f"Error creating loan for user {uid}: {e}")
         raise Exception(f"Failed to create loan for user {uid}: {e}")
 
+# Firestore allows at most 500 writes per batch; one of them is the summary update
+BULK_BATCH_SIZE = 500
+BULK_WRITERS = 4
+
+@firestore_op("write")
+def create_loans_for_user(uid: str, loans: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Create many loans with batched writes.
+
+    Loans are written BULK_BATCH_SIZE - 1 per batch together with a single
+    summary increment covering the whole batch; up to BULK_WRITERS batches
+    commit concurrently. Returns one (loan_id, error) pair per input loan,
+    in input order: error is None when the loan was written, and every loan
+    of a batch that failed to commit carries that batch's error.
+    """
+    if not ensure_user_exists(uid):
+        raise Exception(f"Failed to create loans for user {uid}")
+    col = _loans_col(uid)
+    if not col:
+        raise Exception(f"Failed to create loans for user {uid}")
+    _, db = init_firebase()
+
+    results = []
+    prepared = []
+    now = datetime.utcnow()
+    for loan_data in loans:
+        loan_data = dict(loan_data)
+        loan_data.setdefault('created_at', now)
+        loan_data.setdefault('updated_at', now)
+        loan_data.setdefault('loan_type', 'Cash Loan')
+        loan_data['version'] = 1
+        loan_data.update(due_fields(loan_data, now.date()))
+        loan_data[search_index.TOKENS_FIELD] = search_index.loan_search_tokens(loan_data)
+        try:
+            externalize_photo(loan_data)
+        except Exception as e:
+            results.append((None, f"Invalid profile photo: {e}"))
+            continue
+        doc_ref = col.document()
+        results.append((doc_ref.id, None))
+        prepared.append((len(results) - 1, doc_ref, loan_data))
+
+    chunk_size = BULK_BATCH_SIZE - 1
+    chunks = [prepared[i:i + chunk_size] for i in range(0, len(prepared), chunk_size)]
+
+    def commit_chunk(chunk):
+        batch = db.batch()
+        delta = dict.fromkeys(SUMMARY_FIELDS, 0)
+        for _, doc_ref, loan_data in chunk:
+            batch.set(doc_ref, loan_data)
+            for field, value in _loan_contribution(loan_data).items():
+                delta[field] += value
+        _stage_summary_delta(batch, uid, delta)
+        batch.commit()
+
+    try:
+        with ThreadPoolExecutor(max_workers=BULK_WRITERS) as pool:
+            # Each writer runs in a copy of the caller's context so its commits
+            # are counted in the request trace
+            futures = [(chunk, pool.submit(contextvars.copy_context().run, commit_chunk, chunk))
+                       for chunk in chunks]
+            for chunk, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error committing loan batch for user {uid}: {e}")
+                    for index, _, _ in chunk:
+                        results[index] = (None, f"Batch write failed: {e}")
+    finally:
+        loan_cache.invalidate(uid)
+
+    created = sum(1 for loan_id, _ in results if loan_id)
+    logger.info(f"Bulk created {created} of {len(loans)} loans for user {uid}")
+    return results
+
+def _next_version(loan_data: Dict[str, Any]) -> int:
+    """Loans carry a version that every write bumps, for optimistic concurrency checks"""
+    return int((loan_data or {}).get('version') or 0) + 1
+
+@firestore_op("write")
 def update_loan_for_user(uid: str, loan_id: str, update_data: Dict[str, Any]) -> LoanRecord:
     try:
         col = _loans_col(uid)
@@ -244,31 +811,47 @@ def update_loan_for_user(uid: str, loan_id: str, update_data: Dict[str, Any]) ->
             raise Exception(f"Failed to update loan for user {uid}")
             
         doc_ref = col.document(loan_id)
+        _, db = init_firebase()
+        externalize_photo(update_data)
         
-        # Get existing loan to preserve loan_type if not being updated
-        existing_loan = doc_ref.get().to_dict()
-        if existing_loan and 'loan_type' not in update_data:
-            update_data['loan_type'] = existing_loan.get('loan_type', 'Cash Loan')
-        
-        update_data['updated_at'] = datetime.utcnow()
-        
-        # Ensure payment_records is properly handled
-        if 'payment_records' in update_data:
-            logger.info(f"Updating payment records for loan {loan_id}: {update_data['payment_records']}")
+        @_firestore().transactional
+        def _apply_update(transaction):
+            # Get existing loan to preserve loan_type if not being updated
+            existing_loan = doc_ref.get(transaction=transaction).to_dict()
+            if existing_loan and 'loan_type' not in update_data:
+                update_data['loan_type'] = existing_loan.get('loan_type', 'Cash Loan')
+            
+            update_data['updated_at'] = datetime.utcnow()
+            update_data['version'] = _next_version(existing_loan)
+            
+            # Ensure payment_records is properly handled
+            if 'payment_records' in update_data:
+                logger.info("Updating %d payment records for loan %s", len(update_data['payment_records'] or []), loan_id)
+            
+            update_data.update(due_fields({**(existing_loan or {}), **update_data}))
+            if 'borrower_name' in update_data or 'phone_number' in update_data:
+                update_data[search_index.TOKENS_FIELD] = search_index.loan_search_tokens(
+                    {**(existing_loan or {}), **update_data})
+            merged = {**(existing_loan or {}), **update_data}
+            transaction.update(doc_ref, update_data)
+            _stage_summary_update(transaction, uid, existing_loan, merged)
+            return merged
         
-        doc_ref.update(update_data)
+        merged = _apply_update(db.transaction())
+        loan_cache.invalidate(uid)
         logger.info(f"Updated loan {loan_id} for user {uid}")
         
-        updated = doc_ref.get().to_dict()
+        updated = _written_record(doc_ref, merged)
         if updated:
             updated['id'] = doc_ref.id
+            inline_photo_url(updated)
             # Convert timestamps
             for time_field in ['created_at', 'updated_at']:
                 if time_field in updated and hasattr(updated[time_field], 'isoformat'):
                     updated[time_field] = updated[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            updated = _convert_keys_to_camel_case(updated)
+            updated = camel_keys(updated)
             
             try:
                 return LoanRecord(**updated)
@@ -280,6 +863,103 @@ def update_loan_for_user(uid: str, loan_id: str, update_data: Dict[str, Any]) ->
         logger.error(f"Error updating loan {loan_id} for user {uid}: {e}")
         raise Exception(f"Failed to update loan for user {uid}: {e}")
     
+# Attempts for contended read-modify-write transactions before giving up
+TRANSACTION_MAX_ATTEMPTS = 5
+
+class VersionConflict(Exception):
+    """The loan was written by someone else since the version the caller read"""
+
+class TransactionContention(Exception):
+    """A transaction was aborted by concurrent writers TRANSACTION_MAX_ATTEMPTS times"""
+
+@firestore_op("write")
+def update_paid_amount_for_user(uid: str, loan_id: str, paid_amount: float,
+                                expected_version: int = None) -> Tuple[LoanRecord, int]:
+    """
+    Update only the paid amount for a user's loan and adjust the status.
+    Automatically sets 'closed_at' when loan is fully paid.
+
+    Runs in a transaction that Firestore retries (up to
+    TRANSACTION_MAX_ATTEMPTS) when a concurrent write to the loan aborts it.
+    With expected_version the update is rejected with VersionConflict if the
+    loan has been written since. Returns (loan, retries), or None if the
+    loan does not exist.
+    """
+    col = _loans_col(uid)
+    if not col:
+        logger.error(f"Failed to get loans collection for user {uid}")
+        raise Exception(f"Failed to update paid amount for user {uid}")
+
+    doc_ref = col.document(loan_id)
+    _, db = init_firebase()
+    attempts = 0
+
+    @_firestore().transactional
+    def _apply_paid_amount(transaction):
+        nonlocal attempts
+        attempts += 1
+        loan_doc = doc_ref.get(transaction=transaction)
+        if not loan_doc.exists:
+            return None
+
+        loan_data = loan_doc.to_dict() or {}
+        if expected_version is not None and int(loan_data.get('version') or 0) != expected_version:
+            raise VersionConflict(
+                f"Loan {loan_id} is at version {loan_data.get('version') or 0}, not {expected_version}")
+
+        new_status = loan_status_for_paid_amount(paid_amount, float(loan_data.get('total_loan') or 0))
+        now = datetime.utcnow()
+        update_data = {
+            'paid_amount': paid_amount,
+            'status': new_status,
+            'updated_at': now,
+            'version': _next_version(loan_data),
+            # Preserve existing loan type
+            'loan_type': loan_data.get('loan_type') or 'Cash Loan',
+        }
+        # Mark closed_at if loan is now fully paid
+        if new_status == 'Closed':
+            update_data['closed_at'] = now
+        update_data.update(due_fields({**loan_data, **update_data}))
+
+        # Update Firestore together with the dashboard aggregates
+        merged = {**loan_data, **update_data}
+        transaction.update(doc_ref, update_data)
+        _stage_summary_update(transaction, uid, loan_data, merged)
+        return merged
+
+    try:
+        merged = _apply_paid_amount(db.transaction(max_attempts=TRANSACTION_MAX_ATTEMPTS))
+    except VersionConflict:
+        raise
+    except ValueError as e:
+        from google.api_core.exceptions import Aborted
+        if not isinstance(e.__cause__, Aborted):
+            raise
+        # transactional() reports exhausted retries as a ValueError
+        logger.error(f"Gave up updating paid amount for loan {loan_id} after {attempts} attempts")
+        raise TransactionContention(f"Failed to update paid amount for loan {loan_id}: {e}")
+    except Exception as e:
+        logger.error(f"Error updating paid amount for loan {loan_id} (User: {uid}): {e}")
+        raise Exception(f"Failed to update paid amount for user {uid}: {e}")
+    if merged is None:
+        return None
+
+    retries = attempts - 1
+    loan_cache.invalidate(uid)
+    logger.info(f"Updated paid amount for loan {loan_id} (User: {uid}) -> {paid_amount}, "
+                f"status: {merged['status']}, retries: {retries}")
+
+    # Build the response from what was written
+    updated = _written_record(doc_ref, merged)
+    updated['id'] = loan_id
+    inline_photo_url(updated)
+    for time_field in ['created_at', 'updated_at', 'closed_at']:
+        if time_field in updated and hasattr(updated[time_field], 'isoformat'):
+            updated[time_field] = updated[time_field].isoformat()
+    return LoanRecord(**camel_keys(updated)), retries
+
+@firestore_op("delete")
 def delete_loan_for_user(uid: str, loan_id: str):
     """Delete a loan for a user"""
     try:
@@ -289,43 +969,172 @@ def delete_loan_for_user(uid: str, loan_id: str):
             raise Exception(f"Failed to delete loan for user {uid}")
             
         doc_ref = col.document(loan_id)
-        doc_ref.delete()
+        _, db = init_firebase()
+        
+        @_firestore().transactional
+        def _apply_delete(transaction):
+            existing_loan = doc_ref.get(transaction=transaction).to_dict()
+            transaction.delete(doc_ref)
+            _stage_summary_update(transaction, uid, existing_loan, None)
+        
+        _apply_delete(db.transaction())
+        loan_cache.invalidate(uid)
+        _delete_payments(uid, loan_id)
         logger.info(f"Deleted loan {loan_id} for user {uid}")
     except Exception as e:
         logger.error(f"Error deleting loan {loan_id} for user {uid}: {e}")
         raise Exception(f"Failed to delete loan for user {uid}: {e}")
     
+def _delete_payments(uid: str, loan_id: str):
+    """Delete a loan's payments subcollection; Firestore never cascades deletes"""
+    col = _payments_col(uid, loan_id)
+    _, db = init_firebase()
+    while True:
+        refs = [d.reference for d in col.select([]).limit(BULK_BATCH_SIZE).stream()]
+        if not refs:
+            return
+        batch = db.batch()
+        for ref in refs:
+            batch.delete(ref)
+        batch.commit()
+
+def loan_status_for_paid_amount(paid_amount: float, total_loan: float) -> str:
+    if paid_amount >= total_loan:
+        return 'Closed'
+    if paid_amount > 0:
+        return 'Active'
+    return 'Pending'
+
+def _payment_snapshot_to_dict(d) -> Dict[str, Any]:
+    data = d.to_dict()
+    if not data:
+        return None
+    data['id'] = d.id
+    if hasattr(data.get('created_at'), 'isoformat'):
+        data['created_at'] = data['created_at'].isoformat()
+    return camel_keys(data)
+
+@firestore_op("write")
+def create_payment_for_user(uid: str, loan_id: str, payment_data: Dict[str, Any]) -> PaymentReceipt:
+    """Append a payment to a loan's ledger; returns None if the loan does not exist.
+
+    The payment document, the loan's paid_amount/status and the dashboard
+    aggregates are written in one transaction, so the cost of a payment
+    does not depend on how many payments the loan already has.
+    """
+    try:
+        col = _loans_col(uid)
+        if not col:
+            raise Exception(f"Failed to create payment for user {uid}")
+        loan_ref = col.document(loan_id)
+        payment_ref = loan_ref.collection('payments').document()
+        _, db = init_firebase()
+
+        payment = dict(payment_data)
+        payment['status'] = getattr(payment.get('status'), 'value', payment.get('status')) or 'Paid'
+        payment['loan_id'] = loan_id
+
+        @_firestore().transactional
+        def _apply_payment(transaction):
+            loan_doc = loan_ref.get(transaction=transaction)
+            if not loan_doc.exists:
+                return None
+            loan_data = loan_doc.to_dict() or {}
+
+            now = datetime.utcnow()
+            payment['created_at'] = now
+            paid_amount = float(loan_data.get('paid_amount') or 0)
+            if payment['status'] == 'Paid':
+                paid_amount += float(payment['amount'])
+            update_data = {
+                'paid_amount': paid_amount,
+                'status': loan_status_for_paid_amount(paid_amount, float(loan_data.get('total_loan') or 0)),
+                'updated_at': now,
+                'version': _next_version(loan_data),
+            }
+            if update_data['status'] == 'Closed' and loan_data.get('status') != 'Closed':
+                update_data['closed_at'] = now
+            update_data.update(due_fields({**loan_data, **update_data}))
+            transaction.set(payment_ref, payment)
+            transaction.update(loan_ref, update_data)
+            _stage_summary_update(transaction, uid, loan_data, {**loan_data, **update_data})
+            return update_data
+
+        update_data = _apply_payment(db.transaction())
+        if update_data is None:
+            logger.error(f"Loan {loan_id} not found for user {uid}")
+            return None
+        loan_cache.invalidate(uid)
+        logger.info(f"Recorded payment {payment_ref.id} of {payment['amount']} on loan {loan_id} for user {uid}")
+
+        saved = dict(payment, id=payment_ref.id)
+        saved['created_at'] = saved['created_at'].isoformat()
+        # Every part is already typed, so skip re-validating the receipt
+        return PaymentReceipt.model_construct(
+            payment=Payment(**camel_keys(saved)),
+            paid_amount=float(update_data['paid_amount']),
+            status=LoanStatus(update_data['status']),
+        )
+    except Exception as e:
+        logger.error(f"Error creating payment on loan {loan_id} for user {uid}: {e}")
+        raise Exception(f"Failed to create payment for user {uid}: {e}")
+
+def _payments_query(col, limit: int, cursor: str):
+    query = col.order_by('created_at').order_by('__name__')
+    if cursor:
+        query = query.start_after(_decode_cursor(cursor))
+    # Fetch one extra payment to learn whether another page exists
+    return query.limit(limit + 1)
+
+def _payment_page(docs, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+    page = docs[:limit]
+    out = [payment for payment in map(_payment_snapshot_to_dict, page) if payment]
+    next_cursor = None
+    if len(docs) > limit and page:
+        next_cursor = _encode_cursor([page[-1].to_dict().get('created_at'), page[-1].id])
+    return out, next_cursor
+
+@firestore_op("read")
+def get_payments_for_loan(uid: str, loan_id: str, limit: int = 50,
+                          cursor: str = None) -> Tuple[List[Dict[str, Any]], str]:
+    """One page of a loan's payments in the order they were recorded; returns (payments, next_cursor)"""
+    col = _payments_col(uid, loan_id)
+    if not col:
+        raise Exception(f"Failed to get payments for user {uid}")
+    docs = list(_payments_query(col, limit, cursor).stream())
+    out, next_cursor = _payment_page(docs, limit)
+    logger.info(f"Retrieved {len(out)} payments for loan {loan_id} of user {uid}")
+    return out, next_cursor
+
+def _document_snapshot_to_dict(d) -> Dict[str, Any]:
+    data = d.to_dict()
+    if not data:
+        return None
+    data['id'] = d.id
+    if 'uploaded_at' in data and hasattr(data.get('uploaded_at'), 'isoformat'):
+        data['uploaded_at'] = data['uploaded_at'].isoformat()
+
+    # Convert snake_case keys to camelCase
+    return camel_keys(data)
+
+@firestore_op("read")
 def get_documents_for_user(uid: str, loan_id: str) -> List[Dict[str, Any]]:
     """Get all documents for a specific loan"""
     try:
-        # First ensure the user exists
-        if not ensure_user_exists(uid):
-            logger.error(f"Failed to ensure user {uid} exists")
-            return []
-            
         col = _docs_col(uid)
         if not col:
             logger.error(f"Failed to get documents collection for user {uid}")
             return []
             
         q = col.where('loan_id', '==', loan_id).stream()
-        out = []
-        for d in q:
-            data = d.to_dict()
-            if data:
-                data['id'] = d.id
-                if 'uploaded_at' in data and hasattr(data.get('uploaded_at'), 'isoformat'):
-                    data['uploaded_at'] = data['uploaded_at'].isoformat()
-                
-                # Convert snake_case keys to camelCase
-                converted_data = _convert_keys_to_camel_case(data)
-                out.append(converted_data)
+        out = [doc for doc in (_document_snapshot_to_dict(d) for d in q) if doc]
         logger.info(f"Retrieved {len(out)} documents for loan {loan_id} of user {uid}")
         return out
     except Exception as e:
         logger.error(f"Error getting documents for loan {loan_id} of user {uid}: {e}")
         return []
 
+@firestore_op("write")
 def create_document_for_user(uid: str, document_data: Dict[str, Any]) -> Document:
     """Create a new document for a user"""
     try:
@@ -356,27 +1165,25 @@ def create_document_for_user(uid: str, document_data: Dict[str, Any]) -> Documen
         document_data = dict(document_data)
         document_data.setdefault('uploaded_at', now)
         
-        # Generate a shorter file ID instead of storing the full content
-        if 'file_content' in document_data and document_data['file_content']:
-            # Instead of storing the full base64, store a reference ID
-            file_id = str(uuid.uuid4())
-            document_data['file_id'] = file_id
-            document_data['file_size'] = len(document_data['file_content']) // 1024  # Size in KB
-            
-            # Store the full content without truncation
-            # REMOVE THIS LINE: document_data['file_content'] = document_data['file_content'][:100] + '...'  # Truncate for display
+        # Keep the file bytes in the blob store; the record only references them
+        file_content = document_data.pop('file_content', None)
+        if file_content:
+            stored = store_content(file_content)
+            document_data['file_hash'] = stored['hash']
+            document_data['file_size'] = stored['size']
+            document_data['mime_type'] = stored['mime_type']
         
         doc_ref.set(document_data)
         logger.info(f"Created document {doc_ref.id} for user {uid}")
         
-        saved = doc_ref.get().to_dict()
+        saved = _written_record(doc_ref, document_data)
         if saved:
             saved['id'] = doc_ref.id
             if 'uploaded_at' in saved and hasattr(saved.get('uploaded_at'), 'isoformat'):
                 saved['uploaded_at'] = saved['uploaded_at'].isoformat()
             
             # Convert snake_case keys to camelCase
-            saved = _convert_keys_to_camel_case(saved)
+            saved = camel_keys(saved)
             
             try:
                 return Document(**saved)
@@ -387,6 +1194,7 @@ def create_document_for_user(uid: str, document_data: Dict[str, Any]) -> Documen
     except Exception as e:
         logger.error(f"Error creating document for user {uid}: {e}")
         raise Exception(f"Failed to create document for user {uid}: {e}")    
+@firestore_op("delete")
 def delete_document_for_user(uid: str, doc_id: str):
     """Delete a document for a user"""
     try:
@@ -402,14 +1210,37 @@ def delete_document_for_user(uid: str, doc_id: str):
         logger.error(f"Error deleting document {doc_id} for user {uid}: {e}")
         raise Exception(f"Failed to delete document for user {uid}: {e}")
 
+def _profile_snapshot_to_dict(d) -> Dict[str, Any]:
+    data = d.to_dict()
+    if not data:
+        return None
+    logger.debug("Found profile document: %s", Redacted(data))
+    data['id'] = d.id
+    inline_photo_url(data)
+    if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
+        data['created_at'] = data['created_at'].isoformat()
+    if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
+        data['updated_at'] = data['updated_at'].isoformat()
+
+    # Convert snake_case keys to camelCase
+    converted_data = camel_keys(data)
+
+    # Explicitly convert jamindars if they exist
+    if 'jamindars' in converted_data and isinstance(converted_data['jamindars'], list):
+        converted_jamindars = []
+        for jamindar in converted_data['jamindars']:
+            if isinstance(jamindar, dict):
+                # Convert each jamindar's keys
+                converted_jamindars.append(camel_keys(jamindar))
+            else:
+                converted_jamindars.append(jamindar)
+        converted_data['jamindars'] = converted_jamindars
+    return converted_data
+
+@firestore_op("read")
 def get_profile_for_loan(uid: str, loan_id: str) -> Dict[str, Any]:
     """Get profile for a specific loan"""
     try:
-        # First ensure the user exists
-        if not ensure_user_exists(uid):
-            logger.error(f"Failed to ensure user {uid} exists")
-            return None
-            
         col = _profiles_col(uid)
         if not col:
             logger.error(f"Failed to get profiles collection for user {uid}")
@@ -420,32 +1251,7 @@ def get_profile_for_loan(uid: str, loan_id: str) -> Dict[str, Any]:
         logger.info(f"Querying for profile with loan_id: {loan_id_str}")
         
         q = col.where('loan_id', '==', loan_id_str).stream()
-        profiles = []
-        for d in q:
-            data = d.to_dict()
-            if data:
-                logger.info(f"Found profile document: {data}")
-                data['id'] = d.id
-                if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
-                    data['created_at'] = data['created_at'].isoformat()
-                if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
-                    data['updated_at'] = data['updated_at'].isoformat()
-                
-                # Convert snake_case keys to camelCase
-                converted_data = _convert_keys_to_camel_case(data)
-                
-                # Explicitly convert jamindars if they exist
-                if 'jamindars' in converted_data and isinstance(converted_data['jamindars'], list):
-                    converted_jamindars = []
-                    for jamindar in converted_data['jamindars']:
-                        if isinstance(jamindar, dict):
-                            # Convert each jamindar's keys
-                            converted_jamindars.append(_convert_keys_to_camel_case(jamindar))
-                        else:
-                            converted_jamindars.append(jamindar)
-                    converted_data['jamindars'] = converted_jamindars
-                
-                profiles.append(converted_data)
+        profiles = [profile for profile in (_profile_snapshot_to_dict(d) for d in q) if profile]
         
         logger.info(f"Retrieved {len(profiles)} profiles for loan {loan_id}")
         if profiles:
@@ -454,6 +1260,7 @@ def get_profile_for_loan(uid: str, loan_id: str) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Error getting profile for loan {loan_id} of user {uid}: {e}")
         return None
+@firestore_op("write")
 def create_profile_for_user(uid: str, profile_data: Dict[str, Any]) -> Profile:
     """Create a new profile for a user"""
     try:
@@ -475,7 +1282,7 @@ def create_profile_for_user(uid: str, profile_data: Dict[str, Any]) -> Profile:
         if 'jamindars' in profile_data:
             profile_data['jamindars'] = convert_jamindar_keys(
                 profile_data['jamindars'], 
-                camel_to_snake
+                to_snake
             )
         
         doc_ref = col.document()
@@ -483,21 +1290,23 @@ def create_profile_for_user(uid: str, profile_data: Dict[str, Any]) -> Profile:
         profile_data = dict(profile_data)
         profile_data.setdefault('created_at', now)
         profile_data.setdefault('updated_at', now)
+        externalize_photo(profile_data)
         
-        logger.info(f"Creating profile with data: {profile_data}")
+        logger.info("Creating profile with data: %s", Redacted(profile_data))
         doc_ref.set(profile_data)
         logger.info(f"Created profile {doc_ref.id} for user {uid}")
         
-        saved = doc_ref.get().to_dict()
+        saved = _written_record(doc_ref, profile_data)
         if saved:
             saved['id'] = doc_ref.id
+            inline_photo_url(saved)
             # Convert timestamps
             for time_field in ['created_at', 'updated_at']:
                 if time_field in saved and hasattr(saved[time_field], 'isoformat'):
                     saved[time_field] = saved[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            saved = _convert_keys_to_camel_case(saved)
+            saved = camel_keys(saved)
             
             try:
                 return Profile(**saved)
@@ -510,8 +1319,15 @@ def create_profile_for_user(uid: str, profile_data: Dict[str, Any]) -> Profile:
         raise Exception(f"Failed to create profile for user {uid}: {e}")
 
 
-def update_notice_for_user(uid: str, notice_id: str, update_data: Dict[str, Any]) -> LegalNotice:
-    """Update an existing notice for a user"""
+@firestore_op("write")
+def update_notice_for_user(uid: str, notice_id: str, update_data: Dict[str, Any],
+                           existing: Dict[str, Any] = None) -> LegalNotice:
+    """Update an existing notice for a user.
+
+    Pass the notice as returned by get_notices_for_user in `existing` to write
+    it with a single update; otherwise it is read and merged in the update's
+    transaction. Either way the response is built without reading it back.
+    """
     try:
         # First ensure the user exists
         if not ensure_user_exists(uid):
@@ -525,10 +1341,25 @@ def update_notice_for_user(uid: str, notice_id: str, update_data: Dict[str, Any]
             
         doc_ref = col.document(notice_id)
         update_data['updated_at'] = datetime.utcnow()
-        doc_ref.update(update_data)
+        if existing is not None:
+            doc_ref.update(update_data)
+            merged = {to_snake(key): value for key, value in existing.items() if key != 'id'}
+            merged.update(update_data)
+        else:
+            _, db = init_firebase()
+
+            @_firestore().transactional
+            def _apply_update(transaction):
+                current = doc_ref.get(transaction=transaction).to_dict()
+                if current is None:
+                    raise Exception(f"Notice {notice_id} not found")
+                transaction.update(doc_ref, update_data)
+                return {**current, **update_data}
+
+            merged = _apply_update(db.transaction())
         logger.info(f"Updated notice {notice_id} for user {uid}")
         
-        updated = doc_ref.get().to_dict()
+        updated = _written_record(doc_ref, merged)
         if updated:
             updated['id'] = doc_ref.id
             # Convert timestamps
@@ -537,7 +1368,7 @@ def update_notice_for_user(uid: str, notice_id: str, update_data: Dict[str, Any]
                     updated[time_field] = updated[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            updated = _convert_keys_to_camel_case(updated)
+            updated = camel_keys(updated)
             
             try:
                 return LegalNotice(**updated)
@@ -549,6 +1380,7 @@ def update_notice_for_user(uid: str, notice_id: str, update_data: Dict[str, Any]
         logger.error(f"Error updating notice {notice_id} for user {uid}: {e}")
         raise Exception(f"Failed to update notice for user {uid}: {e}")
 
+@firestore_op("delete")
 def delete_notice_for_user(uid: str, notice_id: str):
     """Delete a notice for a user"""
     try:
@@ -568,10 +1400,17 @@ def delete_notice_for_user(uid: str, notice_id: str):
     except Exception as e:
         logger.error(f"Error deleting notice {notice_id} for user {uid}: {e}")
         raise Exception(f"Failed to delete notice for user {uid}: {e}")
-def update_profile_for_user(uid: str, profile_id: str, update_data: Dict[str, Any]) -> Profile:
-    """Update an existing profile for a user"""
+@firestore_op("write")
+def update_profile_for_user(uid: str, profile_id: str, update_data: Dict[str, Any],
+                            existing: Dict[str, Any] = None) -> Profile:
+    """Update an existing profile for a user.
+
+    Pass the profile as returned by get_profile_for_loan in `existing` to
+    build the response without reading the document back.
+    """
     try:
-        logger.info(f"update_profile_for_user called with profile_id: {profile_id}, update_data: {update_data}")
+        logger.info("update_profile_for_user called with profile_id: %s, update_data: %s",
+                    profile_id, Redacted(update_data))
         col = _profiles_col(uid)
         if not col:
             logger.error(f"Failed to get profiles collection for user {uid}")
@@ -582,25 +1421,31 @@ def update_profile_for_user(uid: str, profile_id: str, update_data: Dict[str, An
             logger.info("Converting jamindars in update_data")
             update_data['jamindars'] = convert_jamindar_keys(
                 update_data['jamindars'], 
-                camel_to_snake
+                to_snake
             )
             
         doc_ref = col.document(profile_id)
         update_data['updated_at'] = datetime.utcnow()
-        logger.info(f"Final update_data to be saved: {update_data}")
+        externalize_photo(update_data)
+        logger.debug("Final update_data to be saved: %s", Redacted(update_data))
         doc_ref.update(update_data)
         logger.info(f"Updated profile {profile_id} for user {uid}")
         
-        updated = doc_ref.get().to_dict()
+        merged = None
+        if existing is not None:
+            merged = {to_snake(key): value for key, value in existing.items()}
+            merged.update(update_data)
+        updated = _written_record(doc_ref, merged)
         if updated:
             updated['id'] = doc_ref.id
+            inline_photo_url(updated)
             # Convert timestamps
             for time_field in ['created_at', 'updated_at']:
                 if time_field in updated and hasattr(updated[time_field], 'isoformat'):
                     updated[time_field] = updated[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            updated = _convert_keys_to_camel_case(updated)
+            updated = camel_keys(updated)
             
             try:
                 return Profile(**updated)
@@ -612,40 +1457,38 @@ def update_profile_for_user(uid: str, profile_id: str, update_data: Dict[str, An
         logger.error(f"Error updating profile {profile_id} for user {uid}: {e}")
         raise Exception(f"Failed to update profile for user {uid}: {e}")
 
+def _notice_snapshot_to_dict(d) -> Dict[str, Any]:
+    data = d.to_dict()
+    if not data:
+        return None
+    data['id'] = d.id
+    # Convert Firestore timestamps to ISO strings
+    if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
+        data['created_at'] = data['created_at'].isoformat()
+    if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
+        data['updated_at'] = data['updated_at'].isoformat()
+
+    # Convert snake_case keys to camelCase
+    return camel_keys(data)
+
+@firestore_op("read")
 def get_notices_for_user(uid: str) -> List[Dict[str, Any]]:
     """Get all notices for a user"""
     try:
-        # First ensure the user exists
-        if not ensure_user_exists(uid):
-            logger.error(f"Failed to ensure user {uid} exists")
-            return []
-            
         col = _notices_col(uid)
         if not col:
             logger.error(f"Failed to get notices collection for user {uid}")
             return []
             
         docs = col.stream()
-        out = []
-        for d in docs:
-            data = d.to_dict()
-            if data:
-                data['id'] = d.id
-                # Convert Firestore timestamps to ISO strings
-                if 'created_at' in data and hasattr(data.get('created_at'), 'isoformat'):
-                    data['created_at'] = data['created_at'].isoformat()
-                if 'updated_at' in data and hasattr(data.get('updated_at'), 'isoformat'):
-                    data['updated_at'] = data['updated_at'].isoformat()
-                
-                # Convert snake_case keys to camelCase
-                converted_data = _convert_keys_to_camel_case(data)
-                out.append(converted_data)
+        out = [notice for notice in (_notice_snapshot_to_dict(d) for d in docs) if notice]
         logger.info(f"Retrieved {len(out)} notices for user {uid}")
         return out
     except Exception as e:
         logger.error(f"Error getting notices for user {uid}: {e}")
         return []
 
+@firestore_op("write")
 def create_notice_for_user(uid: str, notice_data: Dict[str, Any]) -> LegalNotice:
     """Create a new notice for a user"""
     try:
@@ -668,7 +1511,7 @@ def create_notice_for_user(uid: str, notice_data: Dict[str, Any]) -> LegalNotice
         doc_ref.set(notice_data)
         logger.info(f"Created notice {doc_ref.id} for user {uid}")
         
-        saved = doc_ref.get().to_dict()
+        saved = _written_record(doc_ref, notice_data)
         if saved:
             saved['id'] = doc_ref.id
             # Convert timestamps
@@ -677,7 +1520,7 @@ def create_notice_for_user(uid: str, notice_data: Dict[str, Any]) -> LegalNotice
                     saved[time_field] = saved[time_field].isoformat()
             
             # Convert snake_case keys to camelCase
-            saved = _convert_keys_to_camel_case(saved)
+            saved = camel_keys(saved)
             
             try:
                 return LegalNotice(**saved)
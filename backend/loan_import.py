@@ -0,0 +1,95 @@
+"""
+Parsing and validation for POST /loans/bulk.
+
+Uploads are a JSON array of loan objects or a CSV file whose header names
+LoanCreate fields (camelCase or snake_case). Every row is validated with
+LoanCreate independently, so one bad row never rejects the whole upload.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from models import LoanCreate
+
+# CSV cells holding JSON lists
+JSON_COLUMNS = {'jamindars', 'payment_records', 'paymentRecords'}
+
+
+class BulkParseError(Exception):
+    pass
+
+
+def parse_csv_rows(text: str) -> List[Dict[str, Any]]:
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    if not reader.fieldnames:
+        raise BulkParseError("CSV upload has no header row")
+    rows = []
+    for record in reader:
+        row = {}
+        for column, value in record.items():
+            if column is None or value is None:
+                continue
+            column = column.strip()
+            value = value.strip()
+            if value == '':
+                continue  # Empty cells fall back to the model defaults
+            if column in JSON_COLUMNS:
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass  # Left as text; LoanCreate reports the type error
+            row[column] = value
+        rows.append(row)
+    return rows
+
+
+def parse_json_rows(body: bytes) -> List[Any]:
+    try:
+        rows = json.loads(body)
+    except ValueError as e:
+        raise BulkParseError(f"Invalid JSON: {e}")
+    if isinstance(rows, dict) and isinstance(rows.get('loans'), list):
+        rows = rows['loans']
+    if not isinstance(rows, list):
+        raise BulkParseError("Expected a JSON array of loans")
+    return rows
+
+
+def parse_upload(content_type: str, body: bytes) -> List[Any]:
+    """Rows of a JSON or CSV upload, picked by Content-Type"""
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in ('text/csv', 'application/csv', 'text/plain'):
+        try:
+            return parse_csv_rows(body.decode('utf-8'))
+        except UnicodeDecodeError:
+            raise BulkParseError("CSV upload must be UTF-8 encoded")
+    return parse_json_rows(body)
+
+
+def _format_error(error: Dict[str, Any]) -> str:
+    location = '.'.join(str(part) for part in error.get('loc', ()))
+    return f"{location}: {error['msg']}" if location else error['msg']
+
+
+def validate_rows(rows: List[Any]) -> Tuple[List[Tuple[int, Dict[str, Any]]], Dict[int, List[str]]]:
+    """Validate rows with LoanCreate.
+
+    Returns ([(row_index, snake_case loan data)], {row_index: [error, ...]})
+    with 0-based row indexes.
+    """
+    valid, errors = [], {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = ["Expected a loan object"]
+            continue
+        try:
+            loan = LoanCreate.model_validate(row)
+        except ValidationError as e:
+            errors[index] = [_format_error(error) for error in e.errors()]
+            continue
+        valid.append((index, loan.dict(by_alias=False)))
+    return valid, errors
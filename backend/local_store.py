@@ -0,0 +1,1283 @@
+"""
+Local stand-in for the Firestore client used by firestore_repo.
+
+It implements the small part of the google-cloud-firestore API the backend
+relies on (collections, documents, get/set/update/delete, where/order_by/
+limit queries) on top of either a plain in-process dict or a SQLite file.
+Select it with SAVKAR_STORAGE_BACKEND=memory or SAVKAR_STORAGE_BACKEND=sqlite
+(and optionally SAVKAR_SQLITE_PATH) to run the API without live Firestore.
+
+Queries are planned by the engine rather than evaluated over a full scan:
+the memory engine keeps per-field indexes (value -> ids, array element ->
+ids, ids in sort order) built on first use and maintained on every write;
+the SQLite engine pushes filters, ordering, cursors and limits into SQL and
+creates an expression index for each query shape the first time it runs,
+much like Firestore composite indexes. Shapes neither engine can plan fall
+back to evaluating the query in Python.
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from tracing import traced_rpc
+
+try:
+    from google.cloud.firestore_v1.transforms import (
+        ArrayUnion, DELETE_FIELD, Increment, SERVER_TIMESTAMP,
+    )
+except Exception:
+    # google-cloud-firestore not installed; provide equivalents for local use
+    class _Sentinel:
+        def __init__(self, description):
+            self.description = description
+
+    DELETE_FIELD = _Sentinel("Value used to delete a field in a document.")
+    SERVER_TIMESTAMP = _Sentinel("Value used to set a document field to the server timestamp.")
+
+    class Increment:
+        def __init__(self, value):
+            self.value = value
+
+    class ArrayUnion:
+        def __init__(self, values):
+            self.values = values
+
+# Auto-generated document ids look like Firestore ones (20 alphanumerics)
+_ID_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+
+class NotFound(Exception):
+    """Raised by DocumentReference.update() when the document is missing"""
+
+
+def _auto_id() -> str:
+    raw = uuid.uuid4().int
+    chars = []
+    for _ in range(20):
+        raw, idx = divmod(raw, len(_ID_ALPHABET))
+        chars.append(_ID_ALPHABET[idx])
+    return ''.join(chars)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _get_field(data: Dict[str, Any], field_path: str):
+    """Resolve a dotted field path, returning (found, value)"""
+    current = data
+    for part in field_path.split('.'):
+        if not isinstance(current, dict) or part not in current:
+            return False, None
+        current = current[part]
+    return True, current
+
+
+def _set_field(data: Dict[str, Any], field_path: str, value: Any):
+    parts = field_path.split('.')
+    current = data
+    for part in parts[:-1]:
+        nxt = current.get(part)
+        if not isinstance(nxt, dict):
+            nxt = {}
+            current[part] = nxt
+        current = nxt
+    current[parts[-1]] = _resolve(value, current.get(parts[-1]))
+    if current[parts[-1]] is DELETE_FIELD:
+        del current[parts[-1]]
+
+
+def _resolve(value: Any, existing: Any) -> Any:
+    """Apply a Firestore field transform against the value currently stored"""
+    if value is SERVER_TIMESTAMP:
+        return _now()
+    if isinstance(value, Increment):
+        base = existing if isinstance(existing, (int, float)) and not isinstance(existing, bool) else 0
+        return base + value.value
+    if isinstance(value, ArrayUnion):
+        base = list(existing) if isinstance(existing, list) else []
+        return base + [v for v in value.values if v not in base]
+    if isinstance(value, dict):
+        return {k: _resolve(v, None) for k, v in value.items() if v is not DELETE_FIELD}
+    return value
+
+
+def _merge(target: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep-merge updates into target the way set(..., merge=True) does"""
+    for key, value in updates.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            existing = target.get(key)
+            target[key] = _merge(existing if isinstance(existing, dict) else {}, value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+    return target
+
+
+# ---------------------------------------------------------------------------
+# Query evaluation
+# ---------------------------------------------------------------------------
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Range operators whose value has to be of the same type as the field
+_RANGE_OPS = ('<', '<=', '>', '>=')
+
+
+def _sort_key(value):
+    # Firestore orders mixed types by type first; None sorts lowest
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    return (5, str(value))
+
+
+def _matches(data: Dict[str, Any], field_path: str, op: str, value: Any) -> bool:
+    found, current = _get_field(data, field_path)
+    if op == '==':
+        return found and current == value
+    if op == '!=':
+        return found and current != value and current is not None
+    if op == 'in':
+        return found and current in value
+    if op == 'not-in':
+        return found and current not in value and current is not None
+    if op == 'array_contains':
+        return found and isinstance(current, list) and value in current
+    if op == 'array_contains_any':
+        return found and isinstance(current, list) and any(v in current for v in value)
+    if not found or current is None:
+        return False
+    left, right = _sort_key(current), _sort_key(value)
+    if left[0] != right[0]:
+        return False
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    if op == '>':
+        return left > right
+    if op == '>=':
+        return left >= right
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+def _field_value(doc_id: str, data: Dict[str, Any], field_path: str):
+    if field_path == '__name__':
+        return True, doc_id
+    return _get_field(data, field_path)
+
+
+def _order_values(orders, doc_id: str, data: Dict[str, Any]) -> List[Any]:
+    return [_field_value(doc_id, data, field_path)[1] for field_path, _ in orders]
+
+
+def _compare(orders, left: List[Any], right: List[Any]) -> int:
+    for a, b, (_, direction) in zip(left, right, orders):
+        ka, kb = _sort_key(a), _sort_key(b)
+        if ka == kb:
+            continue
+        result = -1 if ka < kb else 1
+        return -result if direction == DESCENDING else result
+    return 0
+
+
+def _with_tie_breaker(orders) -> List[Tuple[str, str]]:
+    """The query's orders plus the document id, which Firestore always sorts by last"""
+    orders = list(orders)
+    if '__name__' not in [field_path for field_path, _ in orders]:
+        orders.append(('__name__', ASCENDING))
+    return orders
+
+
+def _window(rows, orders, filters=(), start=None, offset=None, limit=None):
+    """Apply filters, the start cursor, offset and limit to rows that are
+    already in query order, stopping as soon as the page is full"""
+    out = []
+    if limit is not None and limit <= 0:
+        return out
+    skip = offset or 0
+    for row in rows:
+        doc_id, data = row[0], row[1]
+        if filters and not all(_matches(data, f, op, v) for f, op, v in filters):
+            continue
+        if start is not None:
+            values, inclusive = start
+            c = _compare(orders, _order_values(orders, doc_id, data)[:len(values)], values)
+            if c < 0 or (c == 0 and not inclusive):
+                continue
+        if skip:
+            skip -= 1
+            continue
+        out.append(row)
+        if limit is not None and len(out) >= limit:
+            break
+    return out
+
+
+def _evaluate(rows, filters, orders, start=None, offset=None, limit=None):
+    """Evaluate a query over (doc_id, data, create_time, update_time) rows by
+    brute force; engines use it for query shapes they cannot plan.
+    orders must end with the __name__ tie-breaker (_with_tie_breaker)."""
+    kept = []
+    for row in rows:
+        data = row[1]
+        if any(not _get_field(data, f)[0] for f, _ in orders if f != '__name__'):
+            continue  # Firestore omits documents missing an order_by field
+        if all(_matches(data, f, op, v) for f, op, v in filters):
+            kept.append(row)
+    kept.sort(key=functools.cmp_to_key(
+        lambda a, b: _compare(orders, _order_values(orders, a[0], a[1]), _order_values(orders, b[0], b[1]))))
+    return _window(kept, orders, start=start, offset=offset, limit=limit)
+
+
+# ---------------------------------------------------------------------------
+# Storage engines
+# ---------------------------------------------------------------------------
+
+_EMPTY = frozenset()
+
+
+def _hashable(value) -> bool:
+    return value is None or isinstance(value, (str, int, float, datetime))
+
+
+def _first(entry):
+    return entry[0]
+
+
+class _FieldIndex:
+    """Index of one field of one collection: ids by value, ids by array
+    element and (sort key, id) entries in ascending Firestore order"""
+
+    def __init__(self, field_path: str, docs: Dict[str, Tuple[Dict[str, Any], datetime, datetime]]):
+        self.field_path = field_path
+        self.by_value: Dict[Any, set] = {}
+        self.by_element: Dict[Any, set] = {}
+        self.keys: Dict[str, Any] = {}
+        for doc_id, (data, _, _) in docs.items():
+            self._add(doc_id, data)
+        self.ordered = sorted((key, doc_id) for doc_id, key in self.keys.items())
+
+    def _add(self, doc_id: str, data: Dict[str, Any]):
+        found, value = _field_value(doc_id, data, self.field_path)
+        if not found:
+            return None
+        key = self.keys[doc_id] = _sort_key(value)
+        if _hashable(value):
+            self.by_value.setdefault(value, set()).add(doc_id)
+        if isinstance(value, list):
+            for element in value:
+                if _hashable(element):
+                    self.by_element.setdefault(element, set()).add(doc_id)
+        return key
+
+    def add(self, doc_id: str, data: Dict[str, Any]):
+        key = self._add(doc_id, data)
+        if key is not None:
+            insort(self.ordered, (key, doc_id))
+
+    def remove(self, doc_id: str, data: Dict[str, Any]):
+        key = self.keys.pop(doc_id, None)
+        if key is None:
+            return
+        del self.ordered[bisect_left(self.ordered, (key, doc_id))]
+        _, value = _field_value(doc_id, data, self.field_path)
+        if _hashable(value):
+            _discard(self.by_value, value, doc_id)
+        if isinstance(value, list):
+            for element in value:
+                if _hashable(element):
+                    _discard(self.by_element, element, doc_id)
+
+    def lookup(self, op: str, value: Any):
+        """Ids matching `field op value` exactly, or None if the index cannot tell"""
+        if op == '==' and _hashable(value):
+            return self.by_value.get(value, _EMPTY)
+        if op == 'in' and isinstance(value, (list, tuple)) and all(_hashable(v) for v in value):
+            return set().union(*(self.by_value.get(v, _EMPTY) for v in value))
+        if op == 'array_contains' and _hashable(value):
+            return self.by_element.get(value, _EMPTY)
+        return None
+
+
+def _discard(ids_by_value: Dict[Any, set], value: Any, doc_id: str):
+    ids = ids_by_value.get(value)
+    if ids is not None:
+        ids.discard(doc_id)
+        if not ids:
+            del ids_by_value[value]
+
+
+def _narrow(entries, lo: int, hi: int, op: str, value: Any) -> Tuple[int, int]:
+    """Shrink [lo, hi) of ascending (sort key, id) entries to those where
+    `field op value` can hold, including the same-type requirement"""
+    key = _sort_key(value)
+    lo = max(lo, bisect_left(entries, (key[0],), lo, hi, key=_first))
+    hi = min(hi, bisect_left(entries, (key[0] + 1,), lo, hi, key=_first))
+    if op == '>':
+        lo = bisect_right(entries, key, lo, hi, key=_first)
+    elif op == '>=':
+        lo = bisect_left(entries, key, lo, hi, key=_first)
+    elif op == '<':
+        hi = bisect_left(entries, key, lo, hi, key=_first)
+    elif op == '<=':
+        hi = bisect_right(entries, key, lo, hi, key=_first)
+    return lo, max(lo, hi)
+
+
+class MemoryEngine:
+    """Keeps every collection in a dict of {doc_id: (data, create_time, update_time)}.
+
+    Stored dicts are never mutated in place (put() replaces the entry), so
+    reads hand them out without copying; DocumentSnapshot.to_dict() copies.
+    A field gets a _FieldIndex the first time a query filters or orders on
+    it; from then on every put() and delete() keeps it current.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Tuple[Dict[str, Any], datetime, datetime]]] = {}
+        self._indexes: Dict[str, Dict[str, _FieldIndex]] = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def atomic(self):
+        """Hold the engine lock so a group of reads and writes is applied as one unit"""
+        with self._lock:
+            yield
+
+    def get(self, col_path: str, doc_id: str):
+        with self._lock:
+            entry = self._collections.get(col_path, {}).get(doc_id)
+            if entry is None:
+                return None
+            return entry
+
+    def put(self, col_path: str, doc_id: str, data: Dict[str, Any]):
+        with self._lock:
+            col = self._collections.setdefault(col_path, {})
+            now = _now()
+            existing = col.get(doc_id)
+            created = existing[1] if existing else now
+            stored = copy.deepcopy(data)
+            col[doc_id] = (stored, created, now)
+            for index in self._indexes.get(col_path, {}).values():
+                if existing:
+                    index.remove(doc_id, existing[0])
+                index.add(doc_id, stored)
+            return now
+
+    def delete(self, col_path: str, doc_id: str):
+        with self._lock:
+            existing = self._collections.get(col_path, {}).pop(doc_id, None)
+            if existing:
+                for index in self._indexes.get(col_path, {}).values():
+                    index.remove(doc_id, existing[0])
+
+    def list(self, col_path: str) -> Iterable[Tuple[str, Dict[str, Any], datetime, datetime]]:
+        with self._lock:
+            items = sorted(self._collections.get(col_path, {}).items())
+        for doc_id, (data, created, updated) in items:
+            yield doc_id, data, created, updated
+
+    def _index(self, col_path: str, field_path: str) -> _FieldIndex:
+        indexes = self._indexes.setdefault(col_path, {})
+        index = indexes.get(field_path)
+        if index is None:
+            index = indexes[field_path] = _FieldIndex(field_path, self._collections.get(col_path, {}))
+        return index
+
+    def query(self, col_path: str, filters, orders, start=None, offset=None, limit=None, keys_only=False):
+        """Rows (doc_id, data, create_time, update_time) of a query; orders
+        end with the __name__ tie-breaker and start is (values, inclusive)"""
+        with self._lock:
+            col = self._collections.get(col_path)
+            if not col:
+                return []
+
+            # Intersect the equality / membership filters the indexes answer
+            matched, remaining = [], []
+            for field_path, op, value in filters:
+                ids = self._index(col_path, field_path).lookup(op, value)
+                if ids is None:
+                    remaining.append((field_path, op, value))
+                else:
+                    matched.append(ids)
+            candidates = None
+            if matched:
+                matched.sort(key=len)
+                candidates = matched[0].intersection(*matched[1:]) if len(matched) > 1 else matched[0]
+
+            field_path, direction = orders[0]
+            if len(orders) > 2 or (len(orders) == 2 and orders[1] != ('__name__', direction)):
+                # Mixed directions or several sort fields: sort the candidates
+                rows = ((doc_id,) + col[doc_id] for doc_id in (col if candidates is None else candidates))
+                return _evaluate(rows, remaining, orders, start, offset, limit)
+
+            index = self._index(col_path, field_path)
+            entries, member = index.ordered, candidates
+            if candidates is not None and len(candidates) * 4 < len(entries):
+                entries = sorted((index.keys[doc_id], doc_id) for doc_id in candidates if doc_id in index.keys)
+                member = None
+
+            lo, hi = 0, len(entries)
+            for f, op, value in remaining:
+                if f == field_path and op in _RANGE_OPS and value is not None:
+                    lo, hi = _narrow(entries, lo, hi, op, value)
+            if start is not None:
+                lo, hi = self._seek(entries, lo, hi, direction, *start)
+
+            positions = range(lo, hi) if direction != DESCENDING else range(hi - 1, lo - 1, -1)
+            rows = (
+                (doc_id,) + col[doc_id]
+                for doc_id in (entries[i][1] for i in positions)
+                if member is None or doc_id in member
+            )
+            return _window(rows, orders, remaining, offset=offset, limit=limit)
+
+    def count(self, col_path: str, filters, orders, start=None, offset=None, limit=None) -> int:
+        return len(self.query(col_path, filters, orders, start, offset, limit))
+
+    @staticmethod
+    def _seek(entries, lo: int, hi: int, direction: str, values: List[Any], inclusive: bool):
+        """Restrict [lo, hi) to the entries after (or at) a cursor of one sort
+        value, optionally followed by the document id"""
+        if len(values) >= 2 and isinstance(values[1], str):
+            target, key = (_sort_key(values[0]), values[1]), None
+        else:
+            target, key = _sort_key(values[0]), _first
+        if direction != DESCENDING:
+            find = bisect_left if inclusive else bisect_right
+            lo = max(lo, find(entries, target, lo, hi, key=key))
+        else:
+            find = bisect_right if inclusive else bisect_left
+            hi = min(hi, find(entries, target, lo, hi, key=key))
+        return lo, max(lo, hi)
+
+    def collections(self, parent_path: str) -> List[str]:
+        prefix = parent_path + '/' if parent_path else ''
+        depth = prefix.count('/')
+        with self._lock:
+            paths = [p for p in self._collections if p.startswith(prefix) and p.count('/') == depth]
+        return sorted(p[len(prefix):] for p in paths)
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        # Stored in UTC so ISO strings sort in time order inside SQLite
+        return {'__datetime__': _utc(value).isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not storable")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+# Field paths that can be inlined into a JSON path of a SQL expression
+_SQL_FIELD_PATH = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*\Z')
+
+
+def _rank_sql(field_path: str) -> str:
+    """SQL for the type rank _sort_key gives a field; NULL when the field is missing"""
+    return (
+        f"CASE json_type(data, '$.{field_path}') WHEN 'null' THEN 0 WHEN 'true' THEN 1 WHEN 'false' THEN 1 "
+        f"WHEN 'integer' THEN 2 WHEN 'real' THEN 2 WHEN 'text' THEN 4 WHEN 'array' THEN 5 "
+        f"WHEN 'object' THEN CASE WHEN json_type(data, '$.{field_path}.__datetime__') = 'text' "
+        f"THEN 3 ELSE 5 END END"
+    )
+
+
+def _value_sql(field_path: str) -> str:
+    """SQL for the value of a field within its rank (ISO text for datetimes)"""
+    return f"COALESCE(json_extract(data, '$.{field_path}.__datetime__'), json_extract(data, '$.{field_path}'))"
+
+
+def _sql_key(value) -> Optional[Tuple[int, Any]]:
+    """(rank, value) of a Python value as _rank_sql/_value_sql compute them,
+    or None for values SQLite cannot compare exactly (maps, arrays)"""
+    if value is None:
+        return 0, None
+    if isinstance(value, bool):
+        return 1, int(value)
+    if isinstance(value, (int, float)):
+        return 2, value
+    if isinstance(value, datetime):
+        return 3, _utc(value).isoformat()
+    if isinstance(value, str):
+        return 4, value
+    return None
+
+
+def _array_element(value) -> bool:
+    return isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+class SQLiteEngine:
+    """Persists documents as JSON rows in a single SQLite table.
+
+    Elements of top-level arrays are copied into array_values so
+    array_contains is an index lookup; other filters and sort orders are
+    evaluated with json_extract expressions backed by indexes created per
+    query shape on first use.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._indexes = set()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                ' collection TEXT NOT NULL,'
+                ' id TEXT NOT NULL,'
+                ' data TEXT NOT NULL,'
+                ' create_time TEXT NOT NULL,'
+                ' update_time TEXT NOT NULL,'
+                ' PRIMARY KEY (collection, id))'
+            )
+            backfill = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'array_values'"
+            ).fetchone() is None
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS array_values ('
+                ' collection TEXT NOT NULL,'
+                ' field TEXT NOT NULL,'
+                ' value NOT NULL,'
+                ' id TEXT NOT NULL,'
+                ' PRIMARY KEY (collection, field, value, id)) WITHOUT ROWID'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS array_values_by_doc ON array_values (collection, id)')
+            if backfill:
+                # Database written before array_values existed
+                for col_path, doc_id, data in self._conn.execute(
+                        'SELECT collection, id, data FROM documents').fetchall():
+                    self._put_array_values(col_path, doc_id, json.loads(data))
+            self._conn.commit()
+
+    @contextmanager
+    def atomic(self):
+        """Group writes into a single SQLite transaction"""
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.rollback()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.commit()
+
+    def _commit(self):
+        if self._depth == 0:
+            self._conn.commit()
+
+    @staticmethod
+    def _decode(row):
+        doc_id, data, created, updated = row
+        return (
+            doc_id,
+            json.loads(data, object_hook=_json_object_hook) if data is not None else {},
+            datetime.fromisoformat(created),
+            datetime.fromisoformat(updated),
+        )
+
+    def get(self, col_path: str, doc_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, data, create_time, update_time FROM documents WHERE collection = ? AND id = ?',
+                (col_path, doc_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._decode(row)[1:]
+
+    def _put_array_values(self, col_path: str, doc_id: str, data: Dict[str, Any]):
+        self._conn.execute('DELETE FROM array_values WHERE collection = ? AND id = ?', (col_path, doc_id))
+        rows = [
+            (col_path, field, element, doc_id)
+            for field, value in data.items() if isinstance(value, list)
+            for element in value if _array_element(element)
+        ]
+        if rows:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO array_values (collection, field, value, id) VALUES (?, ?, ?, ?)', rows)
+
+    def put(self, col_path: str, doc_id: str, data: Dict[str, Any]):
+        now = _now()
+        payload = json.dumps(data, default=_json_default)
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO documents (collection, id, data, create_time, update_time) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (collection, id) DO UPDATE SET data = excluded.data, update_time = excluded.update_time',
+                (col_path, doc_id, payload, now.isoformat(), now.isoformat()),
+            )
+            self._put_array_values(col_path, doc_id, data)
+            self._commit()
+        return now
+
+    def delete(self, col_path: str, doc_id: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM documents WHERE collection = ? AND id = ?', (col_path, doc_id))
+            self._conn.execute('DELETE FROM array_values WHERE collection = ? AND id = ?', (col_path, doc_id))
+            self._commit()
+
+    def list(self, col_path: str):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, data, create_time, update_time FROM documents WHERE collection = ? ORDER BY id',
+                (col_path,),
+            ).fetchall()
+        for row in rows:
+            yield self._decode(row)
+
+    @staticmethod
+    def _filter_sql(col_path: str, field_path: str, op: str, value: Any):
+        """(sql, params, equality?) evaluating a filter exactly, or None"""
+        if not _SQL_FIELD_PATH.match(field_path):
+            return None
+        if op == 'array_contains':
+            if '.' in field_path or not _array_element(value):
+                return None
+            return ('id IN (SELECT id FROM array_values WHERE collection = ? AND field = ? AND value = ?)',
+                    [col_path, field_path, value], False)
+        key = _sql_key(value)
+        if key is None or key[0] == 5 or (op in _RANGE_OPS and value is None):
+            return None
+        if op == '==' and key[0] in (1, 2):
+            # Like Python (and _matches), True == 1 and False == 0.0
+            return f'{_rank_sql(field_path)} IN (1, 2) AND {_value_sql(field_path)} IS ?', [key[1]], True
+        if op == '==':
+            return f'{_rank_sql(field_path)} = ? AND {_value_sql(field_path)} IS ?', list(key), True
+        if op in _RANGE_OPS:
+            return f'{_rank_sql(field_path)} = ? AND {_value_sql(field_path)} {op} ?', list(key), False
+        return None
+
+    @staticmethod
+    def _cursor_sql(orders, values: List[Any], inclusive: bool):
+        """(sql, params) keeping rows after (or at) a cursor, or None"""
+        terms = []
+        for (field_path, direction), value in zip(orders, values):
+            if field_path == '__name__':
+                if not isinstance(value, str):
+                    return None
+                terms.append(('id', direction, value))
+                continue
+            key = _sql_key(value)
+            if key is None or key[0] == 5:
+                return None
+            terms.append((_rank_sql(field_path), direction, key[0]))
+            terms.append((_value_sql(field_path), direction, key[1]))
+
+        directions = {direction for _, direction, _ in terms}
+        if len(directions) == 1 and all(param is not None for _, _, param in terms):
+            # A row value comparison lets SQLite seek the index to the cursor
+            op = ('<' if DESCENDING in directions else '>') + ('=' if inclusive else '')
+            columns = ', '.join(expr for expr, _, _ in terms)
+            marks = ', '.join('?' for _ in terms)
+            return f'({columns}) {op} ({marks})', [param for _, _, param in terms]
+
+        clauses, params = [], []
+        for i, (expr, direction, param) in enumerate(terms):
+            equal = [f'{e} IS ?' for e, _, _ in terms[:i]]
+            clauses.append('(' + ' AND '.join(equal + [f"{expr} {'<' if direction == DESCENDING else '>'} ?"]) + ')')
+            params.extend([p for _, _, p in terms[:i]] + [param])
+        if inclusive:
+            clauses.append('(' + ' AND '.join(f'{e} IS ?' for e, _, _ in terms) + ')')
+            params.extend(p for _, _, p in terms)
+        return '(' + ' OR '.join(clauses) + ')', params
+
+    def _ensure_index(self, columns: List[str]):
+        """Create the expression index for a query shape the first time it is seen"""
+        name = 'documents_' + hashlib.sha1('|'.join(columns).encode()).hexdigest()[:16]
+        if name in self._indexes:
+            return
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON documents (collection, {', '.join(columns)})")
+        self._conn.commit()
+        self._indexes.add(name)
+
+    def _compile(self, col_path: str, filters, orders, start):
+        """Translate the parts of a query SQLite evaluates exactly; returns
+        (where, params, order_by, index columns, remaining filters, start
+        cursor left to Python)"""
+        where, params, remaining = ['collection = ?'], [col_path], []
+        equal_columns, range_columns = [], []
+        pinned_ranks = set()  # fields a filter restricts to a single type rank
+        for field_path, op, value in filters:
+            compiled = self._filter_sql(col_path, field_path, op, value)
+            if compiled is None:
+                remaining.append((field_path, op, value))
+                continue
+            sql, values, equality = compiled
+            where.append(sql)
+            params.extend(values)
+            if op == 'array_contains':
+                continue
+            if len(values) == 2:  # (rank, value) parameters
+                pinned_ranks.add(field_path)
+            columns = [_rank_sql(field_path), _value_sql(field_path)]
+            (equal_columns if equality else range_columns).extend(columns)
+
+        order_terms, order_columns = [], []
+        for field_path, direction in orders:
+            sort = 'DESC' if direction == DESCENDING else 'ASC'
+            if field_path == '__name__':
+                order_terms.append(f'id {sort}')
+                continue
+            where.append(f"json_type(data, '$.{field_path}') IS NOT NULL")
+            if field_path not in pinned_ranks:
+                # SQLite only skips constant ORDER BY terms that are plain columns
+                order_terms.append(f'{_rank_sql(field_path)} {sort}')
+            order_terms.append(f'{_value_sql(field_path)} {sort}')
+            if not order_columns:
+                order_columns = [_rank_sql(field_path), _value_sql(field_path)]
+
+        python_start = start
+        if start is not None:
+            compiled = self._cursor_sql(orders, *start)
+            if compiled is not None:
+                where.append(compiled[0])
+                params.extend(compiled[1])
+                python_start = None
+
+        index_columns = equal_columns + (order_columns or range_columns[:2])
+        return ' AND '.join(where), params, ', '.join(order_terms), index_columns, remaining, python_start
+
+    def query(self, col_path: str, filters, orders, start=None, offset=None, limit=None, keys_only=False):
+        """Rows (doc_id, data, create_time, update_time) of a query; orders
+        end with the __name__ tie-breaker and start is (values, inclusive)"""
+        if any(f != '__name__' and not _SQL_FIELD_PATH.match(f) for f, _ in orders):
+            return _evaluate(self.list(col_path), filters, orders, start, offset, limit)
+
+        where, params, order_by, index_columns, remaining, python_start = \
+            self._compile(col_path, filters, orders, start)
+        exact = not remaining and python_start is None
+        columns = 'id, NULL, create_time, update_time' if keys_only and exact else \
+            'id, data, create_time, update_time'
+        sql = f'SELECT {columns} FROM documents WHERE {where} ORDER BY {order_by}'
+        if exact and (limit is not None or offset):
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset or 0]
+
+        with self._lock:
+            if index_columns:
+                self._ensure_index(index_columns + ['id'])
+            rows = (self._decode(row) for row in self._conn.execute(sql, params))
+            if exact:
+                return list(rows)
+            return _window(rows, orders, remaining, python_start, offset, limit)
+
+    def count(self, col_path: str, filters, orders, start=None, offset=None, limit=None) -> int:
+        if any(f != '__name__' and not _SQL_FIELD_PATH.match(f) for f, _ in orders):
+            return len(self.query(col_path, filters, orders, start, offset, limit, keys_only=True))
+        where, params, _, index_columns, remaining, python_start = self._compile(col_path, filters, orders, start)
+        if remaining or python_start is not None:
+            return len(self.query(col_path, filters, orders, start, offset, limit, keys_only=True))
+        with self._lock:
+            if index_columns:
+                self._ensure_index(index_columns + ['id'])
+            count = self._conn.execute(f'SELECT COUNT(*) FROM documents WHERE {where}', params).fetchone()[0]
+        count = max(0, count - (offset or 0))
+        return count if limit is None else min(count, limit)
+
+    def collections(self, parent_path: str) -> List[str]:
+        prefix = parent_path + '/' if parent_path else ''
+        depth = prefix.count('/')
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT collection FROM documents').fetchall()
+        paths = [r[0] for r in rows if r[0].startswith(prefix) and r[0].count('/') == depth]
+        return sorted(p[len(prefix):] for p in paths)
+
+
+# ---------------------------------------------------------------------------
+# Firestore-shaped client objects
+# ---------------------------------------------------------------------------
+
+class DocumentSnapshot:
+    def __init__(self, reference, data: Optional[Dict[str, Any]], create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str):
+        found, value = _get_field(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return value
+
+
+class DocumentReference:
+    def __init__(self, client, col_path: str, doc_id: str):
+        self._client = client
+        self._col_path = col_path
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._col_path}/{self.id}"
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self._col_path)
+
+    def collection(self, name: str):
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    @traced_rpc('list_collection_ids')
+    def collections(self):
+        return [self.collection(name) for name in self._client._engine.collections(self.path)]
+
+    @traced_rpc('batch_get_documents')
+    def get(self, field_paths=None, transaction=None):
+        return self._snapshot(field_paths)
+
+    def _snapshot(self, field_paths=None):
+        entry = self._client._engine.get(self._col_path, self.id)
+        if entry is None:
+            return DocumentSnapshot(self, None)
+        data, created, updated = entry
+        if field_paths is not None:
+            data = _project(data, field_paths)
+        return DocumentSnapshot(self, data, created, updated)
+
+    @traced_rpc('commit')
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        return self._client._apply(('set', self, document_data, merge))
+
+    @traced_rpc('commit')
+    def update(self, field_updates: Dict[str, Any]):
+        return self._client._apply(('update', self, field_updates, False))
+
+    @traced_rpc('commit')
+    def delete(self):
+        return self._client._apply(('delete', self, None, False))
+
+
+def _project(data: Dict[str, Any], field_paths: Iterable[str]) -> Dict[str, Any]:
+    projected = {}
+    for field_path in field_paths:
+        found, value = _get_field(data, field_path)
+        if found:
+            _set_field(projected, field_path, value)
+    return projected
+
+
+class Query:
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, client, col_path: str, filters=None, orders=None, limit=None,
+                 offset=None, start=None, projection=None):
+        self._client = client
+        self._col_path = col_path
+        self._filters = filters or []
+        self._orders = orders or []
+        self._limit = limit
+        self._offset = offset
+        self._start = start
+        self._projection = projection
+
+    def _copy(self, **changes):
+        params = dict(
+            filters=self._filters, orders=self._orders, limit=self._limit,
+            offset=self._offset, start=self._start, projection=self._projection,
+        )
+        params.update(changes)
+        return Query(self._client, self._col_path, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + [(field_path, direction)])
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int):
+        return self._copy(offset=num_to_skip)
+
+    def select(self, field_paths: Iterable[str]):
+        return self._copy(projection=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, True))
+
+    def _cursor_values(self, cursor, orders) -> List[Any]:
+        if isinstance(cursor, DocumentSnapshot):
+            return _order_values(orders, cursor.id, cursor._data or {})
+        if isinstance(cursor, dict):
+            cursor = [cursor.get(f) if f == '__name__' else _get_field(cursor, f)[1] for f, _ in self._orders]
+        return [v.id if isinstance(v, DocumentReference) else v for v in cursor]
+
+    def _plan(self) -> Dict[str, Any]:
+        """Arguments of the engine's query() and count() for this query"""
+        orders = _with_tie_breaker(self._orders)
+        start = None
+        if self._start is not None:
+            cursor, inclusive = self._start
+            start = (self._cursor_values(cursor, orders), inclusive)
+        return dict(col_path=self._col_path, filters=self._filters, orders=orders, start=start,
+                    offset=self._offset, limit=self._limit)
+
+    def _run(self) -> List[DocumentSnapshot]:
+        rows = self._client._engine.query(**self._plan(), keys_only=self._projection == [])
+
+        parent = CollectionReference(self._client, self._col_path)
+        out = []
+        for doc_id, data, created, updated in rows:
+            if self._projection is not None:
+                data = _project(data, self._projection)
+            out.append(DocumentSnapshot(parent.document(doc_id), data, created, updated))
+        return out
+
+    @traced_rpc('run_query')
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    @traced_rpc('run_query')
+    def get(self, transaction=None):
+        return self._run()
+
+    def count(self, alias: str = None) -> 'AggregationQuery':
+        return AggregationQuery(self, alias or 'count')
+
+
+class AggregationResult:
+    def __init__(self, alias: str, value: Any):
+        self.alias = alias
+        self.value = value
+        self.read_time = None
+
+
+class AggregationQuery:
+    """Query.count() result; get() returns [[AggregationResult]] like Firestore"""
+
+    def __init__(self, query: Query, alias: str):
+        self._query = query
+        self._alias = alias
+
+    @traced_rpc('run_aggregation_query')
+    def get(self, transaction=None) -> List[List[AggregationResult]]:
+        count = self._query._client._engine.count(**self._query._plan())
+        return [[AggregationResult(self._alias, count)]]
+
+
+class CollectionReference(Query):
+    def __init__(self, client, col_path: str):
+        super().__init__(client, col_path)
+
+    @property
+    def id(self) -> str:
+        return self._col_path.rsplit('/', 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, self._col_path, document_id or _auto_id())
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        doc_ref = self.document(document_id)
+        update_time = doc_ref.set(document_data)
+        return update_time, doc_ref
+
+    @traced_rpc('list_documents')
+    def list_documents(self):
+        return [self.document(doc_id) for doc_id, *_ in self._client._engine.list(self._col_path)]
+
+
+class WriteBatch:
+    """Buffers writes and applies them together on commit()"""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference, document_data, merge))
+        return self
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference, field_updates, False))
+        return self
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+        return self
+
+    @traced_rpc('commit')
+    def commit(self):
+        with self._client._engine.atomic():
+            results = [self._client._apply(write) for write in self._writes]
+        self._writes = []
+        return results
+
+
+class Transaction(WriteBatch):
+    """Local transaction compatible with google.cloud.firestore.transactional.
+
+    The engine lock is held from _begin() until commit or rollback, so a
+    read-modify-write can never be interleaved with another writer and a
+    local transaction never has to retry.
+    """
+
+    def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._atomic = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+    @traced_rpc('batch_get_documents')
+    def get_all(self, references):
+        return iter([reference._snapshot() for reference in references])
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    @traced_rpc('begin_transaction')
+    def _begin(self, retry_id=None):
+        self._atomic = self._client._engine.atomic()
+        self._atomic.__enter__()
+        self._id = uuid.uuid4().bytes
+
+    @traced_rpc('commit')
+    def _commit(self):
+        try:
+            results = [self._client._apply(write) for write in self._writes]
+        except BaseException as exc:
+            self._rollback(exc)
+            raise
+        self._finish(None)
+        return results
+
+    @traced_rpc('rollback')
+    def _rollback(self, exc: Optional[BaseException] = None):
+        if self._atomic is not None:
+            self._finish(exc or RuntimeError("transaction rolled back"))
+
+    def _finish(self, exc: Optional[BaseException]):
+        atomic, self._atomic = self._atomic, None
+        self._clean_up()
+        if exc is None:
+            atomic.__exit__(None, None, None)
+        else:
+            atomic.__exit__(type(exc), exc, exc.__traceback__)
+
+
+class LocalClient:
+    """Drop-in replacement for firestore.Client backed by a local engine"""
+
+    def __init__(self, engine=None):
+        self._engine = engine or MemoryEngine()
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5) -> Transaction:
+        return Transaction(self, max_attempts=max_attempts)
+
+    def _apply(self, write):
+        op, ref, payload, merge = write
+        engine = self._engine
+        if op == 'delete':
+            engine.delete(ref._col_path, ref.id)
+            return _now()
+        with engine.atomic():
+            entry = engine.get(ref._col_path, ref.id)
+            if op == 'update':
+                if entry is None:
+                    raise NotFound(f"No document to update: {ref.path}")
+                data = copy.deepcopy(entry[0])
+                for field_path, value in payload.items():
+                    _set_field(data, field_path, value)
+            elif merge:
+                data = _merge(copy.deepcopy(entry[0]) if entry else {}, payload)
+            else:
+                data = _merge({}, payload)
+            return engine.put(ref._col_path, ref.id, data)
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def document(self, path: str) -> DocumentReference:
+        col_path, doc_id = path.rsplit('/', 1)
+        return DocumentReference(self, col_path, doc_id)
+
+    @traced_rpc('list_collection_ids')
+    def collections(self):
+        return [self.collection(name) for name in self._engine.collections('')]
+
+
+# ---------------------------------------------------------------------------
+# AsyncClient-shaped wrappers (the local engines never block on I/O)
+# ---------------------------------------------------------------------------
+
+class AsyncDocumentReference:
+    def __init__(self, sync_ref: DocumentReference):
+        self._ref = sync_ref
+        self.id = sync_ref.id
+
+    @property
+    def path(self) -> str:
+        return self._ref.path
+
+    def collection(self, name: str):
+        return AsyncCollectionReference(self._ref.collection(name))
+
+    async def get(self, field_paths=None, transaction=None):
+        return self._ref.get(field_paths=field_paths)
+
+    async def set(self, document_data: Dict[str, Any], merge: bool = False):
+        return self._ref.set(document_data, merge=merge)
+
+    async def update(self, field_updates: Dict[str, Any]):
+        return self._ref.update(field_updates)
+
+    async def delete(self):
+        return self._ref.delete()
+
+
+class AsyncQuery:
+    ASCENDING = Query.ASCENDING
+    DESCENDING = Query.DESCENDING
+
+    def __init__(self, sync_query: Query):
+        self._query = sync_query
+
+    def where(self, *args, **kwargs):
+        return AsyncQuery(self._query.where(*args, **kwargs))
+
+    def order_by(self, *args, **kwargs):
+        return AsyncQuery(self._query.order_by(*args, **kwargs))
+
+    def limit(self, count: int):
+        return AsyncQuery(self._query.limit(count))
+
+    def offset(self, num_to_skip: int):
+        return AsyncQuery(self._query.offset(num_to_skip))
+
+    def select(self, field_paths):
+        return AsyncQuery(self._query.select(field_paths))
+
+    def start_after(self, cursor):
+        return AsyncQuery(self._query.start_after(cursor))
+
+    def start_at(self, cursor):
+        return AsyncQuery(self._query.start_at(cursor))
+
+    async def stream(self, transaction=None):
+        for snapshot in self._query.stream():
+            yield snapshot
+
+    async def get(self, transaction=None):
+        return self._query.get()
+
+    def count(self, alias: str = None):
+        return AsyncAggregationQuery(self._query.count(alias))
+
+
+class AsyncAggregationQuery:
+    def __init__(self, sync_query: AggregationQuery):
+        self._query = sync_query
+
+    async def get(self, transaction=None):
+        return self._query.get()
+
+
+class AsyncCollectionReference(AsyncQuery):
+    @property
+    def id(self) -> str:
+        return self._query.id
+
+    def document(self, document_id: Optional[str] = None) -> AsyncDocumentReference:
+        return AsyncDocumentReference(self._query.document(document_id))
+
+
+class AsyncLocalClient:
+    """AsyncClient counterpart of LocalClient sharing the same engine"""
+
+    def __init__(self, sync_client: LocalClient):
+        self._client = sync_client
+
+    def collection(self, name: str) -> AsyncCollectionReference:
+        return AsyncCollectionReference(self._client.collection(name))
+
+    def document(self, path: str) -> AsyncDocumentReference:
+        return AsyncDocumentReference(self._client.document(path))
+
+
+class LocalApp:
+    """Stands in for the firebase_admin App so startup checks still pass"""
+    name = "[LOCAL]"
+    project_id = "savkar-local"
+
+
+def create_local_client(backend: str, sqlite_path: Optional[str] = None) -> LocalClient:
+    """Build a LocalClient for backend 'memory' or 'sqlite'"""
+    if backend == 'memory':
+        return LocalClient(MemoryEngine())
+    if backend == 'sqlite':
+        return LocalClient(SQLiteEngine(sqlite_path or 'savkar_local.db'))
+    raise ValueError(f"Unknown local storage backend: {backend}")
@@ -1,34 +1,71 @@
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from datetime import datetime
 from typing import List, Dict
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
 from models import (
-    LoanRecord, LoanCreate, LoanUpdate,
+    LoanRecord, LoanCreate, LoanUpdate, LoanSummary,
     LegalNotice, NoticeCreate, NoticeUpdate,
     Transaction, TransactionCreate,
     Document, DocumentCreate,
     Profile, ProfileCreate, ProfileUpdate,
     DashboardSummary,
+    BulkLoanResult, BulkLoanError,
+    Payment, PaymentCreate, PaymentReceipt,
+    PaidAmountUpdate,
+    LoanSchedule, PortfolioProjection,
     PaymentMode, LoanStatus, NoticeStatus, TransactionType,
     LoanType  # Added LoanType import
 )
 from deps import verify_firebase_token
 import firestore_repo
+import async_firestore_repo
+from portfolio_cache import loan_cache
+import blob_store
+from structured_log import Redacted, configure_logging
+from fast_json import FastJSONResponse, cached_records_response, model_response, records_response
+import metrics
+import tracing
+import loan_import
+import portfolio_export
+from downloads import (
+    build_file_response, strong_etag, content_etag,
+    base64_decoded_size, iter_base64_range,
+)
 try:
+    import firebase
     from firebase import init_firebase
 except Exception:
+    firebase = None
     init_firebase = None
-from fastapi import Depends, Request
+from fastapi import Depends, Request, Query
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 import os
 import logging
+import threading
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# "async" serves the read endpoints (lists, due, search, payments, schedule,
+# projection, summary, documents, profiles, notices) from async_firestore_repo
+# on the event loop; "sync" runs the blocking firestore_repo calls in
+# Starlette's threadpool. Only reads are switched: the write endpoints
+# (create, update, delete, paid-amount, bulk) always call firestore_repo in
+# the threadpool.
+IO_MODE = os.getenv("SAVKAR_IO_MODE", "sync").lower()
+
+async def _repo_read(name: str, *args, **kwargs):
+    """Call a read function from the repository selected by IO_MODE"""
+    if IO_MODE == "async":
+        return await getattr(async_firestore_repo, name)(*args, **kwargs)
+    return await run_in_threadpool(getattr(firestore_repo, name), *args, **kwargs)
+
 # Fixed CORS middleware configuration
 app.add_middleware(
     CORSMiddleware,
@@ -36,8 +73,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  
     allow_headers=["*"],  
+    expose_headers=["X-Next-Cursor", "X-Transaction-Retries", "Server-Timing", "X-Firestore-Rpcs"],
 )
 
+# Repository calls and Firestore RPCs of each request (SAVKAR_TRACE_*)
+app.add_middleware(tracing.TracingMiddleware)
+# Per-route request counts, latency and response sizes for GET /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_collector(metrics.cache_collector("loans", loan_cache.stats))
+
 # Add test_firestore_connection function
 def test_firestore_connection():
     try:
@@ -58,108 +102,197 @@ def test_firestore_connection():
         logger.error(f"Firestore connection test failed: {e}")
         return False
 
-# Initialize Firebase once at startup
-@app.on_event("startup")
-async def startup_event():
+# Startup check of the savkar portfolio: "count" logs the number of loans
+# from an aggregation query (no documents are downloaded), "skip" only
+# initializes the client
+STARTUP_CHECK = os.getenv("SAVKAR_STARTUP_CHECK", "count").strip().lower()
+
+def _startup_check():
+    """Initialize Firebase and check the savkar user (runs on a background thread)"""
     try:
-        if init_firebase:
-            print("Attempting to initialize Firebase...")
-            app, db = init_firebase()
-            if app and db:
-                logger.info("Firebase initialized successfully")
-                print("Firebase initialized successfully")
-                
-                # Test with actual user collection
-                try:
-                    # Use the savkar user ID
-                    test_doc = db.collection('users').document(firestore_repo.SAVKAR_USER_ID).get()
-                    if test_doc.exists:
-                        logger.info("Successfully accessed savkar user document")
-                        # Test accessing loans
-                        loans_ref = test_doc.reference.collection('loans')
-                        loans_count = len(list(loans_ref.stream()))
-                        logger.info(f"Found {loans_count} loans for savkar user")
-                    else:
-                        logger.info("Savkar user document not found, will create on first access")
-                except Exception as e:
-                    logger.error(f"Error accessing savkar user data: {e}")
-            else:
-                logger.error("Firebase initialization failed - app or db is None")
-                print("Firebase initialization failed")
+        app, db = init_firebase()
+        if not app or not db:
+            logger.error("Firebase initialization failed - app or db is None")
+            return
+        logger.info("Firebase initialized successfully")
+        if STARTUP_CHECK == "skip":
+            return
+
+        # Test with actual user collection
+        test_doc = db.collection('users').document(firestore_repo.SAVKAR_USER_ID).get()
+        if test_doc.exists:
+            logger.info("Successfully accessed savkar user document")
+            loans_count = firestore_repo.count_loans_for_user(firestore_repo.SAVKAR_USER_ID)
+            logger.info(f"Found {loans_count} loans for savkar user")
         else:
-            logger.error("Firebase module not available")
-            print("Firebase module not available")
+            logger.info("Savkar user document not found, will create on first access")
     except Exception as e:
         logger.error(f"Error initializing Firebase: {e}")
-        print(f"Error initializing Firebase: {e}")
+
+# Warm the Firebase client in the background so the worker accepts requests
+# immediately; a request that arrives first waits on the same init lock
+@app.on_event("startup")
+async def startup_event():
+    if not init_firebase:
+        logger.error("Firebase module not available")
+        return
+    threading.Thread(target=_startup_check, name="firebase-warmup", daemon=True).start()
 
 # REMOVED: Sample data initialization - we'll use only Firestore data
 
 @app.get("/dashboard/summary", response_model=DashboardSummary)
-def get_dashboard_summary():
+async def get_dashboard_summary():
     try:
-        # Get loans for the savkar user
-        logger.info("Getting dashboard summary from Firestore for savkar user")
-        
         # Use the savkar user ID
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
-        loans_data = firestore_repo.get_loans_for_user(savkar_user_id)
-        
-        # Calculate summary statistics
-        total_loan_issued = sum(loan.get('totalLoan', 0) for loan in loans_data)
-        recovered_amount = sum(loan.get('paidAmount', 0) for loan in loans_data)
-        pending_amount = total_loan_issued - recovered_amount
-        
-        active_records = sum(1 for loan in loans_data if loan.get('status') == 'Active')
-        pending_records = sum(1 for loan in loans_data if loan.get('status') == 'Pending')
-        closing_records = sum(1 for loan in loans_data if loan.get('status') == 'Closed')
-        
-        logger.info(f"Dashboard summary calculated: total_loan_issued={total_loan_issued}, recovered_amount={recovered_amount}, pending_amount={pending_amount}")
-        logger.info(f"Loan counts: active={active_records}, pending={pending_records}, closed={closing_records}")
-        
-        return DashboardSummary(
-            total_loan_issued=total_loan_issued,
-            recovered_amount=recovered_amount,
-            pending_amount=pending_amount,
-            active_records=active_records,
-            pending_records=pending_records,
-            closing_records=closing_records
-        )
+        
+        # Single read of the materialized aggregates maintained on every loan write
+        summary = await _repo_read('get_dashboard_summary_for_user', savkar_user_id)
+        
+        logger.debug("Dashboard summary loaded: %s", summary)
+        
+        return DashboardSummary(**summary)
         
     except Exception as e:
         logger.error(f"Error getting dashboard summary: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard summary: {str(e)}")
 
+# Page sizes for the paginated loan list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_SEARCH_RESULTS = firestore_repo.SEARCH_CANDIDATE_LIMIT
+
+async def _paged_loans(uid: str, limit: Optional[int], cursor: Optional[str],
+                 status: Optional[LoanStatus], loan_type: Optional[LoanType], order_by: Optional[str],
+                 fields: Optional[str] = None, model=LoanRecord):
+    """Query loans with Firestore-side filtering, ordering and projection.
+
+    A page is returned (next cursor in X-Next-Cursor) when limit, cursor,
+    status, loanType or orderBy is given, otherwise every matching loan.
+    `fields` is a comma-separated list of camelCase fields to read; the
+    projected rows are returned as-is instead of being validated by `model`.
+    """
+    paginate = any(p is not None for p in (limit, cursor, status, loan_type, order_by))
+    try:
+        if fields is not None:
+            selected = firestore_repo.resolve_loan_fields(fields.split(','))
+        elif model is LoanSummary:
+            selected = firestore_repo.LOAN_SUMMARY_FIELDS
+        else:
+            selected = None
+        loans_data, next_cursor = await _repo_read(
+            'query_loans_for_user',
+            uid,
+            limit=(limit or DEFAULT_PAGE_SIZE) if paginate else None,
+            cursor=cursor,
+            status=status.value if status else None,
+            loan_type=loan_type.value if loan_type else None,
+            order_by=order_by,
+            fields=selected,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if fields is not None:
+        return FastJSONResponse(content=loans_data, headers=headers)
+    return records_response(model, loans_data, headers)
+
 # Global endpoints that query ALL loans from Firestore
 @app.get("/loans", response_model=List[LoanRecord])
-def get_all_loans():
+async def get_all_loans(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[LoanStatus] = None,
+    loan_type: Optional[LoanType] = Query(None, alias="loanType"),
+    order_by: Optional[str] = Query(None, alias="orderBy"),
+    fields: Optional[str] = None,
+):
+    """All loans, or a single page when any of limit/cursor/status/loanType/orderBy is given.
+    Pages follow X-Next-Cursor; orderBy takes a field name, prefixed with '-' for descending.
+    fields=borrowerName,status,... reads and returns only those fields."""
     try:
-        # Get loans for the savkar user
-        logger.info("Getting all loans from Firestore for savkar user")
-        
         # Use the savkar user ID
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
-        loans_data = firestore_repo.get_loans_for_user(savkar_user_id)
+        if any(p is not None for p in (limit, cursor, status, loan_type, order_by, fields)):
+            return await _paged_loans(savkar_user_id, limit, cursor, status, loan_type, order_by, fields)
+
+        # Get loans for the savkar user
+        logger.info("Getting all loans from Firestore for savkar user")
         
-        # Convert to LoanRecord objects
-        loan_records = []
-        for loan_dict in loans_data:
-            try:
-                # Use the converted data (camelCase) to create LoanRecord
-                loan_record = LoanRecord(**loan_dict)
-                loan_records.append(loan_record)
-            except Exception as e:
-                logger.error(f"Error converting loan data to LoanRecord: {e}")
-                logger.error(f"Problematic data: {loan_dict}")
-                continue
+        loans_data = await _repo_read('get_loans_for_user', savkar_user_id)
         
-        logger.info(f"Retrieved {len(loan_records)} loans from Firestore")
-        return loan_records
+        # Validate once per cached portfolio (skipping rows that are not valid LoanRecords)
+        logger.info(f"Retrieved {len(loans_data)} loans from Firestore")
+        return cached_records_response(LoanRecord, savkar_user_id, loans_data, skip_invalid=True)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting loans from Firestore: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get loans: {str(e)}")
 
+@app.get("/loans/summary", response_model=List[LoanSummary])
+async def get_loan_summaries(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[LoanStatus] = None,
+    loan_type: Optional[LoanType] = Query(None, alias="loanType"),
+    order_by: Optional[str] = Query(None, alias="orderBy"),
+):
+    """Loans for list screens: photo, jamindars and payment records are never read"""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        return await _paged_loans(savkar_user_id, limit, cursor, status, loan_type, order_by, model=LoanSummary)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting loan summaries from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get loan summaries: {str(e)}")
+
+@app.get("/loans/due", response_model=List[LoanSummary])
+async def get_due_loans(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    overdue: bool = False,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Loans by next due date within from..to (YYYY-MM-DD, inclusive), earliest first.
+    overdue=true keeps only loans whose due date has passed. Pages follow X-Next-Cursor."""
+    for value in (date_from, date_to):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date '{value}', expected YYYY-MM-DD")
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        loans, next_cursor = await _repo_read(
+            'query_due_loans_for_user', savkar_user_id, date_from, date_to, overdue, limit, cursor,
+            fields=firestore_repo.LOAN_SUMMARY_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting due loans from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get due loans: {e}")
+    return records_response(LoanSummary, loans, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@app.get("/loans/search", response_model=List[LoanSummary])
+async def search_loans(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+):
+    """Loans whose borrower name (word prefix, or any 3+ letters of it) or phone
+    number (last 3+ digits) matches q, best matches first"""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        loans = await _repo_read(
+            'search_loans_for_user', savkar_user_id, q, limit, fields=firestore_repo.LOAN_SUMMARY_FIELDS)
+    except Exception as e:
+        logger.error(f"Error searching loans in Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to search loans: {e}")
+    return records_response(LoanSummary, loans)
+
 @app.post("/loans", response_model=LoanRecord)
 def create_loan(loan: LoanCreate):
     try:
@@ -176,6 +309,57 @@ def create_loan(loan: LoanCreate):
         logger.error(f"Error creating loan in Firestore: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create loan: {e}")
 
+# Largest upload accepted by POST /loans/bulk
+MAX_BULK_LOANS = 50000
+
+@app.post("/loans/bulk", response_model=BulkLoanResult)
+async def create_loans_bulk(request: Request):
+    """Create many loans from a JSON array or a CSV file (Content-Type: text/csv).
+    Each row is validated with LoanCreate; invalid rows are reported, not written."""
+    try:
+        rows = loan_import.parse_upload(request.headers.get('content-type'), await request.body())
+    except loan_import.BulkParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(rows) > MAX_BULK_LOANS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_LOANS} loans per upload")
+
+    valid, errors = loan_import.validate_rows(rows)
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        written = await run_in_threadpool(
+            firestore_repo.create_loans_for_user, savkar_user_id, [data for _, data in valid])
+    except Exception as e:
+        logger.error(f"Error bulk creating loans in Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to create loans: {e}")
+
+    ids = [None] * len(rows)
+    for (index, _), (loan_id, error) in zip(valid, written):
+        if error:
+            errors[index] = [error]
+        else:
+            ids[index] = loan_id
+    created = sum(1 for loan_id in ids if loan_id)
+    logger.info(f"Bulk import created {created} of {len(rows)} loans")
+    return BulkLoanResult(
+        created=created,
+        failed=len(rows) - created,
+        ids=ids,
+        errors=[BulkLoanError(row=index + 1, errors=messages) for index, messages in sorted(errors.items())],
+    )
+
+@app.get("/loans/{loan_id}", response_model=LoanRecord)
+async def get_loan(loan_id: str):
+    """The full record of one loan, for the detail view"""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        loan = await _repo_read('get_loan_for_user', savkar_user_id, loan_id)
+    except Exception as e:
+        logger.error(f"Error getting loan from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get loan: {e}")
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return loan
+
 @app.put("/loans/{loan_id}", response_model=LoanRecord)
 def update_loan(loan_id: str, loan_update: LoanUpdate):
     try:
@@ -195,6 +379,24 @@ def update_loan(loan_id: str, loan_update: LoanUpdate):
         logger.error(f"Error updating loan in Firestore: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to update loan: {e}")
 
+@app.put("/loans/{loan_id}/paid-amount", response_model=LoanRecord)
+def update_paid_amount(loan_id: str, body: PaidAmountUpdate):
+    """Set the paid amount (and derived status) in a transaction.
+    X-Transaction-Retries reports how often it was retried because of concurrent writes."""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        result = firestore_repo.update_paid_amount_for_user(
+            savkar_user_id, loan_id, body.paid_amount, expected_version=body.expected_version)
+    except (firestore_repo.VersionConflict, firestore_repo.TransactionContention) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating paid amount in Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to update paid amount: {e}")
+    if not result:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    loan, retries = result
+    return model_response(loan, {"X-Transaction-Retries": str(retries)})
+
 @app.delete("/loans/{loan_id}")
 def delete_loan(loan_id: str):
     try:
@@ -207,14 +409,81 @@ def delete_loan(loan_id: str):
         logger.error(f"Error deleting loan in Firestore: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete loan: {e}")
 
+# Loan fields the schedule engine reads
+SCHEDULE_FIELDS = ['total_loan', 'interest_rate', 'start_date', 'end_date', 'status']
+
+@app.get("/loans/{loan_id}/schedule", response_model=LoanSchedule)
+async def get_loan_schedule(loan_id: str, method: str = "emi"):
+    """Repayment schedule of one loan: method is emi, interest_only or daily"""
+    import schedule_engine  # NumPy is loaded on first use, not at startup
+    if method not in schedule_engine.METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown schedule method '{method}'")
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        loan = await _repo_read('get_loan_for_user', savkar_user_id, loan_id, fields=SCHEDULE_FIELDS)
+    except Exception as e:
+        logger.error(f"Error getting loan from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get loan schedule: {e}")
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return schedule_engine.schedule_for_loan(loan, method)
+
+@app.get("/portfolio/projection", response_model=PortfolioProjection)
+async def get_portfolio_projection(method: str = "emi", include_closed: bool = Query(False, alias="includeClosed")):
+    """Expected collections per month across the portfolio, from one vectorized schedule pass"""
+    import schedule_engine  # NumPy is loaded on first use, not at startup
+    if method not in schedule_engine.METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown schedule method '{method}'")
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        loans, _ = await _repo_read('query_loans_for_user', savkar_user_id, limit=None, fields=SCHEDULE_FIELDS)
+    except Exception as e:
+        logger.error(f"Error getting loans from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to project portfolio: {e}")
+    if not include_closed:
+        loans = [loan for loan in loans if loan.get('status') != LoanStatus.CLOSED.value]
+    # A whole-portfolio projection is CPU work; keep it off the event loop
+    return await run_in_threadpool(schedule_engine.project_portfolio, loans, method)
+
+# Payment ledger: users/{uid}/loans/{loan_id}/payments
+@app.post("/loans/{loan_id}/payments", response_model=PaymentReceipt)
+def create_loan_payment(loan_id: str, payment: PaymentCreate):
+    """Append a payment; the loan's paid amount and status are updated in the same transaction"""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        receipt = firestore_repo.create_payment_for_user(savkar_user_id, loan_id, payment.dict(by_alias=False))
+    except Exception as e:
+        logger.error(f"Error creating payment in Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to create payment: {e}")
+    if not receipt:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return model_response(receipt)
+
+@app.get("/loans/{loan_id}/payments", response_model=List[Payment])
+async def get_loan_payments(
+    loan_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Payments in the order they were recorded; further pages follow X-Next-Cursor"""
+    try:
+        savkar_user_id = firestore_repo.SAVKAR_USER_ID
+        payments, next_cursor = await _repo_read('get_payments_for_loan', savkar_user_id, loan_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting payments from Firestore: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get payments: {e}")
+    return records_response(Payment, payments, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
 @app.get("/loans/{loan_id}/documents", response_model=List[Document])
-def get_loan_documents(loan_id: str):
+async def get_loan_documents(loan_id: str):
     try:
         # Get documents for the savkar user
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
-        docs_data = firestore_repo.get_documents_for_user(savkar_user_id, loan_id)
+        docs_data = await _repo_read('get_documents_for_user', savkar_user_id, loan_id)
         
-        return docs_data
+        return records_response(Document, docs_data)
         
     except Exception as e:
         logger.error(f"Error getting documents from Firestore: {e}")
@@ -250,8 +519,12 @@ def delete_document(doc_id: str):
 
 # New endpoint to get document file content
 @app.get("/documents/{doc_id}/file")
-async def get_document_file(doc_id: str):
-    """Get document file content by document ID"""
+def get_document_file(doc_id: str, request: Request):
+    """Get document file content by document ID.
+
+    Supports Range requests and answers repeat views carrying the ETag
+    (If-None-Match) or Last-Modified date (If-Modified-Since) with 304.
+    """
     try:
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
         
@@ -261,48 +534,105 @@ async def get_document_file(doc_id: str):
             raise HTTPException(status_code=404, detail="Document not found")
             
         doc_data = doc.to_dict()
-        file_content = doc_data.get('file_content', '')
+        file_content = doc_data.get('file_content') or ''
         file_name = doc_data.get('file_name', 'document')
+        last_modified = doc_data.get('uploaded_at') or doc.update_time
+        if not hasattr(last_modified, 'tzinfo'):
+            last_modified = None
+        
+        # Files uploaded since the blob store was introduced are streamed from it
+        file_hash = doc_data.get('file_hash')
+        if file_hash:
+            store = blob_store.get_blob_store()
+            if not store.exists(file_hash):
+                raise HTTPException(status_code=404, detail="Document file not found")
+            return build_file_response(
+                request,
+                size=store.size(file_hash),
+                media_type=doc_data.get('mime_type') or 'application/octet-stream',
+                etag=strong_etag(file_hash),
+                last_modified=last_modified,
+                open_range=lambda start, end: store.iter_chunks(file_hash, start, end),
+                headers={"Content-Disposition": f"inline; filename={file_name}"},
+            )
         
-        # Check if the content is a base64 data URL
-        if file_content.startswith('data:'):
-            # Extract the MIME type and base64 data
-            import base64
+        # Older documents keep the file inline as a data URL
+        etag = content_etag(file_content)
+        if file_content.startswith('data:') and ';base64,' in file_content[:200]:
+            # Extract the MIME type and decode the base64 payload lazily, chunk by chunk
             header, encoded = file_content.split(',', 1)
             mime_type = header.split(':')[1].split(';')[0]
-            
-            # Decode the base64 content
-            binary_data = base64.b64decode(encoded)
-            
-            # Return the file with proper content type
-            return Response(
-                content=binary_data, 
+            return build_file_response(
+                request,
+                size=base64_decoded_size(encoded),
                 media_type=mime_type,
-                headers={
-                    "Content-Disposition": f"inline; filename={file_name}"
-                }
+                etag=etag,
+                last_modified=last_modified,
+                open_range=lambda start, end: iter_base64_range(encoded, start, end),
+                headers={"Content-Disposition": f"inline; filename={file_name}"},
             )
+        
+        if file_content.startswith('data:'):
+            mime_type, binary_data = blob_store.parse_data_url(file_content)
+            disposition = f"inline; filename={file_name}"
         else:
             # If it's not a data URL, return as plain text
-            return Response(
-                content=file_content, 
-                media_type="text/plain",
-                headers={
-                    "Content-Disposition": f"attachment; filename={file_name}"
-                }
-            )
+            mime_type, binary_data = "text/plain", file_content.encode('utf-8')
+            disposition = f"attachment; filename={file_name}"
+        return build_file_response(
+            request,
+            size=len(binary_data),
+            media_type=mime_type,
+            etag=etag,
+            last_modified=last_modified,
+            open_range=lambda start, end: iter([binary_data[start:end + 1]]),
+            headers={"Content-Disposition": disposition},
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting document file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/blobs/{digest}")
+def get_blob(digest: str, request: Request):
+    """Serve a blob (profile photo) by hash; content addressed, so cacheable forever"""
+    store = blob_store.get_blob_store()
+    if not store.exists(digest):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return build_file_response(
+        request,
+        size=store.size(digest),
+        media_type=blob_store.sniff_mime_type(store.read_head(digest)),
+        etag=strong_etag(digest),
+        open_range=lambda start, end: store.iter_chunks(digest, start, end),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+@app.get("/export/{collection}")
+def export_collection(collection: str, request: Request, uid: str = None,
+                      export_format: str = Query("ndjson", alias="format")):
+    """Stream loans, profiles, documents (metadata only) or notices as NDJSON or CSV"""
+    uid = uid or request.headers.get('x-dev-uid') or firestore_repo.SAVKAR_USER_ID
+    if collection not in portfolio_export.EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export collection '{collection}'")
+    if export_format not in portfolio_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{export_format}'")
+    logger.info(f"Exporting {collection} of user {uid} as {export_format}")
+    return StreamingResponse(
+        portfolio_export.export_chunks(uid, collection, export_format),
+        media_type=portfolio_export.FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{export_format}"'},
+    )
+
 # Profile endpoints
 @app.get("/loans/{loan_id}/profile", response_model=Profile)
-def get_loan_profile(loan_id: str):
+async def get_loan_profile(loan_id: str):
     try:
         # Get profile for the savkar user
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
-        profile_data = firestore_repo.get_profile_for_loan(savkar_user_id, loan_id)
+        profile_data = await _repo_read('get_profile_for_loan', savkar_user_id, loan_id)
         
         if not profile_data:
             # Return a default profile if none exists
@@ -353,7 +683,7 @@ def update_loan_profile(loan_id: str, profile_update: ProfileUpdate):
         savkar_user_id = firestore_repo.SAVKAR_USER_ID
         existing_profile = firestore_repo.get_profile_for_loan(savkar_user_id, loan_id)
         
-        logger.info(f"Existing profile: {existing_profile}")
+        logger.debug("Existing profile: %s", Redacted(existing_profile))
         
         if not existing_profile:
             logger.info("No existing profile, creating a new one")
@@ -368,9 +698,9 @@ def update_loan_profile(loan_id: str, profile_update: ProfileUpdate):
         profile_id = existing_profile['id']
         logger.info(f"Profile ID to update: {profile_id}")
         update_data = profile_update.dict(by_alias=False, exclude_unset=True)
-        logger.info(f"Update data: {update_data}")
+        logger.info("Update data: %s", Redacted(update_data))
         
-        updated = firestore_repo.update_profile_for_user(savkar_user_id, profile_id, update_data)
+        updated = firestore_repo.update_profile_for_user(savkar_user_id, profile_id, update_data, existing=existing_profile)
         
         return updated
         
@@ -379,12 +709,12 @@ def update_loan_profile(loan_id: str, profile_update: ProfileUpdate):
         raise HTTPException(status_code=500, detail=f"Failed to update profile: {str(e)}")
 
 @app.get("/notices", response_model=List[LegalNotice])
-def get_notices(request: Request, uid: str = None):
+async def get_notices(request: Request, uid: str = None):
     uid = uid or request.headers.get('x-dev-uid')
     if not uid:
         return []
     try:
-        return firestore_repo.get_notices_for_user(uid)
+        return records_response(LegalNotice, await _repo_read('get_notices_for_user', uid))
     except Exception as e:
         logger.error(f"Error getting notices from Firestore: {e}")
         return []
@@ -432,20 +762,29 @@ def delete_my_document(doc_id: str, request: Request, uid: str = None):
 
 # Per-user endpoints
 @app.get('/users/me/loans', response_model=List[LoanRecord])
-def get_my_loans(request: Request, uid: str = None):
+async def get_my_loans(
+    request: Request,
+    uid: str = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[LoanStatus] = None,
+    loan_type: Optional[LoanType] = Query(None, alias="loanType"),
+    order_by: Optional[str] = Query(None, alias="orderBy"),
+    fields: Optional[str] = None,
+):
     uid = uid or request.headers.get('x-dev-uid')
     if not uid:
         raise HTTPException(status_code=400, detail="User ID (uid) is required")
     
     try:
+        if any(p is not None for p in (limit, cursor, status, loan_type, order_by, fields)):
+            return await _paged_loans(uid, limit, cursor, status, loan_type, order_by, fields)
+
         logger.info(f"Getting loans for user {uid} from Firestore")
-        loans_data = firestore_repo.get_loans_for_user(uid)
-        loan_records = []
-        for loan_dict in loans_data:
-            loan_record = LoanRecord(**loan_dict)
-            loan_records.append(loan_record)
-        
-        return loan_records
+        loans_data = await _repo_read('get_loans_for_user', uid)
+        return cached_records_response(LoanRecord, uid, loans_data)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting loans from Firestore: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to load loans: {e}")
@@ -467,14 +806,14 @@ def create_my_loan(request: Request, loan: LoanCreate, uid: str = None):
         raise HTTPException(status_code=500, detail=f"Failed to create loan: {e}")
 
 @app.get('/users/me/loans/{loan_id}/documents')
-def get_my_loan_documents(loan_id: str, request: Request, uid: str = None):
+async def get_my_loan_documents(loan_id: str, request: Request, uid: str = None):
     uid = uid or request.headers.get('x-dev-uid')
     if not uid:
         raise HTTPException(status_code=400, detail="User ID (uid) is required")
     
     try:
         logger.info(f"Getting documents for loan {loan_id} of user {uid} from Firestore")
-        docs = firestore_repo.get_documents_for_user(uid, loan_id)
+        docs = await _repo_read('get_documents_for_user', uid, loan_id)
         return docs
     except Exception as e:
         logger.error(f"Error getting documents from Firestore: {e}")
@@ -499,7 +838,16 @@ def create_my_document(document: DocumentCreate, request: Request, uid: str = No
 # Add health check endpoint
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "firebase": "initialized" if init_firebase else "not initialized"}
+    return {
+        "status": "healthy",
+        "firebase": "initialized" if init_firebase else "not initialized",
+        "client": "ready" if firebase and firebase.is_initialized() else "warming up",
+    }
+
+# Prometheus scrape endpoint (per worker process)
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.get("/debug/firestore")
@@ -536,87 +884,6 @@ def debug_firestore():
         return {"error": str(e)}
 
 
-def update_paid_amount_for_user(uid: str, loan_id: str, paid_amount: float) -> LoanRecord:
-    """
-    Update only the paid amount for a user's loan and adjust the status.
-    Automatically sets 'closed_at' when loan is fully paid.
-    """
-    try:
-        col = firestore_repo._loans_col(uid)
-        if not col:
-            logger.error(f"Failed to get loans collection for user {uid}")
-            raise Exception(f"Failed to update paid amount for user {uid}")
-
-        doc_ref = col.document(loan_id)
-        loan_doc = doc_ref.get()
-        if not loan_doc.exists:
-            raise Exception(f"Loan {loan_id} not found for user {uid}")
-
-        loan_data = loan_doc.to_dict() or {}
-
-        # Handle both totalLoan and total_loan naming
-        total_loan = (
-            loan_data.get("total_loan") or
-            loan_data.get("totalLoan") or
-            0
-        )
-
-        # Preserve existing loan type
-        loan_type = loan_data.get("loan_type") or loan_data.get("loanType", "Cash Loan")
-
-        # Determine new status
-        if paid_amount >= total_loan:
-            new_status = "Closed"
-        elif paid_amount > 0:
-            new_status = "Active"
-        else:
-            new_status = "Pending"
-
-        # Prepare update payload
-        update_data = {
-            "paid_amount": paid_amount,
-            "status": new_status,
-            "updated_at": datetime.utcnow(),
-            "loan_type": loan_type  # Preserve loan type
-        }
-
-        # Mark closed_at if loan is now fully paid
-        if new_status == "Closed":
-            update_data["closed_at"] = datetime.utcnow()
-
-        # Update Firestore
-        doc_ref.update(update_data)
-        logger.info(
-            f"✅ Updated paid amount for loan {loan_id} (User: {uid}) → {paid_amount}, status: {new_status}"
-        )
-
-        # Fetch updated data
-        updated = doc_ref.get().to_dict()
-        if not updated:
-            raise Exception(f"Failed to retrieve updated loan for user {uid}")
-
-        updated["id"] = loan_id
-
-        # Convert Firestore Timestamps to ISO
-        for time_field in ["created_at", "updated_at", "closed_at"]:
-            if time_field in updated and hasattr(updated[time_field], "isoformat"):
-                updated[time_field] = updated[time_field].isoformat()
-
-        # Convert keys from snake_case → camelCase
-        updated = firestore_repo._convert_keys_to_camel_case(updated)
-
-        # Return LoanRecord model
-        try:
-            return LoanRecord(**updated)
-        except Exception as e:
-            logger.error(f"Error creating LoanRecord for user {uid}: {e}")
-            raise Exception(f"Failed to return updated record: {e}")
-
-    except Exception as e:
-        logger.error(f"❌ Error updating paid amount for loan {loan_id} (User: {uid}): {e}")
-        raise Exception(f"Failed to update paid amount for user {uid}: {e}")
-
-
 @app.get("/test-connection")
 def test_connection():
     """Test Firebase connection and data creation"""
@@ -0,0 +1,276 @@
+"""
+In-process metrics in the Prometheus text exposition format, served at
+GET /metrics.
+
+  savkar_http_requests_total{method,route,status}
+  savkar_http_request_duration_seconds{method,route}    histogram
+  savkar_http_response_size_bytes{method,route}          histogram
+  savkar_http_request_firestore_rpcs{method,route}       histogram (from tracing)
+  savkar_repository_calls_total{function,kind,outcome}
+  savkar_repository_call_duration_seconds{function,kind}  histogram
+  savkar_firestore_operations_total{function,op,outcome}  (from tracing)
+  savkar_cache_*{cache}                                  from registered collectors
+
+HTTP metrics are labelled with the route template ("/loans/{loan_id}"),
+not the raw path, so the number of series stays bounded. Repository
+functions are counted and timed through the firestore_op(kind) decorator,
+labelled with the kind of work they declare (read, write or delete). The
+Firestore RPCs they make are counted one by one from the tracing hooks on
+the Firestore client (or local_store): op is the RPC (run_query, commit,
+batch_get_documents, ...) and function the innermost repository function
+that made it ("none" outside of one). Values are per worker process;
+Prometheus sums them across workers.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import tracing
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+RPC_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, hits in zip(self.buckets + (float('inf'),), series):
+                    cumulative += hits
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+http_requests = Counter('savkar_http_requests_total', 'HTTP requests by route and status.',
+                        ('method', 'route', 'status'))
+http_latency = Histogram('savkar_http_request_duration_seconds', 'Time to send the full response.',
+                         ('method', 'route'))
+http_response_size = Histogram('savkar_http_response_size_bytes', 'Response body size.',
+                               ('method', 'route'), buckets=SIZE_BUCKETS)
+http_firestore_rpcs = Histogram('savkar_http_request_firestore_rpcs', 'Firestore RPCs made by one request.',
+                                ('method', 'route'), buckets=RPC_BUCKETS)
+repository_calls = Counter('savkar_repository_calls_total',
+                           'Repository function calls by declared kind of work and outcome.',
+                           ('function', 'kind', 'outcome'))
+repository_latency = Histogram('savkar_repository_call_duration_seconds',
+                               'Repository call duration, Firestore round trips included.',
+                               ('function', 'kind'))
+firestore_operations = Counter('savkar_firestore_operations_total',
+                               'Firestore RPCs by the repository function that made them, RPC and outcome.',
+                               ('function', 'op', 'outcome'))
+
+METRICS = [http_requests, http_latency, http_response_size, http_firestore_rpcs,
+           repository_calls, repository_latency, firestore_operations]
+
+# Callables returning extra exposition lines at scrape time (cache statistics)
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    _collectors.append(collector)
+
+
+def cache_collector(cache_name: str, stats: Callable[[], Dict[str, float]]) -> Callable[[], List[str]]:
+    """Collector for a cache whose stats() has hits/misses/evictions/entries/bytes/hit_rate"""
+    kinds = [('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+             ('entries', 'gauge'), ('bytes', 'gauge'), ('hit_rate', 'gauge')]
+
+    def collect():
+        values = stats()
+        lines = []
+        for key, kind in kinds:
+            if key not in values:
+                continue
+            name = f'savkar_cache_{key}_total' if kind == 'counter' else f'savkar_cache_{key}'
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name}{_labels(("cache",), (cache_name,))} {_number(values[key])}')
+        return lines
+    return collect
+
+
+def render() -> bytes:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def reset():
+    """Zero all series (tests)"""
+    for metric in METRICS:
+        metric.clear()
+
+
+def _record_call(function: str, kind: str, started: float, outcome: str):
+    repository_latency.observe(time.perf_counter() - started, function, kind)
+    repository_calls.inc(function, kind, outcome)
+    tracing.record('repo', function, started, outcome)
+
+
+def _record_rpc(function: str, rpc: str, outcome: str):
+    firestore_operations.inc(function or 'none', rpc, outcome)
+
+
+tracing.on_rpc(_record_rpc)
+
+
+def firestore_op(kind: str):
+    """Count and time a repository function doing Firestore work of `kind`
+    ("read", "write" or "delete") and attribute its RPCs to it; works for
+    sync and async functions"""
+    def decorate(func):
+        name = func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                token = tracing.enter_function(name)
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    _record_call(name, kind, started, 'error')
+                    raise
+                finally:
+                    tracing.exit_function(token)
+                _record_call(name, kind, started, 'ok')
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            token = tracing.enter_function(name)
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                _record_call(name, kind, started, 'error')
+                raise
+            finally:
+                tracing.exit_function(token)
+            _record_call(name, kind, started, 'ok')
+            return result
+        return wrapper
+    return decorate
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency and response size per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            template = tracing.route_template(scope)
+            method = scope['method']
+            http_requests.inc(method, template, str(status))
+            http_latency.observe(time.perf_counter() - started, method, template)
+            http_response_size.observe(size, method, template)
+            trace = scope.get(tracing.SCOPE_KEY)
+            if trace is not None:
+                http_firestore_rpcs.observe(trace.rpc_count, method, template)
@@ -3,11 +3,8 @@ from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
-def to_camel(snake_str: str) -> str:
-    components = snake_str.split('_')
-    # We capitalize the first letter of each component except the first one
-    # with the 'title' method and join them together.
-    return components[0] + ''.join(x.title() for x in components[1:])
+import case_keys
+from case_keys import to_camel
 
 class CamelCaseModel(BaseModel):
     class Config:
@@ -46,8 +43,11 @@ class Document(CamelCaseModel):
     name: str
     type: str
     uploaded_at: datetime
-    file_content: Optional[str] = None  # Base64 encoded
+    file_content: Optional[str] = None  # Base64 encoded (documents created before the blob store)
     file_name: Optional[str] = None
+    file_hash: Optional[str] = None  # SHA-256 of the file in the blob store
+    file_size: Optional[int] = None  # Bytes
+    mime_type: Optional[str] = None
 
 class Jamindar(CamelCaseModel):
     id: str
@@ -97,6 +97,28 @@ class LoanRecord(CamelCaseModel):
     permanent_address: Optional[str] = None
     jamindars: List[Jamindar] = []
     payment_records: List[dict] = []
+    version: Optional[int] = None  # Bumped by every write; None for loans never written since it was added
+    next_due_date: Optional[str] = None  # ISO date of the next unpaid instalment; None once closed
+    days_overdue: Optional[int] = None
+
+class LoanSummary(CamelCaseModel):
+    """List-screen view of a loan without the photo, jamindars or payment history"""
+    id: str
+    borrower_name: str
+    phone_number: str
+    emi: float
+    start_date: str
+    end_date: str
+    interest_rate: float
+    payment_mode: PaymentMode
+    total_loan: float
+    paid_amount: float
+    status: LoanStatus
+    loan_type: LoanType
+    created_at: datetime
+    updated_at: datetime
+    next_due_date: Optional[str] = None
+    days_overdue: Optional[int] = None
 
 class LegalNotice(CamelCaseModel):
     id: str
@@ -227,4 +249,76 @@ class ProfileUpdate(CamelCaseModel):
     purava: Optional[str] = None
     permanent_address: Optional[str] = None
     jamindars: List[dict] = []  # Ensure it's always a list
-    payment_records: List[dict] = []  # Added payment_records field
\ No newline at end of file
+    payment_records: List[dict] = []  # Added payment_records field
+
+class BulkLoanError(CamelCaseModel):
+    row: int  # 1-based position of the loan in the upload (CSV header excluded)
+    errors: List[str]
+
+class BulkLoanResult(CamelCaseModel):
+    created: int
+    failed: int
+    ids: List[Optional[str]]  # New loan id per row, None for rows that failed
+    errors: List[BulkLoanError]
+
+class PaymentStatus(str, Enum):
+    PAID = "Paid"
+    GAP = "Gap"  # Missed instalment; recorded but adds nothing to the paid amount
+
+class Payment(CamelCaseModel):
+    id: str
+    loan_id: str
+    amount: float
+    date: str
+    status: PaymentStatus = PaymentStatus.PAID
+    note: Optional[str] = None
+    created_at: datetime
+
+class PaymentCreate(CamelCaseModel):
+    amount: float
+    date: str
+    status: PaymentStatus = PaymentStatus.PAID
+    note: Optional[str] = None
+
+class PaymentReceipt(CamelCaseModel):
+    payment: Payment
+    paid_amount: float  # Loan totals after the payment was applied
+    status: LoanStatus
+
+class PaidAmountUpdate(CamelCaseModel):
+    paid_amount: float
+    expected_version: Optional[int] = None  # Reject the update if the loan has changed since this version
+
+class ScheduleRow(CamelCaseModel):
+    period: int
+    due_date: str
+    payment: float
+    principal: float
+    interest: float
+    balance: float
+
+class LoanSchedule(CamelCaseModel):
+    loan_id: str
+    method: str
+    months: int
+    stub_days: int
+    total_payment: float
+    total_interest: float
+    schedule: List[ScheduleRow]
+
+class ProjectionMonth(CamelCaseModel):
+    month: str  # YYYY-MM
+    payment: float
+    principal: float
+    interest: float
+
+class PortfolioProjection(CamelCaseModel):
+    method: str
+    loan_count: int
+    total_payment: float
+    total_interest: float
+    months: List[ProjectionMonth]
+
+# Key maps of the stored document schemas, so converting documents never
+# recomputes a field name
+case_keys.register(LoanRecord, Profile, Jamindar, Document, LegalNotice, Payment)
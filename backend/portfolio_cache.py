@@ -0,0 +1,158 @@
+"""
+Per-user read-through cache for the converted loan list returned by
+firestore_repo.get_loans_for_user.
+
+Entries expire after a TTL and the cache evicts least-recently-used users
+once the estimated size of all cached loan lists exceeds a byte budget.
+Every loan write bumps a per-user generation counter and drops that user's
+entry, so a read that raced with a write never stores stale data. Values
+derived from an entry (such as an encoded response body) live and die with it.
+
+Configured with SAVKAR_LOAN_CACHE_TTL (seconds, 0 disables the cache) and
+SAVKAR_LOAN_CACHE_MAX_BYTES.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory footprint of a converted loan structure, in bytes"""
+    if isinstance(value, (str, bytes)):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    return 32
+
+
+class PortfolioCache:
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # uid -> (expires_at, loans, size, {key: (derived value, size)})
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_bytes > 0
+
+    def generation(self, uid: str) -> int:
+        with self._lock:
+            return self._generations.get(uid, 0)
+
+    def get(self, uid: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached loans for uid, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, loans = entry[:2]
+            if expires_at <= self._clock():
+                self._drop(uid)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(uid)
+            self.hits += 1
+        # Shallow copies so callers can't mutate the cached dicts
+        return [dict(loan) for loan in loans]
+
+    def put(self, uid: str, loans: List[Dict[str, Any]], generation: int):
+        """Store loans read at `generation`; ignored if a write happened since"""
+        if not self.enabled:
+            return
+        size = estimate_size(loans)
+        if size > self.max_bytes:
+            return
+        stored = [dict(loan) for loan in loans]
+        with self._lock:
+            if self._generations.get(uid, 0) != generation:
+                return
+            self._drop(uid)
+            self._entries[uid] = (self._clock() + self.ttl_seconds, stored, size, {})
+            self._total_bytes += size
+            self._evict()
+
+    def derive(self, uid: str, key: Any, build: Callable[[List[Dict[str, Any]]], Any]) -> Optional[Any]:
+        """build(loans) for uid's cached loans, computed once and kept with the entry.
+
+        build must not modify the loans. Returns None when uid has no live entry.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None or entry[0] <= self._clock():
+                return None
+            derived = entry[3]
+            if key in derived:
+                return derived[key][0]
+        value = build(entry[1])
+        with self._lock:
+            # Keep the value only if the entry it was built from is still cached
+            if self._entries.get(uid) is entry and key not in derived:
+                size = estimate_size(value)
+                derived[key] = (value, size)
+                self._total_bytes += size
+                self._evict()
+        return value
+
+    def invalidate(self, uid: str):
+        """Drop uid's entry and fence off any read that is still in flight"""
+        with self._lock:
+            self._generations[uid] = self._generations.get(uid, 0) + 1
+            self._drop(uid)
+
+    def clear(self):
+        with self._lock:
+            for uid in list(self._entries):
+                self._generations[uid] = self._generations.get(uid, 0) + 1
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, uid: str):
+        entry = self._entries.pop(uid, None)
+        if entry is not None:
+            self._total_bytes -= entry[2] + sum(size for _, size in entry[3].values())
+
+
+loan_cache = PortfolioCache(
+    ttl_seconds=float(os.getenv("SAVKAR_LOAN_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+    max_bytes=int(os.getenv("SAVKAR_LOAN_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+)
@@ -0,0 +1,137 @@
+"""
+Streaming NDJSON/CSV export of a user's loans, profiles, document metadata
+and notices.
+
+Collections are read in pages of EXPORT_PAGE_SIZE ordered by document id,
+each page resuming after the last id of the previous one, and rows are
+encoded as they arrive and yielded in chunks of about CHUNK_BYTES. Memory
+use is bounded by one page no matter how large the collection is, and no
+single Firestore stream has to stay open for the whole export.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List
+
+import firestore_repo
+from models import Document, LegalNotice, LoanRecord, Profile, to_camel
+
+EXPORT_PAGE_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Stored document fields exported as metadata; file_content (legacy inline
+# base64 files) is never downloaded
+DOCUMENT_FIELDS = [name for name in Document.model_fields if name not in ('id', 'file_content')] + ['borrower_name']
+
+
+class ExportTarget:
+    def __init__(self, collection: Callable[[str], Any], convert: Callable[[Any], Dict[str, Any]],
+                 columns: List[str], fields: List[str] = None):
+        self.collection = collection
+        self.convert = convert
+        self.columns = columns  # CSV header, camelCase
+        self.fields = fields  # select() field mask, None reads whole documents
+
+
+def _columns(model, extra=()) -> List[str]:
+    return [to_camel(name) for name in model.model_fields if name != 'file_content'] + list(extra)
+
+
+EXPORTS = {
+    'loans': ExportTarget(firestore_repo._loans_col, firestore_repo._loan_snapshot_to_dict,
+                          _columns(LoanRecord)),
+    'profiles': ExportTarget(firestore_repo._profiles_col, firestore_repo._profile_snapshot_to_dict,
+                             _columns(Profile)),
+    'documents': ExportTarget(firestore_repo._docs_col, firestore_repo._document_snapshot_to_dict,
+                              _columns(Document, ['borrowerName']), DOCUMENT_FIELDS),
+    'notices': ExportTarget(firestore_repo._notices_col, firestore_repo._notice_snapshot_to_dict,
+                            _columns(LegalNotice)),
+}
+
+
+def iter_snapshots(col, fields: List[str] = None, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Any]:
+    """Every document of col, fetched page by page in document id order"""
+    query = col.order_by('__name__')
+    if fields is not None:
+        query = query.select(fields)
+    last = None
+    while True:
+        page_query = query.start_after(last) if last is not None else query
+        page = list(page_query.limit(page_size).stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def iter_records(uid: str, collection: str, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    target = EXPORTS[collection]
+    col = target.collection(uid)
+    if not col:
+        raise Exception(f"Failed to export {collection} for user {uid}")
+    for snapshot in iter_snapshots(col, target.fields, page_size):
+        record = target.convert(snapshot)
+        if record:
+            yield record
+
+
+def _json_default(value: Any):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_json_default, separators=(',', ':'))
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def _encode_ndjson(records: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, default=_json_default, separators=(',', ':')) + '\n'
+
+
+def _encode_csv(records: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([_csv_cell(record.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_rows(uid: str, collection: str, fmt: str = 'ndjson',
+                page_size: int = EXPORT_PAGE_SIZE) -> Iterator[str]:
+    """Encoded export rows (a CSV starts with its header row)"""
+    if collection not in EXPORTS:
+        raise ValueError(f"Unknown export collection '{collection}'")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    encode = _encode_csv if fmt == 'csv' else _encode_ndjson
+    return encode(iter_records(uid, collection, page_size), EXPORTS[collection].columns)
+
+
+def export_chunks(uid: str, collection: str, fmt: str = 'ndjson',
+                  chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """export_rows() grouped into byte chunks for a streaming response"""
+    pending, size = [], 0
+    for row in export_rows(uid, collection, fmt):
+        pending.append(row)
+        size += len(row)
+        if size >= chunk_bytes:
+            yield ''.join(pending).encode('utf-8')
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending).encode('utf-8')
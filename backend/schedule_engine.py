@@ -0,0 +1,272 @@
+"""
+Repayment schedules computed with NumPy, for one loan or a whole portfolio
+in a single vectorized pass.
+
+Rates follow the frontend calculators: interest_rate is a percentage per
+month, and part-months accrue interest per day at interest_rate / 30. The
+term runs from start_date to end_date (ISO dates); whole months become
+monthly instalments and any remaining days a final stub period.
+
+Methods:
+  emi            reducing-balance amortization with a fixed monthly payment
+                 (a stub counts as one more period)
+  interest_only  monthly interest on the full principal, principal repaid at the end
+  daily          like interest_only, but each period accrues interest for its
+                 actual number of days
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from models import to_camel
+
+METHODS = ('emi', 'interest_only', 'daily')
+# Longest schedule generated; protects the (loans x months) arrays from bad dates
+MAX_SCHEDULE_MONTHS = 360
+DAYS_PER_RATE_MONTH = 30
+# Loans per build_schedule call in a portfolio projection; bounds the size of
+# the (loans x periods) arrays regardless of the portfolio size
+PROJECTION_CHUNK_LOANS = 4096
+
+
+def _field(loan: Dict[str, Any], name: str, default=None):
+    """Read a stored (snake_case) or API (camelCase) loan field"""
+    value = loan.get(name)
+    if value is None:
+        value = loan.get(to_camel(name), default)
+    return getattr(value, 'value', value)
+
+
+def _parse_dates(values: Sequence[Any]) -> np.ndarray:
+    try:
+        return np.array([str(v)[:10] for v in values], dtype='datetime64[D]')
+    except ValueError:
+        # Fall back to one-by-one parsing so a bad date only drops its own loan
+        out = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                out[i] = np.datetime64(str(value)[:10], 'D')
+            except ValueError:
+                pass
+        return out
+
+
+def add_months(dates: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """dates + months, clamping the day to the end of shorter months (Jan 31 + 1 -> Feb 28/29)"""
+    month_start = dates.astype('datetime64[M]')
+    day = (dates - month_start.astype('datetime64[D]')).astype(np.int64)
+    target = month_start + months
+    days_in_month = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(np.int64)
+    return target.astype('datetime64[D]') + np.minimum(day, days_in_month - 1)
+
+
+class LoanTerms:
+    """Column arrays of the schedule inputs for a batch of loans"""
+
+    def __init__(self, ids, principal, monthly_rate, start, months, stub_days):
+        self.ids = ids
+        self.principal = principal
+        self.monthly_rate = monthly_rate
+        self.start = start
+        self.months = months
+        self.stub_days = stub_days
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, index: np.ndarray) -> 'LoanTerms':
+        """Terms of the loans at the positions in `index`"""
+        return LoanTerms([self.ids[i] for i in index], self.principal[index], self.monthly_rate[index],
+                         self.start[index], self.months[index], self.stub_days[index])
+
+    def periods(self) -> np.ndarray:
+        """Number of schedule rows per loan (a stub is one more period)"""
+        return self.months + (self.stub_days > 0)
+
+    @classmethod
+    def from_loans(cls, loans: Sequence[Dict[str, Any]]) -> 'LoanTerms':
+        ids = [loan.get('id') for loan in loans]
+        principal = np.array([float(_field(loan, 'total_loan', 0) or 0) for loan in loans])
+        monthly_rate = np.array([float(_field(loan, 'interest_rate', 0) or 0) for loan in loans]) / 100
+        start = _parse_dates([_field(loan, 'start_date', '') for loan in loans])
+        end = _parse_dates([_field(loan, 'end_date', '') for loan in loans])
+
+        valid = ~(np.isnat(start) | np.isnat(end)) & (end > start)
+        start_month = start.astype('datetime64[M]')
+        months = np.where(valid, (end.astype('datetime64[M]') - start_month).astype(np.int64), 0)
+        # A month only counts once its day-of-month has been reached
+        months = np.where(valid & (add_months(start, months) > end), months - 1, months)
+        months = np.clip(months, 0, MAX_SCHEDULE_MONTHS)
+        stub_days = np.where(valid, (end - add_months(start, months)).astype(np.int64), 0)
+        stub_days = np.where(months >= MAX_SCHEDULE_MONTHS, 0, np.maximum(stub_days, 0))
+        return cls(ids, principal, monthly_rate, start, months, stub_days)
+
+
+def emi_amounts(principal: np.ndarray, monthly_rate: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Fixed monthly payment that repays principal over `months` at `monthly_rate`"""
+    months = np.asarray(months, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = np.power(1 + monthly_rate, months)
+        emi = principal * monthly_rate * growth / (growth - 1)
+        flat = principal / months
+    emi = np.where(monthly_rate == 0, flat, emi)
+    return np.where(months > 0, emi, 0.0)
+
+
+class Schedule:
+    """(loans x periods) arrays of a batch of schedules; `mask` marks real periods"""
+
+    def __init__(self, terms: LoanTerms, method: str, due_date, payment, principal, interest, balance, mask):
+        self.terms = terms
+        self.method = method
+        self.due_date = due_date
+        self.payment = payment
+        self.principal = principal
+        self.interest = interest
+        self.balance = balance
+        self.mask = mask
+
+    def rows(self, index: int) -> List[Dict[str, Any]]:
+        """Schedule of the loan at `index` as JSON-ready rows"""
+        periods = int(self.mask[index].sum())
+        return [
+            {
+                'period': k + 1,
+                'due_date': str(self.due_date[index, k]),
+                'payment': round(float(self.payment[index, k]), 2),
+                'principal': round(float(self.principal[index, k]), 2),
+                'interest': round(float(self.interest[index, k]), 2),
+                'balance': round(float(self.balance[index, k]), 2),
+            }
+            for k in range(periods)
+        ]
+
+    def totals(self) -> Dict[str, np.ndarray]:
+        """Per-loan totals over the whole schedule"""
+        return {
+            'payment': self.payment.sum(axis=1),
+            'interest': self.interest.sum(axis=1),
+            'principal': self.principal.sum(axis=1),
+        }
+
+
+def build_schedule(terms: LoanTerms, method: str = 'emi') -> Schedule:
+    if method not in METHODS:
+        raise ValueError(f"Unknown schedule method '{method}'")
+    n = len(terms)
+    has_stub = terms.stub_days > 0
+    periods = terms.periods()
+    width = int(periods.max()) if n else 0
+
+    k = np.arange(1, width + 1)  # period number, 1-based
+    mask = k[None, :] <= periods[:, None]
+    is_stub = has_stub[:, None] & (k[None, :] == periods[:, None])
+    month_offset = np.minimum(k[None, :], terms.months[:, None])
+    due_date = add_months(terms.start[:, None], month_offset)
+    due_date = np.where(is_stub, due_date + terms.stub_days[:, None], due_date)
+
+    p = terms.principal[:, None]
+    r = terms.monthly_rate[:, None]
+    last = k[None, :] == periods[:, None]
+    if method == 'emi':
+        # A stub is amortized as one more period ending on end_date
+        emi = emi_amounts(terms.principal, terms.monthly_rate, periods)[:, None]
+        elapsed = np.where(mask, k[None, :] - 1, 0).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            growth = np.power(1 + r, elapsed)
+            balance_prev = np.where(r == 0, p - emi * elapsed, p * growth - emi * (growth - 1) / r)
+        interest = balance_prev * r
+        # The last instalment repays whatever is left, absorbing rounding drift
+        principal = np.where(last, balance_prev, emi - interest)
+        payment = principal + interest
+        balance = balance_prev - principal
+    else:
+        if method == 'daily':
+            period_start = add_months(terms.start[:, None], np.minimum(k[None, :] - 1, terms.months[:, None]))
+            days = (due_date - period_start).astype(np.int64)
+            interest = p * r * days / DAYS_PER_RATE_MONTH
+        else:
+            interest = np.where(is_stub, p * r * terms.stub_days[:, None] / DAYS_PER_RATE_MONTH, p * r)
+            interest = np.broadcast_to(interest, mask.shape)
+        principal = np.where(last, p, 0.0)
+        payment = interest + principal
+        balance = np.where(last, 0.0, p)
+
+    zero = np.zeros(mask.shape)
+    return Schedule(
+        terms, method,
+        due_date=due_date,
+        payment=np.where(mask, payment, zero),
+        principal=np.where(mask, principal, zero),
+        interest=np.where(mask, interest, zero),
+        balance=np.where(mask, balance, zero),
+        mask=mask,
+    )
+
+
+def schedule_for_loan(loan: Dict[str, Any], method: str = 'emi') -> Dict[str, Any]:
+    schedule = build_schedule(LoanTerms.from_loans([loan]), method)
+    totals = schedule.totals()
+    return {
+        'loan_id': loan.get('id'),
+        'method': method,
+        'months': int(schedule.terms.months[0]),
+        'stub_days': int(schedule.terms.stub_days[0]),
+        'total_payment': round(float(totals['payment'][0]), 2),
+        'total_interest': round(float(totals['interest'][0]), 2),
+        'schedule': schedule.rows(0),
+    }
+
+
+def _term_groups(terms: LoanTerms):
+    """Index arrays of loans with the same number of periods, at most PROJECTION_CHUNK_LOANS each.
+
+    Schedules of one group have no padding, so one long loan does not widen
+    the arrays of every short one.
+    """
+    periods = terms.periods()
+    order = np.argsort(periods, kind='stable')
+    for group in np.split(order, np.flatnonzero(np.diff(periods[order])) + 1):
+        for start in range(0, len(group), PROJECTION_CHUNK_LOANS):
+            yield group[start:start + PROJECTION_CHUNK_LOANS]
+
+
+def _monthly_sums(months: np.ndarray, values: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct months and the sum of each row of `values` per month"""
+    buckets, inverse = np.unique(months, return_inverse=True)
+    sums = np.zeros((len(values), len(buckets)))
+    for i, row in enumerate(values):
+        sums[i] = np.bincount(inverse, weights=row, minlength=len(buckets))
+    return buckets, sums
+
+
+def project_portfolio(loans: Sequence[Dict[str, Any]], method: str = 'emi') -> Dict[str, Any]:
+    """Expected collections per calendar month across every loan"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown schedule method '{method}'")
+    terms = LoanTerms.from_loans(loans)
+    # Each chunk is reduced to per-month sums before the next one is built
+    chunk_months, chunk_sums = [np.array([], dtype='datetime64[M]')], [np.zeros((3, 0))]
+    for index in _term_groups(terms):
+        schedule = build_schedule(terms.take(index), method)
+        months, sums = _monthly_sums(schedule.due_date.astype('datetime64[M]')[schedule.mask], [
+            values[schedule.mask] for values in (schedule.payment, schedule.principal, schedule.interest)])
+        chunk_months.append(months)
+        chunk_sums.append(sums)
+    buckets, by_month = _monthly_sums(np.concatenate(chunk_months), np.concatenate(chunk_sums, axis=1))
+    return {
+        'method': method,
+        'loan_count': len(loans),
+        'total_payment': round(float(by_month[0].sum()), 2),
+        'total_interest': round(float(by_month[2].sum()), 2),
+        'months': [
+            {
+                'month': str(month),
+                'payment': round(float(payment), 2),
+                'principal': round(float(principal), 2),
+                'interest': round(float(interest), 2),
+            }
+            for month, payment, principal, interest in zip(buckets, *by_month)
+        ],
+    }
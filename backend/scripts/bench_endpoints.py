@@ -0,0 +1,235 @@
+"""
+Endpoint benchmark: seeds the in-memory store with a synthetic portfolio at
+each scale, drives main.app through the ASGI interface (no HTTP server) and
+reports throughput and p50/p95/p99 latency per endpoint.
+
+The portfolio is written by generate_portfolio.generate_lender (as of a
+fixed date, so a seed always gives the same data): every loan has a photo,
+guarantors, two documents and a payment ledger in the payments
+subcollection, and about one in --detail-every also has a profile. The
+per-loan endpoints pick loans with a profile. Photos and files come from a
+small pool, so the content addressed blob store keeps them once.
+
+With --baseline, the run fails (exit code 1) when an endpoint's p95 is more
+than --threshold (default 25%) and --min-delta-ms slower than the baseline
+run. Write a baseline with --output on the same machine; timings from
+different machines are not comparable.
+
+Set SAVKAR_IO_MODE=async to measure the async read path, and
+SAVKAR_LOAN_CACHE_TTL=0 to measure GET /loans without the loan cache.
+
+Usage (PowerShell):
+python .\scripts\bench_endpoints.py
+python .\scripts\bench_endpoints.py --scales 1000,10000 --output bench.json
+python .\scripts\bench_endpoints.py --scales 1000 --baseline bench.json --threshold 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before the backend modules read them
+os.environ.setdefault('SAVKAR_STORAGE_BACKEND', 'memory')
+os.environ.setdefault('SAVKAR_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('SAVKAR_STARTUP_CHECK', 'skip')
+os.environ.setdefault('SAVKAR_BLOB_DIR', tempfile.mkdtemp(prefix='savkar-bench-'))
+
+import blob_store
+import firebase
+import firestore_repo
+import generate_portfolio
+import main as api
+from portfolio_cache import loan_cache
+
+UID = firestore_repo.SAVKAR_USER_ID
+# Date the portfolio is generated as of; fixed so baselines stay comparable
+SEED_DATE = date(2025, 1, 1)
+BLOB_POOL = 8
+PHOTO_KB = 12
+DOC_KB = 40
+
+
+def seed_portfolio(n, detail_every, seed=42):
+    """Write n loans through the portfolio generator, about one in detail_every
+    with a profile; returns the ids of the loans that have one"""
+    pool = generate_portfolio.build_blob_pool(seed, BLOB_POOL, PHOTO_KB, DOC_KB)
+    totals = generate_portfolio.generate_lender(
+        UID, n, seed=seed, pool=pool, profile_ratio=1 / detail_every, docs_per_loan=2,
+        notice_ratio=0.0, today=SEED_DATE)
+    if totals.get('failed'):
+        raise RuntimeError(f"{totals['failed']} of {n} loans failed to seed")
+    _, db = firebase.init_firebase()
+    profiles = db.collection('users').document(UID).collection('profiles').select(['loan_id']).stream()
+    return sorted(profile.get('loan_id') for profile in profiles)
+
+
+def reset_store():
+    firebase.reset_firebase()
+    blob_store.reset_blob_store()
+    loan_cache.clear()
+    firestore_repo._known_users.clear()
+
+
+async def asgi_request(app, method, url):
+    """Send one request straight through the ASGI interface; returns (status, body)"""
+    parts = urlsplit(url)
+    status = None
+    body = []
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # Streaming responses listen for the disconnect until they are done
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            body.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                finished.set()
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+             'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+             'query_string': parts.query.encode(), 'root_path': '', 'headers': [],
+             'server': ('bench', 80), 'client': ('bench', 1)}
+    await app(scope, receive, send)
+    return status, b''.join(body)
+
+
+def endpoints(detailed, documents):
+    """(label, url factory) pairs; factories pick a random detailed loan/document"""
+    return [
+        ('GET /loans', lambda rng: '/loans'),
+        ('GET /loans?limit=50', lambda rng: '/loans?limit=50&orderBy=-updatedAt'),
+        ('GET /loans/search', lambda rng: f'/loans/search?q={rng.choice(generate_portfolio.FIRST_NAMES)}'),
+        ('GET /dashboard/summary', lambda rng: '/dashboard/summary'),
+        ('GET /loans/{id}/profile', lambda rng: f'/loans/{rng.choice(detailed)}/profile'),
+        ('GET /loans/{id}/documents', lambda rng: f'/loans/{rng.choice(detailed)}/documents'),
+        ('GET /loans/{id}/payments', lambda rng: f'/loans/{rng.choice(detailed)}/payments'),
+        ('GET /documents/{id}/file', lambda rng: f'/documents/{rng.choice(documents)}/file'),
+    ]
+
+
+async def measure(app, url_for, requests, concurrency, max_seconds, seed):
+    """Run up to `requests` requests (fewer if max_seconds runs out); returns latencies and rps"""
+    rng = random.Random(seed)
+    status, _ = await asgi_request(app, 'GET', url_for(rng))  # warm up
+    if status != 200:
+        raise RuntimeError(f"{url_for(random.Random(seed))} returned {status}")
+
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + max_seconds
+
+    async def worker():
+        while len(latencies) < requests and (time.perf_counter() < deadline or len(latencies) < 5):
+            url = url_for(rng)
+            t0 = time.perf_counter()
+            status, _ = await asgi_request(app, 'GET', url)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                raise RuntimeError(f"{url} returned {status}")
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, len(latencies) / (time.perf_counter() - started)
+
+
+def summarize(latencies, rps):
+    q = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'requests': len(latencies), 'rps': round(rps, 2), 'p50_ms': round(q[49] * 1000, 3),
+            'p95_ms': round(q[94] * 1000, 3), 'p99_ms': round(q[98] * 1000, 3)}
+
+
+def regressions(results, baseline, threshold, min_delta_ms):
+    found = []
+    for scale, rows in results.items():
+        for label, row in rows.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(label)
+            if not base:
+                continue
+            limit = max(base['p95_ms'] * (1 + threshold), base['p95_ms'] + min_delta_ms)
+            if row['p95_ms'] > limit:
+                found.append(f"{scale} loans, {label}: p95 {row['p95_ms']:.2f} ms > {limit:.2f} ms "
+                             f"(baseline {base['p95_ms']:.2f} ms)")
+    return found
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--scales', default='1000,10000,100000', help='comma-separated loan counts')
+    p.add_argument('--detail-every', type=int, default=10,
+                   help='about one loan in N gets a profile')
+    p.add_argument('--requests', type=int, default=200, help='max requests per endpoint')
+    p.add_argument('--max-seconds', type=float, default=10.0, help='time budget per endpoint')
+    p.add_argument('--concurrency', type=int, default=1)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--output', help='write results as JSON (usable as a baseline)')
+    p.add_argument('--baseline', help='results JSON to compare against')
+    p.add_argument('--threshold', type=float, default=0.25, help='allowed p95 slowdown (0.25 = 25%%)')
+    p.add_argument('--min-delta-ms', type=float, default=1.0, help='p95 slowdowns below this never fail')
+    args = p.parse_args()
+
+    warnings.simplefilter('ignore')
+    loop = asyncio.new_event_loop()
+    results = {}
+    print(f"IO mode {api.IO_MODE}, loan cache {'on' if loan_cache.enabled else 'off'}, "
+          f"concurrency {args.concurrency}")
+    for scale in [int(s) for s in args.scales.split(',') if s.strip()]:
+        reset_store()
+        t0 = time.perf_counter()
+        detailed = seed_portfolio(scale, args.detail_every, args.seed)
+        documents = [d['id'] for loan_id in detailed[:50]
+                     for d in firestore_repo.get_documents_for_user(UID, loan_id)]
+        print(f"\n{scale} loans ({len(detailed)} with a profile), "
+              f"seeded in {time.perf_counter() - t0:.1f}s")
+        print(f"{'endpoint':<28} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        rows = results[str(scale)] = {}
+        for label, url_for in endpoints(detailed, documents):
+            latencies, rps = loop.run_until_complete(
+                measure(api.app, url_for, args.requests, args.concurrency, args.max_seconds, args.seed))
+            row = rows[label] = summarize(latencies, rps)
+            print(f"{label:<28} {row['requests']:>8} {row['rps']:>9.2f} {row['p50_ms']:>9.2f} "
+                  f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+
+    report = {'io_mode': api.IO_MODE, 'concurrency': args.concurrency, 'detail_every': args.detail_every,
+              'python': sys.version.split()[0], 'scales': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        settings = ('io_mode', 'concurrency', 'detail_every')
+        if any(baseline.get(key) != report[key] for key in settings):
+            p.error(f"{args.baseline} was recorded with "
+                    f"{', '.join(f'{key}={baseline.get(key)}' for key in settings)}; rerun with the same settings")
+        found = regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if found:
+            print(f"\n{len(found)} regression(s) against {args.baseline}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of the snake_case -> camelCase conversion of stored
+documents: the cached case_keys maps against the previous per-key
+split/capitalize (and double-regex) conversion. Prints the cost per document.
+
+Usage (PowerShell):
+python .\scripts\bench_key_conversion.py
+python .\scripts\bench_key_conversion.py --docs 10000 --repeat 5
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # registers the schema key maps
+from case_keys import camel_keys, snake_keys
+
+
+def legacy_camel(data):
+    """The recursive converter firestore_repo used before case_keys"""
+    if not data:
+        return data
+    if isinstance(data, list):
+        return [legacy_camel(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    converted = {}
+    for key, value in data.items():
+        if '_' in key:
+            parts = key.split('_')
+            camel_key = parts[0] + ''.join(part.capitalize() for part in parts[1:])
+        else:
+            camel_key = key
+        if isinstance(value, dict):
+            converted[camel_key] = legacy_camel(value)
+        elif isinstance(value, list):
+            converted[camel_key] = [legacy_camel(item) if isinstance(item, dict) else item for item in value]
+        else:
+            converted[camel_key] = value
+    return converted
+
+
+def legacy_snake(data):
+    def camel_to_snake(name):
+        s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
+        return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+    return {camel_to_snake(key): value for key, value in data.items()}
+
+
+def sample_loan(i):
+    return {
+        'borrower_name': f'Borrower {i}', 'phone_number': f'98765{i:05d}', 'total_loan': 10000.0,
+        'paid_amount': 2500.0, 'emi': 1000.0, 'interest_rate': 2.0, 'start_date': '2024-01-15',
+        'end_date': '2024-12-15', 'payment_mode': 'Cash', 'status': 'Active', 'loan_type': 'Cash Loan',
+        'created_at': '2024-01-15T00:00:00', 'updated_at': '2024-01-15T00:00:00', 'version': 3,
+        'next_due_date': '2024-04-15', 'days_overdue': 0, 'profile_photo_url': None,
+        'jamindars': [{'name': 'Guarantor', 'phone_number': '9000000000', 'aadhaar_number': '1234'}],
+        'payment_records': [{'paid_on': '2024-02-15', 'amount_paid': 1000.0}] * 3,
+    }
+
+
+def bench(label, func, docs, repeat):
+    best = min(timeit.repeat(lambda: [func(doc) for doc in docs], number=1, repeat=repeat))
+    per_doc = best / len(docs) * 1e6
+    print(f"{label:<28} {per_doc:8.2f} us/doc")
+    return per_doc
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--docs', type=int, default=5000)
+    p.add_argument('--repeat', type=int, default=5)
+    args = p.parse_args()
+
+    docs = [sample_loan(i) for i in range(args.docs)]
+    assert all(camel_keys(doc) == legacy_camel(doc) for doc in docs[:10])
+    old = bench('legacy camelCase (deep)', legacy_camel, docs, args.repeat)
+    new = bench('case_keys.camel_keys', camel_keys, docs, args.repeat)
+    bench('case_keys.camel_keys shallow', lambda doc: camel_keys(doc, deep=False), docs, args.repeat)
+    print(f"camelCase speed-up: {old / new:.1f}x")
+
+    camel_docs = [camel_keys(doc, deep=False) for doc in docs]
+    old = bench('legacy snake_case (regex)', legacy_snake, camel_docs, args.repeat)
+    new = bench('case_keys.snake_keys', snake_keys, camel_docs, args.repeat)
+    print(f"snake_case speed-up: {old / new:.1f}x")
+
+if __name__ == '__main__':
+    main()
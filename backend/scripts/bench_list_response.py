@@ -0,0 +1,153 @@
+"""
+Benchmark of the list response path, in CPU milliseconds per 1k loans:
+
+  installed FastAPI   a route returning LoanRecord models under response_model
+                      against one returning fast_json.records_response, both
+                      called through the ASGI interface (no HTTP client).
+                      Current FastAPI already validates once, so these are
+                      about equal
+  cached /loans       the response_model route against one returning
+                      fast_json.cached_records_response with the loans in
+                      portfolio_cache, as GET /loans serves a cached portfolio
+  pre-0.13x FastAPI   the response pipeline of FastAPI releases without the
+                      direct pydantic JSON path (dump each model to a dict,
+                      validate again, serialize, json.dumps) against
+                      records_response
+  projection          JSONResponse(jsonable_encoder(rows)) against
+                      FastJSONResponse(rows) for ?fields= responses
+
+Usage (PowerShell):
+python .\scripts\bench_list_response.py
+python .\scripts\bench_list_response.py --loans 5000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import warnings
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastapi
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from fast_json import FastJSONResponse, cached_records_response, list_adapter, records_response
+from models import LoanRecord
+from portfolio_cache import loan_cache
+
+UID = 'bench_user'
+
+
+def sample_rows(n):
+    return [
+        {
+            'id': f'loan{i:06d}', 'borrowerName': f'Borrower {i}', 'phoneNumber': f'98765{i:05d}',
+            'emi': 1000.0, 'startDate': '2024-01-15', 'endDate': '2024-12-15', 'interestRate': 2.0,
+            'paymentMode': 'Cash', 'totalLoan': 12000.0, 'paidAmount': 3000.0, 'status': 'Active',
+            'loanType': 'Cash Loan', 'createdAt': '2024-01-15T00:00:00', 'updatedAt': '2024-03-01T10:00:00',
+            'jamindars': [{'id': 'j1', 'name': 'Guarantor', 'mobile': '9000000000',
+                           'residenceAddress': 'Pune', 'permanentAddress': 'Pune'}],
+            'paymentRecords': [{'date': '2024-02-15', 'amount': 1000.0}] * 3,
+            'version': 4, 'nextDueDate': '2024-04-15', 'daysOverdue': 0,
+        }
+        for i in range(n)
+    ]
+
+
+def build_app(rows):
+    app = FastAPI()
+
+    @app.get('/legacy', response_model=List[LoanRecord])
+    def legacy():
+        return [LoanRecord(**row) for row in rows]
+
+    @app.get('/fast', response_model=List[LoanRecord])
+    def fast():
+        return records_response(LoanRecord, rows)
+
+    @app.get('/cached', response_model=List[LoanRecord])
+    def cached():
+        return cached_records_response(LoanRecord, UID, rows)
+
+    return app
+
+
+async def asgi_get(app, path):
+    """GET path straight through the ASGI interface; returns the body"""
+    body = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            body.append(message.get('body', b''))
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+             'root_path': '', 'headers': [], 'server': ('bench', 80), 'client': ('bench', 1)}
+    await app(scope, receive, send)
+    return b''.join(body)
+
+
+def cpu_ms(func, repeat):
+    func()  # warm up
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def legacy_pipeline(rows):
+    """What FastAPI < 0.13x did with a list of models under response_model"""
+    models = [LoanRecord(**row) for row in rows]
+    dumped = [model.model_dump(by_alias=True) for model in models]
+    validated = list_adapter(LoanRecord).validate_python(dumped)
+    content = list_adapter(LoanRecord).dump_python(validated, mode='json', by_alias=True)
+    return JSONResponse(content=content).body
+
+
+def report(label, old, new, per_1k):
+    print(f"{label:<20} {old * per_1k:9.2f} -> {new * per_1k:8.2f} ms CPU per 1k loans ({old / new:.1f}x)")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--loans', type=int, default=1000)
+    p.add_argument('--repeat', type=int, default=10)
+    args = p.parse_args()
+
+    warnings.simplefilter('ignore')
+    rows = sample_rows(args.loans)
+    loan_cache.max_bytes = max(loan_cache.max_bytes, 1 << 30)
+    loan_cache.put(UID, rows, loan_cache.generation(UID))
+    app = build_app(rows)
+    loop = asyncio.new_event_loop()
+    get = lambda path: loop.run_until_complete(asgi_get(app, path))
+    assert json.loads(get('/legacy')) == json.loads(get('/fast')) == json.loads(legacy_pipeline(rows))
+    assert get('/cached') == get('/fast')
+
+    per_1k = 1000 / args.loans
+    print(f"{args.loans} loans per response, FastAPI {fastapi.__version__}, "
+          f"orjson {'installed' if fast_json.orjson else 'not installed'}")
+    report('installed FastAPI', cpu_ms(lambda: get('/legacy'), args.repeat),
+           cpu_ms(lambda: get('/fast'), args.repeat), per_1k)
+    report('cached /loans', cpu_ms(lambda: get('/legacy'), args.repeat),
+           cpu_ms(lambda: get('/cached'), args.repeat), per_1k)
+    report('pre-0.13x FastAPI', cpu_ms(lambda: legacy_pipeline(rows), args.repeat),
+           cpu_ms(lambda: records_response(LoanRecord, rows).body, args.repeat), per_1k)
+    report('projection', cpu_ms(lambda: JSONResponse(content=jsonable_encoder(rows)).body, args.repeat),
+           cpu_ms(lambda: FastJSONResponse(content=rows).body, args.repeat), per_1k)
+
+if __name__ == '__main__':
+    main()
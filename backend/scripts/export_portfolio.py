@@ -0,0 +1,41 @@
+"""
+Export a user's loans, profiles, document metadata or notices as NDJSON or
+CSV, streaming page by page (see portfolio_export.py).
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\export_portfolio.py loans --format csv --output loans.csv
+python .\scripts\export_portfolio.py notices --uid some-firebase-uid
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_repo
+import portfolio_export
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('collection', choices=sorted(portfolio_export.EXPORTS))
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User to export (defaults to the savkar user)')
+    p.add_argument('--format', dest='fmt', choices=sorted(portfolio_export.FORMATS), default='ndjson')
+    p.add_argument('--output', type=str, help='File to write (defaults to stdout)')
+    p.add_argument('--page-size', type=int, default=portfolio_export.EXPORT_PAGE_SIZE)
+    args = p.parse_args()
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for row in portfolio_export.export_rows(args.uid, args.collection, args.fmt, args.page_size):
+            out.write(row)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
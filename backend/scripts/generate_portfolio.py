@@ -0,0 +1,359 @@
+"""
+Generate a synthetic lending portfolio for load and scale testing.
+
+For each lender it writes loans across every LoanType, LoanStatus and
+PaymentMode, with:
+
+- a payment ledger in the payments subcollection, including missed
+  instalments (Gap entries); each loan's paid_amount and status match it,
+- a profile with guarantors (jamindars) and a photo,
+- documents whose files are base64 blobs of --doc-kb,
+- legal notices for some of the loans that are still open.
+
+Loans go through firestore_repo.create_loans_for_user, which batches them
+and keeps the dashboard aggregates, due dates and search tokens up to date.
+Ledgers, profiles, documents and notices are written with batched writes.
+Loans are generated and written in chunks of --chunk-size by --writers
+threads. Each chunk draws from its own generator seeded with
+(--seed, lender, chunk), so the same arguments always produce the same data
+whatever the number of writers, given the same --today. Firestore assigns
+the document ids.
+
+Photos and files come from a pool of --blob-pool distinct blobs that are
+stored once in the (content-addressed) blob store.
+
+Usage (PowerShell):
+python .\scripts\generate_portfolio.py --loans 100000 --sqlite-path synthetic.db
+python .\scripts\generate_portfolio.py --lenders 10 --loans 100000 --writers 8 --sqlite-path synthetic.db
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\generate_portfolio.py --backend firestore --uid load-test-lender --loans 5000
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SAVKAR_LOG_LEVEL', 'WARNING')
+
+import firebase
+import firestore_repo
+from blob_store import store_content
+from due_dates import instalment_date
+from models import LoanStatus, LoanType, NoticeStatus, PaymentMode, PaymentStatus
+
+FIRST_NAMES = ['Ramesh', 'Suresh', 'Mahesh', 'Kiran', 'Vikas', 'Anita', 'Sunita', 'Prakash', 'Meena', 'Ganesh',
+               'Lata', 'Sachin', 'Pooja', 'Rahul', 'Savita', 'Dnyaneshwar', 'Ashwini', 'Nitin', 'Vaishali', 'Sandip']
+MIDDLE_NAMES = ['Baburao', 'Dattatray', 'Vitthal', 'Shankar', 'Maruti', 'Ramchandra', 'Pandurang', 'Sopan']
+SURNAMES = ['Patil', 'Jadhav', 'Pawar', 'Shinde', 'Kulkarni', 'Deshmukh', 'More', 'Gaikwad', 'Chavan', 'Kale',
+            'Bhosale', 'Salunkhe', 'Mane', 'Kadam', 'Thorat', 'Sawant']
+VILLAGES = ['Pune', 'Baramati', 'Satara', 'Sangli', 'Kolhapur', 'Solapur', 'Nashik', 'Ahmednagar', 'Indapur',
+            'Phaltan', 'Karad', 'Wai']
+OCCUPATIONS = ['Farmer', 'Shopkeeper', 'Driver', 'Teacher', 'Tailor', 'Dairy farmer', 'Mechanic', 'Contractor']
+DOCUMENT_NAMES = ['Aadhaar Card', 'PAN Card', 'Loan Agreement', 'Property Papers', 'Bank Statement', 'Gold Receipt']
+
+# Weights roughly follow a small-town lender's book
+LOAN_TYPE_WEIGHTS = {LoanType.CASH_LOAN: 6, LoanType.GOLD_LOAN: 3, LoanType.HOME_LOAN: 1}
+LOAN_AMOUNTS = {
+    LoanType.CASH_LOAN: (5_000, 10_000, 20_000, 25_000, 50_000),
+    LoanType.GOLD_LOAN: (20_000, 50_000, 75_000, 100_000, 150_000),
+    LoanType.HOME_LOAN: (200_000, 300_000, 500_000, 800_000),
+}
+TARGET_STATUS_WEIGHTS = {LoanStatus.ACTIVE: 70, LoanStatus.PENDING: 10, LoanStatus.CLOSED: 20}
+PAYMENT_MODE_WEIGHTS = {PaymentMode.CASH: 5, PaymentMode.UPI: 3, PaymentMode.BANK_TRANSFER: 2, PaymentMode.CHEQUE: 1}
+GAP_PROBABILITY = 0.08
+FIRST_START_DATE = date(2022, 1, 1)
+
+DEFAULT_BLOB_POOL = 16
+DEFAULT_PHOTO_KB = 24
+DEFAULT_DOC_KB = 64
+
+
+def _weighted(rng: random.Random, weights: Dict[Any, int]):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _data_url(rng: random.Random, mime: str, magic: bytes, size: int) -> str:
+    data = magic + rng.randbytes(max(size - len(magic), 0))
+    return f'data:{mime};base64,' + base64.b64encode(data).decode()
+
+
+def build_blob_pool(seed: int, pool_size: int, photo_kb: int, doc_kb: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Store pool_size photos and document files once; returns their hash/size/mime_type"""
+    rng = random.Random(f'{seed}:blobs')
+    return {
+        'photos': [store_content(_data_url(rng, 'image/jpeg', b'\xff\xd8\xff\xe0', photo_kb * 1024))
+                   for _ in range(pool_size)],
+        'files': [store_content(_data_url(rng, 'application/pdf', b'%PDF-1.4\n', doc_kb * 1024))
+                  for _ in range(pool_size)],
+    }
+
+
+def _person(rng: random.Random) -> str:
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(SURNAMES)}'
+
+
+def _mobile(rng: random.Random) -> str:
+    return f'{rng.choice("6789")}{rng.randrange(10 ** 9):09d}'
+
+
+def _address(rng: random.Random) -> str:
+    return f'{rng.randint(1, 999)}, {rng.choice(SURNAMES)} Galli, {rng.choice(VILLAGES)}'
+
+
+def _jamindars(rng: random.Random, loan_number: int) -> List[Dict[str, Any]]:
+    return [
+        {'id': f'j{loan_number}-{k}', 'name': _person(rng), 'mobile': _mobile(rng),
+         'residence_address': _address(rng), 'permanent_address': _address(rng)}
+        for k in range(rng.choice((1, 1, 2)))
+    ]
+
+
+def _ledger(rng: random.Random, target: LoanStatus, start: date, months: int, emi: float,
+            total: float, today: date) -> List[Dict[str, Any]]:
+    """Monthly payments (and missed instalments) consistent with the target status"""
+    if target == LoanStatus.PENDING:
+        return []
+    elapsed = max(1, min(months, (today.year - start.year) * 12 + today.month - start.month))
+    instalments = months if target == LoanStatus.CLOSED else rng.randint(1, max(1, min(elapsed, months - 1)))
+    ledger = []
+    paid = 0.0
+    paid_count = 0
+    month = 1
+    while paid_count < instalments:
+        # Loans closed ahead of schedule were prepaid; no payment is dated in the future
+        due = min(instalment_date(start, month), today)
+        if target != LoanStatus.CLOSED and rng.random() < GAP_PROBABILITY:
+            ledger.append({'amount': emi, 'date': due.isoformat(), 'status': PaymentStatus.GAP.value,
+                           'note': 'Missed instalment'})
+        else:
+            remaining = round(total - paid, 2)
+            amount = remaining if (target == LoanStatus.CLOSED and len(ledger) == months - 1) else min(emi, remaining)
+            ledger.append({'amount': amount, 'date': due.isoformat(), 'status': PaymentStatus.PAID.value,
+                           'note': None})
+            paid = round(paid + amount, 2)
+            paid_count += 1
+        month += 1
+    return ledger
+
+
+def generate_loan(rng: random.Random, loan_number: int, pool: Dict[str, List[Dict[str, Any]]],
+                  today: date) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """One loan (as stored, snake_case) and its payment ledger"""
+    loan_type = _weighted(rng, LOAN_TYPE_WEIGHTS)
+    target = _weighted(rng, TARGET_STATUS_WEIGHTS)
+    total = float(rng.choice(LOAN_AMOUNTS[loan_type]))
+    months = rng.choice((6, 12, 18, 24, 36) if loan_type != LoanType.HOME_LOAN else (36, 60, 84))
+    # Closed loans start early enough to have run their full term where possible
+    latest = today - timedelta(days=31 * months) if target == LoanStatus.CLOSED else today
+    span = max((latest - FIRST_START_DATE).days, (today - FIRST_START_DATE).days // 4, 1)
+    start = FIRST_START_DATE + timedelta(days=rng.randrange(span))
+    emi = round(total / months, 2)
+    ledger = _ledger(rng, target, start, months, emi, total, today)
+    paid = round(sum(p['amount'] for p in ledger if p['status'] == PaymentStatus.PAID.value), 2)
+    photo = rng.choice(pool['photos'])
+    loan = {
+        'borrower_name': _person(rng),
+        'phone_number': _mobile(rng),
+        'emi': emi,
+        'start_date': start.isoformat(),
+        'end_date': instalment_date(start, months).isoformat(),
+        'interest_rate': rng.choice((1.0, 1.5, 2.0, 2.5, 3.0)),
+        'payment_mode': _weighted(rng, PAYMENT_MODE_WEIGHTS).value,
+        'total_loan': total,
+        'paid_amount': paid,
+        'status': firestore_repo.loan_status_for_paid_amount(paid, total),
+        'loan_type': loan_type.value,
+        # Already in the blob store, so create_loans_for_user has nothing to externalize
+        'profile_photo_hash': photo['hash'],
+        'profile_photo_size': photo['size'],
+        'profile_photo_mime': photo['mime_type'],
+        'occupation': rng.choice(OCCUPATIONS),
+        'address': _address(rng),
+        'jamindars': _jamindars(rng, loan_number),
+        'payment_records': [],
+    }
+    return loan, ledger
+
+
+class BatchWriter:
+    """Collects writes into batches of BULK_BATCH_SIZE and commits them as they fill"""
+
+    def __init__(self, db):
+        self._db = db
+        self._batch = db.batch()
+        self.writes = 0
+
+    def set(self, ref, data: Dict[str, Any]):
+        self._batch.set(ref, data)
+        self.writes += 1
+        if len(self._batch) >= firestore_repo.BULK_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if len(self._batch):
+            self._batch.commit()
+            self._batch = self._db.batch()
+
+
+def write_chunk(uid: str, first: int, count: int, seed: int, pool: Dict[str, List[Dict[str, Any]]],
+                profile_ratio: float = 1.0, docs_per_loan: int = 2, notice_ratio: float = 0.05,
+                today: Optional[date] = None) -> Dict[str, int]:
+    """Generate and write loans first..first+count-1 of a lender; returns counts"""
+    rng = random.Random(f'{seed}:{uid}:{first}')
+    today = today or date.today()
+    generated = [generate_loan(rng, first + i, pool, today) for i in range(count)]
+    # Decide the extras up front so the data does not depend on write failures
+    extras = [{
+        'profile': rng.random() < profile_ratio,
+        'photo': rng.choice(pool['photos']),
+        'documents': [(name, rng.choice(pool['files']))
+                      for name in rng.sample(DOCUMENT_NAMES, min(docs_per_loan, len(DOCUMENT_NAMES)))],
+        'notice': rng.random() < notice_ratio,
+        'overdue': rng.randint(1, 6),
+        'notice_age': rng.randrange(90),
+        'resolved': rng.random() < 0.3,
+    } for _ in generated]
+
+    results = firestore_repo.create_loans_for_user(uid, [loan for loan, _ in generated])
+
+    _, db = firebase.init_firebase()
+    user_ref = db.collection('users').document(uid)
+    writer = BatchWriter(db)
+    counts = {'loans': 0, 'failed': 0, 'payments': 0, 'profiles': 0, 'documents': 0, 'notices': 0}
+    now = datetime.utcnow()
+    for (loan_id, error), (loan, ledger), extra in zip(results, generated, extras):
+        if error:
+            counts['failed'] += 1
+            continue
+        counts['loans'] += 1
+        loan_ref = user_ref.collection('loans').document(loan_id)
+        for payment in ledger:
+            writer.set(loan_ref.collection('payments').document(),
+                       dict(payment, loan_id=loan_id, created_at=now))
+        counts['payments'] += len(ledger)
+
+        if extra['profile']:
+            photo = extra['photo']
+            writer.set(user_ref.collection('profiles').document(), {
+                'loan_id': loan_id, 'occupation': loan['occupation'], 'address': loan['address'],
+                'profile_photo': None, 'profile_photo_hash': photo['hash'],
+                'profile_photo_size': photo['size'], 'profile_photo_mime': photo['mime_type'],
+                'address_as_per_aadhar': loan['address'], 'nave': None, 'haste': None, 'purava': None,
+                'permanent_address': loan['address'], 'jamindars': loan['jamindars'],
+                'created_at': now, 'updated_at': now,
+            })
+            counts['profiles'] += 1
+
+        for name, blob in extra['documents']:
+            writer.set(user_ref.collection('documents').document(), {
+                'loan_id': loan_id, 'name': name, 'type': 'application/pdf',
+                'file_name': f"{name.lower().replace(' ', '_')}.pdf", 'borrower_name': loan['borrower_name'],
+                'uploaded_at': now, 'file_hash': blob['hash'], 'file_size': blob['size'],
+                'mime_type': blob['mime_type'],
+            })
+        counts['documents'] += len(extra['documents'])
+
+        if extra['notice'] and loan['status'] != LoanStatus.CLOSED.value:
+            overdue = extra['overdue']
+            writer.set(user_ref.collection('notices').document(), {
+                'borrower_id': loan_id, 'borrower_name': loan['borrower_name'],
+                'amount_due': round(min(loan['emi'] * overdue, loan['total_loan'] - loan['paid_amount']), 2),
+                'notice_date': (today - timedelta(days=extra['notice_age'])).isoformat(),
+                'status': (NoticeStatus.RESOLVED if extra['resolved'] else NoticeStatus.PENDING).value,
+                'description': f'{overdue} instalment(s) overdue',
+                'created_at': now, 'updated_at': now,
+            })
+            counts['notices'] += 1
+    writer.flush()
+    return counts
+
+
+def generate_lender(uid: str, loans: int, seed: int = 42, writers: int = 4, chunk_size: int = 2000,
+                    pool: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                    progress: Optional[Callable[[str, Dict[str, int]], None]] = None, **options) -> Dict[str, int]:
+    """Write `loans` synthetic loans (and their ledgers, profiles, documents and
+    notices) for uid with `writers` parallel chunk writers; returns the counts.
+    options are passed to write_chunk (profile_ratio, docs_per_loan, notice_ratio, today)."""
+    pool = pool or build_blob_pool(seed, DEFAULT_BLOB_POOL, DEFAULT_PHOTO_KB, DEFAULT_DOC_KB)
+    if not firestore_repo.ensure_user_exists(uid):
+        raise Exception(f"Failed to create user {uid}")
+    totals: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def run(first):
+        counts = write_chunk(uid, first, min(chunk_size, loans - first), seed, pool, **options)
+        with lock:
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+            if progress:
+                progress(uid, dict(totals))
+
+    with ThreadPoolExecutor(max_workers=max(1, writers)) as executor:
+        for future in [executor.submit(run, first) for first in range(0, loans, chunk_size)]:
+            future.result()
+    return totals
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--backend', choices=['sqlite', 'memory', 'firestore'], default='sqlite',
+                   help='memory only measures generation speed; the data is gone when the script exits')
+    p.add_argument('--sqlite-path', default='savkar_synthetic.db')
+    p.add_argument('--uid', help='write one lender with this uid (default: synthetic_lender_NNN)')
+    p.add_argument('--lenders', type=int, default=1)
+    p.add_argument('--loans', type=int, default=10000, help='loans per lender')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--writers', type=int, default=4, help='chunks written in parallel')
+    p.add_argument('--chunk-size', type=int, default=2000)
+    p.add_argument('--profile-ratio', type=float, default=1.0)
+    p.add_argument('--docs-per-loan', type=int, default=2)
+    p.add_argument('--notice-ratio', type=float, default=0.05)
+    p.add_argument('--doc-kb', type=int, default=DEFAULT_DOC_KB, help='size of each document file')
+    p.add_argument('--photo-kb', type=int, default=DEFAULT_PHOTO_KB)
+    p.add_argument('--blob-pool', type=int, default=DEFAULT_BLOB_POOL, help='distinct photos and files')
+    p.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                   help='date the portfolio is generated as of (YYYY-MM-DD); fix it to reproduce a dataset')
+    args = p.parse_args()
+
+    os.environ[firebase.STORAGE_BACKEND_ENV] = args.backend
+    os.environ[firebase.SQLITE_PATH_ENV] = args.sqlite_path
+    uids = [args.uid] if args.uid else [f'synthetic_lender_{k:03d}' for k in range(1, args.lenders + 1)]
+
+    started = time.perf_counter()
+    last_report = [0.0]
+
+    def progress(uid, totals):
+        if time.perf_counter() - last_report[0] >= 5:
+            last_report[0] = time.perf_counter()
+            print(f"{uid}: {totals['loans']}/{args.loans} loans "
+                  f"({totals['loans'] / (last_report[0] - lender_started):.0f} loans/s)")
+
+    pool = build_blob_pool(args.seed, args.blob_pool, args.photo_kb, args.doc_kb)
+    grand = {}
+    for uid in uids:
+        lender_started = time.perf_counter()
+        totals = generate_lender(uid, args.loans, seed=args.seed, writers=args.writers,
+                                 chunk_size=args.chunk_size, pool=pool, progress=progress,
+                                 profile_ratio=args.profile_ratio, docs_per_loan=args.docs_per_loan,
+                                 notice_ratio=args.notice_ratio, today=args.today)
+        print(f"{uid}: {totals} in {time.perf_counter() - lender_started:.1f}s")
+        for key, value in totals.items():
+            grand[key] = grand.get(key, 0) + value
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {grand.get('loans', 0)} loans for {len(uids)} lender(s) in {elapsed:.1f}s "
+          f"({grand.get('loans', 0) / elapsed:.0f} loans/s): {grand}")
+    if grand.get('failed'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
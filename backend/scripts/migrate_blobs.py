@@ -0,0 +1,62 @@
+"""
+Move inline base64 files and profile photos out of Firestore documents and
+into the blob store (see blob_store.py), leaving only hash/size/MIME type.
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+$env:SAVKAR_BLOB_DIR = 'D:\savkar\blobs'
+python .\scripts\migrate_blobs.py --dry-run
+python .\scripts\migrate_blobs.py --uid some-firebase-uid
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_repo
+from blob_store import externalize_photo, store_content
+
+
+def migrate_collection(col, kind, dry_run):
+    moved = 0
+    for snapshot in col.stream():
+        data = snapshot.to_dict() or {}
+        update = {}
+        if kind == 'documents' and data.get('file_content'):
+            if not dry_run:
+                stored = store_content(data['file_content'])
+                update = {
+                    'file_content': None,
+                    'file_hash': stored['hash'],
+                    'file_size': stored['size'],
+                    'mime_type': stored['mime_type'],
+                }
+        elif kind != 'documents' and data.get('profile_photo'):
+            if not dry_run:
+                update = {'profile_photo': data['profile_photo']}
+                externalize_photo(update)
+        else:
+            continue
+        moved += 1
+        if update:
+            snapshot.reference.update(update)
+    print(f"{kind}: {'would move' if dry_run else 'moved'} {moved} inline blobs")
+    return moved
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User whose documents should be migrated (defaults to the savkar user)')
+    p.add_argument('--dry-run', action='store_true', help='Only count the inline blobs')
+    args = p.parse_args()
+
+    migrate_collection(firestore_repo._loans_col(args.uid), 'loans', args.dry_run)
+    migrate_collection(firestore_repo._profiles_col(args.uid), 'profiles', args.dry_run)
+    migrate_collection(firestore_repo._docs_col(args.uid), 'documents', args.dry_run)
+    firestore_repo.loan_cache.invalidate(args.uid)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Move the payment_records arrays embedded in loan documents into each loan's
+payments subcollection (see firestore_repo.create_payment_for_user).
+
+The loans' paid_amount already includes these payments, so it is left as
+is; only the ledger entries are copied and payment_records is removed.
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\migrate_payment_records.py --dry-run
+python .\scripts\migrate_payment_records.py --uid some-firebase-uid
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+import firestore_repo
+from firebase import init_firebase
+
+
+def _ledger_entry(loan_id, record, created_at):
+    try:
+        amount = float(record.get('amount') or 0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    if not amount and not record.get('date'):
+        return None  # Blank row the old editor always kept at the end
+    return {
+        'loan_id': loan_id,
+        'amount': amount,
+        'date': record.get('date') or '',
+        'status': record.get('status') or 'Paid',
+        'note': record.get('note') or None,
+        'created_at': created_at,
+    }
+
+
+def migrate_loans(uid, dry_run):
+    _, db = init_firebase()
+    moved = 0
+    for snapshot in firestore_repo._loans_col(uid).select(['payment_records', 'created_at']).stream():
+        records = (snapshot.to_dict() or {}).get('payment_records')
+        if not records:
+            continue
+        # Keep the array order: created_at is what the ledger is sorted by
+        base = datetime.utcnow()
+        entries = [
+            entry for entry in (
+                _ledger_entry(snapshot.id, record, base + timedelta(microseconds=i))
+                for i, record in enumerate(records) if isinstance(record, dict)
+            ) if entry
+        ]
+        moved += len(entries)
+        if dry_run:
+            continue
+        batch = db.batch()
+        payments = snapshot.reference.collection('payments')
+        for entry in entries:
+            batch.set(payments.document(), entry)
+        batch.update(snapshot.reference, {'payment_records': DELETE_FIELD})
+        batch.commit()
+    print(f"payments: {'would move' if dry_run else 'moved'} {moved} payment records")
+    return moved
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User whose loans should be migrated (defaults to the savkar user)')
+    p.add_argument('--dry-run', action='store_true', help='Only count the payment records')
+    args = p.parse_args()
+
+    migrate_loans(args.uid, args.dry_run)
+    firestore_repo.loan_cache.invalidate(args.uid)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Recompute the materialized dashboard aggregates (users/{uid}/stats/dashboard)
+from the loans collection and report any drift from the stored values.
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\rebuild_dashboard_summary.py
+python .\scripts\rebuild_dashboard_summary.py --uid some-firebase-uid --check
+
+Run it once for users whose loans predate the aggregates: the dashboard
+endpoint only reads the stored values and never scans the loans itself.
+--check exits with status 1 when drift was found, so it can run from a scheduler.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_repo
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User whose aggregates should be rebuilt (defaults to the savkar user)')
+    p.add_argument('--check', action='store_true', help='Exit non-zero if the stored aggregates had drifted')
+    args = p.parse_args()
+
+    report = firestore_repo.rebuild_dashboard_summary(args.uid)
+    print(json.dumps(report, indent=2, default=str))
+    if args.check and report['drift']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
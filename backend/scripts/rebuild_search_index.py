@@ -0,0 +1,31 @@
+"""
+Recompute the search_tokens field of every loan (see search_index.py). Loan
+writes keep it current; run this once for loans written before it existed.
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\rebuild_search_index.py
+python .\scripts\rebuild_search_index.py --uid some-firebase-uid
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_repo
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User whose loans should be reindexed (defaults to the savkar user)')
+    args = p.parse_args()
+
+    report = firestore_repo.rebuild_search_index(args.uid)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
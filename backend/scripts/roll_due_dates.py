@@ -0,0 +1,33 @@
+"""
+Nightly roll-forward of the loans' next_due_date and days_overdue fields
+(see due_dates.py). Schedule it shortly after midnight UTC.
+
+Usage (PowerShell):
+$env:GOOGLE_APPLICATION_CREDENTIALS = 'C:\path\to\service-account.json'
+python .\scripts\roll_due_dates.py
+python .\scripts\roll_due_dates.py --backfill --uid some-firebase-uid
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firestore_repo
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--uid', type=str, default=firestore_repo.SAVKAR_USER_ID,
+                   help='User whose loans should be rolled forward (defaults to the savkar user)')
+    p.add_argument('--backfill', action='store_true',
+                   help='Recompute every loan, not only those already due')
+    args = p.parse_args()
+
+    report = firestore_repo.roll_forward_due_dates(args.uid, backfill=args.backfill)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Borrower search tokens stored on each loan as `search_tokens`, so a search
+is one array_contains query on an indexed field instead of a collection scan.
+
+Tokens are namespaced strings:
+  n:<prefix>   prefixes of every normalized name word (and of the whole name)
+  g:<trigram>  character trigrams of the name, for matches inside a word
+  p:<suffix>   trailing 3..10 digits of the phone number
+
+A query is matched by its most selective token (the whole-name prefix or the
+phone suffix) and the candidates are then ranked in memory by how well they
+match the whole query.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_PREFIX_LENGTH = 15
+MIN_PHONE_SUFFIX = 3
+MAX_PHONE_SUFFIX = 10
+TOKENS_FIELD = 'search_tokens'
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9ऀ-ॿ ]+')
+_DIGITS_RE = re.compile(r'\D+')
+
+
+def normalize_name(value: Any) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(value or '')).lower()
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(_NON_WORD_RE.sub(' ', text).split())
+
+
+def normalize_phone(value: Any) -> str:
+    return _DIGITS_RE.sub('', str(value or ''))
+
+
+def _prefixes(word: str) -> List[str]:
+    return [word[:i] for i in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1)]
+
+
+def _trigrams(text: str) -> List[str]:
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+def loan_search_tokens(loan: Dict[str, Any]) -> List[str]:
+    """Tokens to store on a loan (stored snake_case fields)"""
+    name = normalize_name(loan.get('borrower_name'))
+    phone = normalize_phone(loan.get('phone_number'))
+    tokens = set()
+    for word in name.split():
+        tokens.update('n:' + prefix for prefix in _prefixes(word))
+    if ' ' in name:
+        tokens.update('n:' + prefix for prefix in _prefixes(name))
+    tokens.update('g:' + gram for gram in _trigrams(name))
+    for length in range(MIN_PHONE_SUFFIX, min(len(phone), MAX_PHONE_SUFFIX) + 1):
+        tokens.add('p:' + phone[-length:])
+    return sorted(tokens)
+
+
+def query_token(q: str) -> Optional[Tuple[str, str]]:
+    """(token, kind) to look a query up by, or None if it is too short to search.
+
+    Digits search phone suffixes; text searches the prefix of the whole
+    normalized query, which only borrowers whose name starts with it carry.
+    """
+    digits = normalize_phone(q)
+    name = normalize_name(q)
+    if digits and digits == name.replace(' ', ''):
+        if len(digits) < MIN_PHONE_SUFFIX:
+            return None
+        return 'p:' + digits[-MAX_PHONE_SUFFIX:], 'phone'
+    if not name:
+        return None
+    return 'n:' + name[:MAX_PREFIX_LENGTH], 'name'
+
+
+def word_tokens(q: str) -> List[str]:
+    """Prefix tokens of each word of a multi-word query (other word orders)"""
+    words = normalize_name(q).split()
+    if len(words) < 2:
+        return []
+    return sorted({'n:' + word[:MAX_PREFIX_LENGTH] for word in words})
+
+
+def trigram_token(q: str) -> Optional[str]:
+    name = normalize_name(q)
+    grams = _trigrams(max(name.split(), key=len)) if name else []
+    return 'g:' + grams[0] if grams else None
+
+
+def score(loan: Dict[str, Any], q: str) -> float:
+    """Relevance of a candidate (API camelCase dict) to the query; 0 means no match"""
+    digits = normalize_phone(q)
+    name_query = normalize_name(q)
+    if digits and digits == name_query.replace(' ', ''):
+        phone = normalize_phone(loan.get('phoneNumber'))
+        if phone == digits:
+            return 100.0
+        if phone.endswith(digits):
+            return 50.0 + len(digits)
+        return 30.0 if digits in phone else 0.0
+
+    name = normalize_name(loan.get('borrowerName'))
+    if not name_query:
+        return 0.0
+    if name == name_query:
+        return 100.0
+    if name.startswith(name_query):
+        return 80.0 + len(name_query) / max(len(name), 1)
+    words = name.split()
+    query_words = name_query.split()
+    if all(any(word.startswith(qw) for word in words) for qw in query_words):
+        return 60.0 + len(name_query) / max(len(name), 1)
+    if all(qw in name for qw in query_words):
+        return 40.0 + len(name_query) / max(len(name), 1)
+    return 0.0
+
+
+def rank(candidates: List[Dict[str, Any]], q: str, limit: int) -> List[Dict[str, Any]]:
+    scored = [(score(loan, q), loan) for loan in candidates]
+    scored = [(s, loan) for s, loan in scored if s > 0]
+    scored.sort(key=lambda pair: (-pair[0], normalize_name(pair[1].get('borrowerName')), pair[1].get('id') or ''))
+    return [loan for _, loan in scored[:limit]]
@@ -0,0 +1,133 @@
+"""
+Logging setup for the API: payload-safe, structured and off the request thread.
+
+configure_logging() installs a RawQueueHandler on the root logger, which
+renders Redacted arguments (callers often mutate the payload right after
+logging it) and puts the record on a queue; a QueueListener thread does the
+%-formatting, the tracebacks and the stream I/O.
+
+Payloads are logged through Redacted(data), which is only formatted when
+the record's level is enabled, and which replaces base64 blobs with their
+size, truncates long strings and summarises long lists, so a loan with a
+photo or a document upload costs a short log line instead of megabytes of
+formatting.
+
+Configured with SAVKAR_LOG_LEVEL (default INFO) and SAVKAR_LOG_FORMAT:
+"text" (the previous basicConfig layout) or "json" (one object per line,
+with any `extra=` fields included).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Any
+
+# Fields never written out, only their size
+REDACTED_FIELDS = frozenset({
+    'profile_photo', 'profilePhoto', 'file_content', 'fileContent', 'photo', 'content',
+})
+MAX_STRING_CHARS = 200
+MAX_LIST_ITEMS = 5
+MAX_DEPTH = 4
+
+TEXT_FORMAT = '%(levelname)s:%(name)s:%(message)s'
+# LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Loggable copy of value with blobs removed and long strings/lists shortened"""
+    if isinstance(value, dict):
+        if depth >= MAX_DEPTH:
+            return f'<dict of {len(value)} keys>'
+        out = {}
+        for key, item in value.items():
+            if key in REDACTED_FIELDS and item:
+                out[key] = f'<redacted {len(item) if hasattr(item, "__len__") else "?"} chars>'
+            else:
+                out[key] = redact(item, depth + 1)
+        return out
+    if isinstance(value, (list, tuple)):
+        if depth >= MAX_DEPTH:
+            return f'<list of {len(value)} items>'
+        items = [redact(item, depth + 1) for item in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f'<+{len(value) - MAX_LIST_ITEMS} more items>')
+        return items
+    if isinstance(value, (str, bytes)) and len(value) > MAX_STRING_CHARS:
+        return f'{value[:MAX_STRING_CHARS]!s}<+{len(value) - MAX_STRING_CHARS} chars>'
+    if hasattr(value, 'model_dump'):
+        return redact(value.model_dump(), depth)
+    return value
+
+
+class Redacted:
+    """Log argument that redacts and formats its payload only if the record is logged:
+    logger.info("Creating loan %s", Redacted(loan_data))"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return str(redact(self.value))
+
+
+def _snapshot(arg: Any) -> Any:
+    return str(arg) if isinstance(arg, Redacted) else arg
+
+
+class RawQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves the message to the listener's formatter. The
+    stock prepare() formats the whole message and traceback on the logging
+    thread; this one only renders Redacted arguments there, which still
+    reference the caller's payload, and enqueues the record otherwise as-is."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if isinstance(record.args, dict):
+            record.args = {key: _snapshot(arg) for key, arg in record.args.items()}
+        elif record.args:
+            record.args = tuple(_snapshot(arg) for arg in record.args)
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = redact(value)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = None, fmt: str = None) -> None:
+    """Route all logging through a queue to a background writer (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.getenv('SAVKAR_LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.getenv('SAVKAR_LOG_FORMAT', 'text')).lower()
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(RawQueueHandler(records))
+    root.setLevel(level)
@@ -0,0 +1,30 @@
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import case_keys
+from case_keys import camel_keys, snake_keys, to_camel, to_snake
+from models import LoanRecord
+
+
+def test_key_conversion_round_trips():
+    assert to_camel('pan_card_url') == 'panCardUrl'
+    assert to_camel('id') == 'id'
+    assert to_snake('panCardUrl') == 'pan_card_url'
+    assert to_snake('HTTPResponseCode') == 'http_response_code'
+    assert snake_keys({'borrowerName': 'A', 'loan_id': '1'}) == {'borrower_name': 'A', 'loan_id': '1'}
+
+
+def test_camel_keys_deep_and_shallow():
+    doc = {'loan_id': '1', 'payment_records': [{'paid_on': 'x'}, 3], 'extra_info': {'due_day': 5}}
+    assert camel_keys(doc) == {'loanId': '1', 'paymentRecords': [{'paidOn': 'x'}, 3], 'extraInfo': {'dueDay': 5}}
+    assert camel_keys(doc, deep=False)['paymentRecords'] == [{'paid_on': 'x'}, 3]
+    assert camel_keys([{'a_b': 1}]) == [{'aB': 1}]
+    assert camel_keys({}) == {}
+
+
+def test_schema_keys_are_precomputed_and_aliases_unchanged():
+    for name, field in LoanRecord.model_fields.items():
+        assert case_keys._camel[name] == field.alias == to_camel(name)
@@ -0,0 +1,33 @@
+import os
+import sys
+from datetime import date
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from due_dates import due_fields, instalment_date, next_due_date
+
+
+LOAN = {'start_date': '2024-01-15', 'end_date': '2024-12-15', 'emi': 1000.0,
+        'total_loan': 12000.0, 'paid_amount': 0.0, 'status': 'Active'}
+
+
+def test_next_due_date_follows_paid_instalments():
+    assert next_due_date(LOAN) == date(2024, 2, 15)
+    assert next_due_date(dict(LOAN, paid_amount=2500.0)) == date(2024, 4, 15)
+    # Past the term the balance is due on end_date
+    assert next_due_date(dict(LOAN, paid_amount=11500.0)) == date(2024, 12, 15)
+    assert next_due_date(dict(LOAN, paid_amount=12000.0)) is None
+    assert next_due_date(dict(LOAN, status='Closed')) is None
+    assert next_due_date(dict(LOAN, start_date='')) is None
+
+
+def test_month_end_start_dates_stay_on_month_end():
+    assert instalment_date(date(2024, 4, 30), 1) == date(2024, 5, 31)
+    assert instalment_date(date(2024, 1, 30), 1) == date(2024, 2, 29)
+    assert instalment_date(date(2024, 11, 15), 3) == date(2025, 2, 15)
+
+
+def test_days_overdue():
+    assert due_fields(LOAN, today=date(2024, 2, 25)) == {'next_due_date': '2024-02-15', 'days_overdue': 10}
+    assert due_fields(LOAN, today=date(2024, 2, 1)) == {'next_due_date': '2024-02-15', 'days_overdue': 0}
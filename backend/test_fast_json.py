@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from pydantic import ValidationError
+
+from fast_json import FastJSONResponse, records_response, validate_records
+from models import LegalNotice
+
+NOTICE = {'id': 'n1', 'borrowerId': 'b1', 'borrowerName': 'A', 'amountDue': 10.0, 'noticeDate': '2024-01-01',
+          'status': 'Pending', 'description': 'First notice', 'createdAt': '2024-01-01T00:00:00'}
+
+
+def test_records_response_validates_once_and_serializes_by_alias():
+    response = records_response(LegalNotice, [NOTICE], {'X-Next-Cursor': 'abc'})
+    assert response.headers['x-next-cursor'] == 'abc'
+    body = json.loads(response.body)
+    assert body == [LegalNotice(**NOTICE).model_dump(mode='json', by_alias=True)]
+
+
+def test_invalid_rows_fail_or_are_skipped():
+    rows = [NOTICE, {'id': 'broken'}]
+    with pytest.raises(ValidationError):
+        validate_records(LegalNotice, rows)
+    assert [n.id for n in validate_records(LegalNotice, rows, skip_invalid=True)] == ['n1']
+
+
+def test_fast_json_response_encodes_datetimes():
+    response = FastJSONResponse(content=[{'createdAt': datetime(2024, 1, 2, 3, 4, 5)}])
+    assert json.loads(response.body) == [{'createdAt': '2024-01-02T03:04:05'}]
+
+
+def test_cached_records_response_encodes_each_cache_entry_once(monkeypatch):
+    import fast_json
+    from portfolio_cache import loan_cache
+
+    loan_cache.clear()
+    encoded = []
+    encode = fast_json.encode_records
+    monkeypatch.setattr(fast_json, 'encode_records', lambda *args: encoded.append(args) or encode(*args))
+
+    # Without a cache entry the rows are encoded for every response
+    fast_json.cached_records_response(LegalNotice, 'u1', [NOTICE])
+    loan_cache.put('u1', [NOTICE], loan_cache.generation('u1'))
+    bodies = [fast_json.cached_records_response(LegalNotice, 'u1', [NOTICE]).body for _ in range(3)]
+    assert len(encoded) == 2
+    assert bodies[0] == bodies[2] == records_response(LegalNotice, [NOTICE]).body
+
+    loan_cache.invalidate('u1')
+    renamed = dict(NOTICE, borrowerName='B')
+    loan_cache.put('u1', [renamed], loan_cache.generation('u1'))
+    assert json.loads(fast_json.cached_records_response(LegalNotice, 'u1', [renamed]).body)[0]['borrowerName'] == 'B'
+    loan_cache.clear()
@@ -0,0 +1,521 @@
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import blob_store
+import firebase
+import firestore_repo
+from portfolio_cache import loan_cache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def local_db(request, monkeypatch, tmp_path):
+    monkeypatch.setenv(firebase.STORAGE_BACKEND_ENV, request.param)
+    monkeypatch.setenv(firebase.SQLITE_PATH_ENV, str(tmp_path / "savkar.db"))
+    monkeypatch.setenv("SAVKAR_BLOB_DIR", str(tmp_path / "blobs"))
+    blob_store.reset_blob_store()
+    firebase.reset_firebase()
+    loan_cache.clear()
+    firestore_repo._known_users.clear()
+    _, db = firebase.init_firebase()
+    yield db
+    firebase.reset_firebase()
+
+
+LOAN = {
+    'borrower_name': 'Ramesh Patil',
+    'phone_number': '9876543210',
+    'emi': 1000.0,
+    'start_date': '2024-01-01',
+    'end_date': '2024-12-31',
+    'interest_rate': 12.0,
+    'payment_mode': 'Cash',
+    'total_loan': 12000.0,
+    'paid_amount': 0.0,
+    'status': 'Active',
+    'loan_type': 'Gold Loan',
+}
+
+
+def test_loan_round_trip(local_db):
+    uid = 'local_user'
+    created = firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    assert created.borrower_name == 'Ramesh Patil'
+
+    loans = firestore_repo.get_loans_for_user(uid)
+    assert [l['id'] for l in loans] == [created.id]
+    assert loans[0]['borrowerName'] == 'Ramesh Patil'
+
+    updated = firestore_repo.update_loan_for_user(uid, created.id, {'paid_amount': 500.0})
+    assert updated.paid_amount == 500.0
+    assert updated.loan_type.value == 'Gold Loan'
+
+    firestore_repo.delete_loan_for_user(uid, created.id)
+    assert firestore_repo.get_loans_for_user(uid) == []
+
+
+def test_documents_and_profiles_filter_by_loan(local_db):
+    uid = 'local_user'
+    loan = firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    firestore_repo.create_document_for_user(uid, {'loan_id': loan.id, 'name': 'Aadhar', 'type': 'ID'})
+    firestore_repo.create_document_for_user(uid, {'loan_id': 'other', 'name': 'PAN', 'type': 'ID'})
+
+    docs = firestore_repo.get_documents_for_user(uid, loan.id)
+    assert [d['name'] for d in docs] == ['Aadhar']
+    assert docs[0]['borrowerName'] == 'Ramesh Patil'
+
+    firestore_repo.create_profile_for_user(uid, {
+        'loan_id': loan.id, 'occupation': 'Farmer', 'address': 'Pune',
+        'jamindars': [{'id': 1, 'name': 'Suresh', 'residenceAddress': 'Pune',
+                       'permanentAddress': 'Pune', 'mobile': '1'}],
+    })
+    profile = firestore_repo.get_profile_for_loan(uid, loan.id)
+    assert profile['occupation'] == 'Farmer'
+    assert profile['jamindars'][0]['residenceAddress'] == 'Pune'
+
+
+def test_query_ordering_and_cursor(local_db):
+    col = local_db.collection('items')
+    for i in range(5):
+        col.document(f'd{i}').set({'n': 4 - i})
+    page = col.order_by('n').limit(2).get()
+    assert [s.to_dict()['n'] for s in page] == [0, 1]
+    nxt = col.order_by('n').start_after(page[-1]).limit(2).get()
+    assert [s.to_dict()['n'] for s in nxt] == [2, 3]
+    assert [s.id for s in col.where('n', '>=', 3).stream()] == ['d0', 'd1']
+
+
+def test_dashboard_summary_tracks_loan_writes(local_db):
+    uid = 'local_user'
+    first = firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    firestore_repo.create_loan_for_user(uid, dict(LOAN, status='Pending', total_loan=5000.0))
+    firestore_repo.update_loan_for_user(uid, first.id, {'paid_amount': 12000.0, 'status': 'Closed'})
+
+    summary = firestore_repo.get_dashboard_summary_for_user(uid)
+    assert summary['total_loan_issued'] == 17000.0
+    assert summary['recovered_amount'] == 12000.0
+    assert summary['pending_amount'] == 5000.0
+    assert (summary['active_records'], summary['pending_records'], summary['closing_records']) == (0, 1, 1)
+
+    firestore_repo.delete_loan_for_user(uid, first.id)
+    summary = firestore_repo.get_dashboard_summary_for_user(uid)
+    assert summary['total_loan_issued'] == 5000.0
+    assert summary['closing_records'] == 0
+    assert firestore_repo.rebuild_dashboard_summary(uid)['drift'] == {}
+
+
+def test_user_document_created_lazily_on_first_write(local_db):
+    uid = 'fresh_user'
+    firestore_repo.get_loans_for_user(uid)
+    firestore_repo.get_notices_for_user(uid)
+    assert not local_db.collection('users').document(uid).get().exists
+
+    firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    assert local_db.collection('users').document(uid).get().exists
+    assert uid in firestore_repo._known_users
+
+
+def test_query_loans_pages_with_stable_cursor(local_db):
+    uid = 'local_user'
+    for i in range(5):
+        firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name=f'B{i}', total_loan=1000.0 * (i % 2)))
+    firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name='Closed one', status='Closed'))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = firestore_repo.query_loans_for_user(
+            uid, limit=2, cursor=cursor, status='Active', order_by='-totalLoan')
+        seen.extend(loan['borrowerName'] for loan in page)
+        if not cursor:
+            break
+    assert sorted(seen) == ['B0', 'B1', 'B2', 'B3', 'B4']
+    assert set(seen[:2]) == {'B1', 'B3'}
+
+    with pytest.raises(ValueError):
+        firestore_repo.query_loans_for_user(uid, order_by='profilePhoto')
+    with pytest.raises(ValueError):
+        # No composite index for this combination on Firestore
+        firestore_repo.query_loans_for_user(uid, status='Active', order_by='-paidAmount')
+
+
+def test_filtered_orders_have_composite_indexes():
+    import json
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'firestore.indexes.json')
+    with open(path) as f:
+        indexes = {
+            tuple((field['fieldPath'], field['order']) for field in index['fields'])
+            for index in json.load(f)['indexes'] if index['collectionGroup'] == 'loans'
+        }
+    for filters in (['status'], ['loan_type'], ['status', 'loan_type']):
+        for order_by in firestore_repo.FILTERED_LOAN_ORDERS:
+            field = firestore_repo.LOAN_ORDER_FIELDS[order_by.lstrip('-')]
+            direction = 'DESCENDING' if order_by.startswith('-') else 'ASCENDING'
+            assert tuple((f, 'ASCENDING') for f in filters) + ((field, direction),) in indexes
+
+
+def test_projection_skips_heavy_fields(local_db):
+    uid = 'local_user'
+    firestore_repo.create_loan_for_user(uid, dict(LOAN, profile_photo='data:image/png;base64,' + 'A' * 1000,
+                                                  payment_records=[{'amount': 1}]))
+    loans, _ = firestore_repo.query_loans_for_user(uid, limit=None, fields=firestore_repo.LOAN_SUMMARY_FIELDS)
+    assert 'profilePhoto' not in loans[0] and 'paymentRecords' not in loans[0]
+    assert loans[0]['borrowerName'] == 'Ramesh Patil'
+
+    loans, _ = firestore_repo.query_loans_for_user(
+        uid, limit=None, fields=firestore_repo.resolve_loan_fields(['phoneNumber']))
+    assert set(loans[0]) == {'id', 'phoneNumber'}
+
+
+def test_files_and_photos_live_in_blob_store(local_db):
+    uid = 'local_user'
+    photo = 'data:image/png;base64,iVBORw0KGgo='
+    loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, profile_photo=photo))
+    assert loan.profile_photo.startswith(blob_store.BLOB_URL_PREFIX)
+    stored = firestore_repo._loans_col(uid).document(loan.id).get().to_dict()
+    assert stored['profile_photo'] is None and stored['profile_photo_mime'] == 'image/png'
+
+    # Sending the /blobs/ URL back unchanged keeps the same photo
+    updated = firestore_repo.update_loan_for_user(uid, loan.id, {'profile_photo': loan.profile_photo})
+    assert updated.profile_photo == loan.profile_photo
+
+    doc = firestore_repo.create_document_for_user(
+        uid, {'loan_id': loan.id, 'name': 'note', 'type': 'txt', 'file_content': 'data:text/plain;base64,aGVsbG8='})
+    assert doc.file_content is None and doc.file_size == 5 and doc.mime_type == 'text/plain'
+    assert b''.join(blob_store.get_blob_store().iter_chunks(doc.file_hash)) == b'hello'
+
+
+def test_async_repo_matches_sync_repo(local_db):
+    import asyncio
+    import async_firestore_repo
+
+    uid = 'local_user'
+    for i in range(3):
+        loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name=f'B{i}'))
+    firestore_repo.create_document_for_user(uid, {'loan_id': loan.id, 'name': 'Aadhar', 'type': 'ID'})
+
+    async def read_all():
+        loan_cache.clear()
+        page, cursor = await async_firestore_repo.query_loans_for_user(uid, limit=2, order_by='borrowerName')
+        rest, _ = await async_firestore_repo.query_loans_for_user(uid, limit=2, cursor=cursor, order_by='borrowerName')
+        return (await async_firestore_repo.get_loans_for_user(uid), page + rest,
+                await async_firestore_repo.get_documents_for_user(uid, loan.id),
+                await async_firestore_repo.get_dashboard_summary_for_user(uid),
+                await async_firestore_repo.get_loan_for_user(uid, loan.id))
+
+    loans, paged, docs, summary, one = asyncio.run(read_all())
+    assert loans == firestore_repo.get_loans_for_user(uid)
+    assert one == firestore_repo.get_loan_for_user(uid, loan.id)
+    assert [l['borrowerName'] for l in paged] == ['B0', 'B1', 'B2']
+    assert docs == firestore_repo.get_documents_for_user(uid, loan.id)
+    assert summary == firestore_repo.get_dashboard_summary_for_user(uid)
+
+
+def test_async_due_search_and_payments_match_sync_repo(local_db):
+    import asyncio
+    import async_firestore_repo
+
+    uid = 'local_user'
+    for i in range(3):
+        loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name=f'Ramesh Patil {i}'))
+    for month in (2, 3):
+        firestore_repo.create_payment_for_user(uid, loan.id, {'amount': 100.0, 'date': f'2024-0{month}-01'})
+    fields = firestore_repo.LOAN_SUMMARY_FIELDS
+
+    async def read_all():
+        return (await async_firestore_repo.query_due_loans_for_user(uid, limit=2, fields=fields),
+                await async_firestore_repo.search_loans_for_user(uid, 'patil', 10, fields=fields),
+                await async_firestore_repo.get_payments_for_loan(uid, loan.id, limit=1))
+
+    due, found, payments = asyncio.run(read_all())
+    assert due == firestore_repo.query_due_loans_for_user(uid, limit=2, fields=fields)
+    assert due[1] is not None
+    assert found == firestore_repo.search_loans_for_user(uid, 'patil', 10, fields=fields)
+    assert len(found) == 3
+    assert payments == firestore_repo.get_payments_for_loan(uid, loan.id, limit=1)
+    assert len(payments[0]) == 1 and payments[1] is not None
+
+
+def test_bulk_create_splits_batches_and_updates_summary(local_db, monkeypatch):
+    monkeypatch.setattr(firestore_repo, 'BULK_BATCH_SIZE', 3)
+    uid = 'local_user'
+    loans = [dict(LOAN, borrower_name=f'B{i}', total_loan=100.0) for i in range(5)]
+    loans.insert(2, dict(LOAN, profile_photo='data:image/png;base64,not base64!'))
+
+    results = firestore_repo.create_loans_for_user(uid, loans)
+    assert [bool(loan_id) for loan_id, _ in results] == [True, True, False, True, True, True]
+    assert 'profile photo' in results[2][1]
+
+    stored = firestore_repo.get_loans_for_user(uid)
+    assert sorted(l['id'] for l in stored) == sorted(loan_id for loan_id, _ in results if loan_id)
+    summary = firestore_repo.get_dashboard_summary_for_user(uid)
+    assert (summary['total_loan_issued'], summary['active_records']) == (500.0, 5)
+    assert firestore_repo.rebuild_dashboard_summary(uid)['drift'] == {}
+
+
+def test_export_streams_every_page(local_db):
+    import csv
+    import io
+    import json
+    import portfolio_export
+
+    uid = 'local_user'
+    for i in range(5):
+        loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name=f'B{i}'))
+    firestore_repo.create_document_for_user(
+        uid, {'loan_id': loan.id, 'name': 'note', 'type': 'txt', 'file_content': 'data:text/plain;base64,aGVsbG8='})
+
+    rows = list(portfolio_export.export_rows(uid, 'loans', 'ndjson', page_size=2))
+    assert sorted(json.loads(row)['borrowerName'] for row in rows) == [f'B{i}' for i in range(5)]
+
+    text = ''.join(portfolio_export.export_rows(uid, 'documents', 'csv', page_size=2))
+    records = list(csv.DictReader(io.StringIO(text)))
+    assert [(r['name'], r['fileSize'], r['borrowerName']) for r in records] == [('note', '5', 'B4')]
+    assert 'fileContent' not in records[0]
+
+
+def test_payment_ledger_maintains_paid_amount(local_db):
+    uid = 'local_user'
+    loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, total_loan=1000.0, status='Pending'))
+
+    receipt = firestore_repo.create_payment_for_user(uid, loan.id, {'amount': 400.0, 'date': '2024-02-01'})
+    assert (receipt.paid_amount, receipt.status.value) == (400.0, 'Active')
+    firestore_repo.create_payment_for_user(uid, loan.id, {'amount': 1000.0, 'date': '2024-03-01', 'status': 'Gap'})
+    receipt = firestore_repo.create_payment_for_user(uid, loan.id, {'amount': 600.0, 'date': '2024-04-01'})
+    assert (receipt.paid_amount, receipt.status.value) == (1000.0, 'Closed')
+    assert firestore_repo.create_payment_for_user(uid, 'missing', {'amount': 1.0, 'date': '2024-01-01'}) is None
+
+    page, cursor = firestore_repo.get_payments_for_loan(uid, loan.id, limit=2)
+    rest, last = firestore_repo.get_payments_for_loan(uid, loan.id, limit=2, cursor=cursor)
+    assert [p['date'] for p in page + rest] == ['2024-02-01', '2024-03-01', '2024-04-01']
+    assert last is None
+
+    summary = firestore_repo.get_dashboard_summary_for_user(uid)
+    assert (summary['recovered_amount'], summary['closing_records']) == (1000.0, 1)
+
+    firestore_repo.delete_loan_for_user(uid, loan.id)
+    assert firestore_repo.get_payments_for_loan(uid, loan.id) == ([], None)
+
+
+def test_paid_amount_update_checks_version_and_counts_retries(local_db, monkeypatch):
+    from google.api_core.exceptions import Aborted
+
+    uid = 'local_user'
+    loan = firestore_repo.create_loan_for_user(uid, dict(LOAN, total_loan=1000.0))
+    assert loan.version == 1
+
+    # Abort the first commit as a concurrent writer would
+    apply = local_db._apply
+    aborted = []
+    def flaky_apply(write):
+        if not aborted:
+            aborted.append(write)
+            raise Aborted('contention')
+        return apply(write)
+    monkeypatch.setattr(local_db, '_apply', flaky_apply)
+
+    updated, retries = firestore_repo.update_paid_amount_for_user(uid, loan.id, 1000.0, expected_version=1)
+    assert (updated.status.value, updated.version, retries) == ('Closed', 2, 1)
+
+    with pytest.raises(firestore_repo.VersionConflict):
+        firestore_repo.update_paid_amount_for_user(uid, loan.id, 10.0, expected_version=1)
+    assert firestore_repo.update_paid_amount_for_user(uid, 'missing', 10.0) is None
+    assert firestore_repo.get_dashboard_summary_for_user(uid)['recovered_amount'] == 1000.0
+
+
+def test_due_loans_query_and_roll_forward(local_db):
+    from datetime import date, timedelta
+
+    uid = 'local_user'
+    today = date.today()
+    overdue_start = (today - timedelta(days=70)).isoformat()
+    late = firestore_repo.create_loan_for_user(uid, dict(LOAN, start_date=overdue_start, end_date='2099-01-01'))
+    future = firestore_repo.create_loan_for_user(uid, dict(LOAN, start_date=today.isoformat(), end_date='2099-01-01'))
+    firestore_repo.create_loan_for_user(uid, dict(LOAN, status='Closed'))
+    assert late.days_overdue > 0 and future.days_overdue == 0
+
+    loans, _ = firestore_repo.query_due_loans_for_user(uid, fields=firestore_repo.LOAN_SUMMARY_FIELDS)
+    assert [l['id'] for l in loans] == [late.id, future.id]
+    loans, _ = firestore_repo.query_due_loans_for_user(uid, overdue=True)
+    assert [l['id'] for l in loans] == [late.id]
+
+    # Paying the missed instalment moves the due date forward
+    firestore_repo.create_payment_for_user(uid, late.id, {'amount': 1000.0, 'date': today.isoformat()})
+    moved = firestore_repo.get_loan_for_user(uid, late.id)
+    assert moved['nextDueDate'] > late.next_due_date
+
+    report = firestore_repo.roll_forward_due_dates(uid, today=today + timedelta(days=40))
+    assert report['changed'] >= 1
+    assert firestore_repo.get_loan_for_user(uid, future.id)['daysOverdue'] > 0
+
+
+def test_roll_forward_rereads_loans_and_bumps_version(local_db, monkeypatch):
+    from datetime import date, timedelta
+
+    uid = 'local_user'
+    today = date.today()
+    due = [firestore_repo.create_loan_for_user(uid, dict(LOAN, start_date=today.isoformat(), end_date='2099-01-01'))
+           for _ in range(2)]
+    closed_id = due[0].id
+    due_changes = firestore_repo._due_changes
+    edited = []
+
+    def edit_after_scan(loan, day):
+        # The first loan is closed by another request after the scan saw it open
+        if not edited:
+            edited.append(firestore_repo.update_loan_for_user(uid, closed_id, {'status': 'Closed'}))
+        return due_changes(loan, day)
+
+    monkeypatch.setattr(firestore_repo, '_due_changes', edit_after_scan)
+    report = firestore_repo.roll_forward_due_dates(uid, today=today + timedelta(days=40))
+    assert report == {'scanned': 2, 'changed': 1}
+
+    closed = firestore_repo.get_loan_for_user(uid, closed_id)
+    assert (closed['status'], closed['nextDueDate'], closed['version']) == ('Closed', None, 2)
+    rolled = firestore_repo.get_loan_for_user(uid, due[1].id)
+    assert rolled['daysOverdue'] > 0 and rolled['version'] == 2
+
+
+def test_search_uses_tokens_and_tracks_renames(local_db):
+    uid = 'local_user'
+    ramesh = firestore_repo.create_loan_for_user(uid, dict(LOAN, borrower_name='Ramesh Patil', phone_number='9876500001'))
+    firestore_repo.create_loans_for_user(uid, [
+        dict(LOAN, borrower_name='Ram Kumar', phone_number='9876500002'),
+        dict(LOAN, borrower_name='Kiran Ramteke', phone_number='9876500003'),
+    ])
+    names = lambda q: [l['borrowerName'] for l in firestore_repo.search_loans_for_user(uid, q)]
+
+    assert names('ram') == ['Ram Kumar', 'Ramesh Patil', 'Kiran Ramteke']
+    assert names('ram pat') == ['Ramesh Patil']
+    assert names('amte') == ['Kiran Ramteke']  # trigram fallback
+    assert names('00003') == ['Kiran Ramteke']
+    assert 'searchTokens' not in firestore_repo.get_loan_for_user(uid, ramesh.id)
+
+    firestore_repo.update_loan_for_user(uid, ramesh.id, {'borrower_name': 'Vikas Patil'})
+    assert names('ramesh') == []
+    assert names('vik') == ['Vikas Patil']
+
+
+def test_search_finds_full_names_sharing_a_common_word(local_db):
+    import string
+
+    uid = 'local_user'
+    # More borrowers share the first name than one token query may pull
+    letters = string.ascii_lowercase
+    surnames = [a + b + 'kar' for a in letters for b in letters][:firestore_repo.SEARCH_CANDIDATE_LIMIT + 30]
+    firestore_repo.create_loans_for_user(uid, [dict(LOAN, borrower_name=f'Baburao {s.title()}') for s in surnames])
+    top = lambda q: [l['borrowerName'] for l in firestore_repo.search_loans_for_user(uid, q, limit=1)]
+
+    for surname in surnames:
+        assert top(f'baburao {surname}') == [f'Baburao {surname.title()}']
+    assert top(f'{surnames[-1]} baburao') == [f'Baburao {surnames[-1].title()}']  # rarest word first
+
+
+def test_count_uses_aggregation_query(local_db):
+    uid = 'local_user'
+    assert firestore_repo.count_loans_for_user(uid) == 0
+    firestore_repo.create_loans_for_user(uid, [dict(LOAN, borrower_name=f'Borrower {i}') for i in range(3)])
+    assert firestore_repo.count_loans_for_user(uid) == 3
+
+    col = local_db.collection('users').document(uid).collection('loans')
+    result = col.where('status', '==', 'Active').count(alias='active').get()
+    assert (result[0][0].alias, result[0][0].value) == ('active', 3)
+
+
+def test_planned_queries_match_brute_force(local_db):
+    import random
+    import local_store
+
+    rng = random.Random(7)
+    engine = local_db._engine
+    values = [None, True, 0, 1, 2.5, '', 'a', 'b', 'c']
+    docs = {}
+    for i in range(120):
+        doc = {f: rng.choice(values) for f in 'ab' if rng.random() < 0.9}
+        doc['tags'] = rng.sample(['x', 'y', 'z'], rng.randint(0, 2))
+        docs[f'd{i:03d}'] = doc
+        engine.put('items', f'd{i:03d}', doc)
+    engine.delete('items', 'd007')
+    del docs['d007']
+    rows = [(doc_id, data, None, None) for doc_id, data in sorted(docs.items())]
+
+    queries = [
+        ([('a', '==', 'b')], [('b', 'DESCENDING'), ('__name__', 'DESCENDING')]),
+        ([('a', '==', 1)], [('b', 'ASCENDING')]),
+        ([('b', '>=', 'a'), ('tags', 'array_contains', 'x')], [('b', 'ASCENDING')]),
+        ([('a', '!=', 'c')], [('a', 'ASCENDING'), ('b', 'DESCENDING')]),
+        ([], []),
+    ]
+    for filters, orders in queries:
+        orders = local_store._with_tie_breaker(orders)
+        expected = local_store._evaluate(rows, filters, orders)
+        cursor = (local_store._order_values(orders, expected[3][0], expected[3][1]), False) if len(expected) > 3 else None
+        for start, offset, limit in [(None, None, None), (None, 2, 5), (cursor, None, 4)]:
+            want = [row[0] for row in local_store._evaluate(rows, filters, orders, start, offset, limit)]
+            got = [row[0] for row in engine.query('items', filters, orders, start, offset, limit)]
+            assert got == want, (filters, orders, start, offset, limit)
+            assert engine.count('items', filters, orders, start, offset, limit) == len(want)
+
+
+def test_summary_rebuild_rescans_when_loans_change(local_db, monkeypatch):
+    uid = 'local_user'
+    firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    scan = firestore_repo._scan_dashboard_summary
+    calls = []
+
+    def scan_with_concurrent_write(col):
+        result = scan(col)
+        calls.append(result)
+        if len(calls) == 1:
+            # Lands between the scan and the store, like a concurrent request
+            firestore_repo.create_loan_for_user(uid, dict(LOAN, total_loan=5000.0))
+        return result
+
+    monkeypatch.setattr(firestore_repo, '_scan_dashboard_summary', scan_with_concurrent_write)
+    report = firestore_repo.rebuild_dashboard_summary(uid)
+    assert report['attempts'] == 2
+    assert firestore_repo.get_dashboard_summary_for_user(uid)['total_loan_issued'] == 17000.0
+
+
+def test_summary_read_never_scans(local_db, monkeypatch):
+    uid = 'local_user'
+    firestore_repo.create_loan_for_user(uid, dict(LOAN))
+    firestore_repo._summary_ref(uid).delete()  # as for loans written before the aggregates
+
+    monkeypatch.setattr(firestore_repo, '_scan_dashboard_summary', None)
+    assert firestore_repo.get_dashboard_summary_for_user(uid)['total_loan_issued'] == 0
+    monkeypatch.undo()
+    firestore_repo.rebuild_dashboard_summary(uid)
+    assert firestore_repo.get_dashboard_summary_for_user(uid)['total_loan_issued'] == 12000.0
+
+
+def test_notice_update_builds_response_without_read_back(local_db):
+    import tracing
+
+    uid = 'local_user'
+    notice = firestore_repo.create_notice_for_user(uid, {
+        'borrower_id': 'l1', 'borrower_name': 'Ramesh Patil', 'amount_due': 5000.0,
+        'notice_date': '2024-06-01', 'status': 'Pending', 'description': 'Two instalments overdue'})
+
+    def rpcs(update, **kwargs):
+        trace = tracing.RequestTrace('PUT', '/notices')
+        token = tracing._current.set(trace)
+        try:
+            updated = firestore_repo.update_notice_for_user(uid, notice.id, update, **kwargs)
+        finally:
+            tracing._current.reset(token)
+        return updated, trace.summary()['rpc_calls']
+
+    updated, calls = rpcs({'status': 'Resolved'})
+    assert updated.status.value == 'Resolved' and updated.amount_due == 5000.0
+    assert calls == {'begin_transaction': 1, 'batch_get_documents': 1, 'commit': 1}
+
+    existing = firestore_repo.get_notices_for_user(uid)[0]
+    updated, calls = rpcs({'amount_due': 2500.0}, existing=existing)
+    assert updated.status.value == 'Resolved' and updated.amount_due == 2500.0
+    assert calls == {'commit': 1}
+    assert firestore_repo.get_notices_for_user(uid)[0]['amountDue'] == 2500.0
@@ -0,0 +1,90 @@
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram('t_seconds', 'Test.', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, '/a')
+    lines = hist.render()
+    assert 't_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{route="/a",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+    assert 't_seconds_count{route="/a"} 4' in lines
+
+
+def test_firestore_op_counts_outcomes():
+    @metrics.firestore_op("read")
+    def get_things(fail=False):
+        if fail:
+            raise RuntimeError("boom")
+        return []
+
+    get_things()
+    with pytest.raises(RuntimeError):
+        get_things(fail=True)
+    assert metrics.repository_calls.value('get_things', 'read', 'ok') == 1
+    assert metrics.repository_calls.value('get_things', 'read', 'error') == 1
+    assert metrics.repository_latency.count('get_things', 'read') == 2
+
+
+def test_firestore_operations_count_rpcs_per_function():
+    import local_store
+
+    db = local_store.create_local_client('memory')
+    col = db.collection('loans')
+
+    @metrics.firestore_op("write")
+    def save_two():
+        batch = db.batch()
+        batch.set(col.document('a'), {'n': 1})
+        batch.set(col.document('b'), {'n': 2})
+        batch.commit()
+        return load_all()
+
+    @metrics.firestore_op("read")
+    def load_all():
+        return [col.document(doc_id).get() for doc_id in ('a', 'b')] + col.get()
+
+    save_two()
+    col.document('a').get()
+    assert metrics.firestore_operations.value('save_two', 'commit', 'ok') == 1
+    assert metrics.firestore_operations.value('load_all', 'batch_get_documents', 'ok') == 2
+    assert metrics.firestore_operations.value('load_all', 'run_query', 'ok') == 1
+    assert metrics.firestore_operations.value('save_two', 'batch_get_documents', 'ok') == 0
+    assert metrics.firestore_operations.value('none', 'batch_get_documents', 'ok') == 1
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get('/loans/{loan_id}')
+    def get_loan(loan_id: str):
+        return {'id': loan_id}
+
+    client = TestClient(app)
+    client.get('/loans/a')
+    client.get('/loans/b')
+    client.get('/missing')
+
+    assert metrics.http_requests.value('GET', '/loans/{loan_id}', '200') == 2
+    assert metrics.http_requests.value('GET', 'unmatched', '404') == 1
+    body = metrics.render().decode()
+    assert 'savkar_http_response_size_bytes_sum{method="GET",route="/loans/{loan_id}"} 20' in body
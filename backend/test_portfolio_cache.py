@@ -0,0 +1,62 @@
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from portfolio_cache import PortfolioCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_then_ttl_expiry():
+    clock = FakeClock()
+    cache = PortfolioCache(ttl_seconds=10, max_bytes=10_000, clock=clock)
+    cache.put('u1', [{'id': 'a'}], cache.generation('u1'))
+    assert cache.get('u1') == [{'id': 'a'}]
+    clock.now = 11
+    assert cache.get('u1') is None
+    assert cache.stats()['hits'] == 1
+
+
+def test_invalidate_fences_inflight_read():
+    cache = PortfolioCache(ttl_seconds=10, max_bytes=10_000)
+    generation = cache.generation('u1')
+    cache.invalidate('u1')  # a write lands while the read is streaming
+    cache.put('u1', [{'id': 'stale'}], generation)
+    assert cache.get('u1') is None
+
+
+def test_lru_eviction_respects_byte_budget():
+    loans = [{'id': 'x' * 400}]
+    cache = PortfolioCache(ttl_seconds=10, max_bytes=1500)
+    cache.put('u1', loans, 0)
+    cache.put('u2', loans, 0)
+    cache.get('u1')  # u1 becomes most recently used
+    cache.put('u3', loans, 0)
+    assert cache.get('u2') is None
+    assert cache.get('u1') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_derived_values_are_built_once_and_dropped_with_the_entry():
+    cache = PortfolioCache(ttl_seconds=10, max_bytes=10_000)
+    builds = []
+    build = lambda loans: builds.append(loans) or b'[%d]' % len(loans)
+    assert cache.derive('u1', 'body', build) is None
+
+    cache.put('u1', [{'id': 'a'}], 0)
+    size = cache.stats()['bytes']
+    assert cache.derive('u1', 'body', build) == cache.derive('u1', 'body', build) == b'[1]'
+    assert len(builds) == 1
+    assert cache.stats()['bytes'] > size
+
+    cache.invalidate('u1')
+    assert cache.stats()['bytes'] == 0
+    assert cache.derive('u1', 'body', build) is None
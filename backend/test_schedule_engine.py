@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import schedule_engine
+
+
+LOAN = {'id': 'a', 'totalLoan': 12000.0, 'interestRate': 1.0, 'startDate': '2024-01-31', 'endDate': '2025-01-31'}
+
+
+def test_emi_matches_the_loan_calculator_formula():
+    schedule = schedule_engine.schedule_for_loan(LOAN, 'emi')
+    rate = 0.01
+    expected_emi = 12000 * rate * (1 + rate) ** 12 / ((1 + rate) ** 12 - 1)
+    rows = schedule['schedule']
+    assert len(rows) == 12 and rows[-1]['balance'] == 0
+    assert all(row['payment'] == pytest.approx(expected_emi, abs=0.01) for row in rows)
+    assert [row['due_date'] for row in rows[:2]] == ['2024-02-29', '2024-03-31']
+    assert sum(row['principal'] for row in rows) == pytest.approx(12000, abs=0.05)
+
+
+def test_interest_only_and_daily_stub_periods():
+    loan = dict(LOAN, endDate='2024-04-15')
+    interest_only = schedule_engine.schedule_for_loan(loan, 'interest_only')
+    assert (interest_only['months'], interest_only['stub_days']) == (2, 15)
+    assert [row['interest'] for row in interest_only['schedule']] == [120.0, 120.0, 60.0]
+    assert interest_only['schedule'][-1]['principal'] == 12000.0
+
+    daily = schedule_engine.schedule_for_loan(loan, 'daily')
+    # February 2024 has 29 days, March 31
+    assert [row['interest'] for row in daily['schedule']] == [116.0, 124.0, 60.0]
+
+
+def test_portfolio_projection_matches_per_loan_schedules():
+    loans = [
+        LOAN,
+        dict(LOAN, id='b', interestRate=0.0, startDate='2024-03-10', endDate='2024-09-25'),
+        dict(LOAN, id='c', endDate='not a date'),
+    ]
+    projection = schedule_engine.project_portfolio(loans, 'emi')
+    singles = [schedule_engine.schedule_for_loan(loan, 'emi') for loan in loans]
+    assert projection['total_payment'] == pytest.approx(sum(s['total_payment'] for s in singles), abs=0.05)
+    assert singles[2]['schedule'] == []
+    april = next(m for m in projection['months'] if m['month'] == '2024-04')
+    assert april['payment'] == pytest.approx(singles[0]['schedule'][2]['payment'] + singles[1]['schedule'][0]['payment'], abs=0.02)
+
+
+def test_add_months_clamps_to_month_end():
+    dates = np.array(['2024-01-31', '2023-01-31', '2024-05-15'], dtype='datetime64[D]')
+    assert [str(d) for d in schedule_engine.add_months(dates, np.array([1, 1, 12]))] == [
+        '2024-02-29', '2023-02-28', '2025-05-15']
+
+
+def test_projection_builds_schedules_per_term_length(monkeypatch):
+    monkeypatch.setattr(schedule_engine, 'PROJECTION_CHUNK_LOANS', 2)
+    loans = [dict(LOAN, id=str(i)) for i in range(3)]
+    loans.append(dict(LOAN, id='long', endDate='2054-01-31'))
+    widths = []
+    build = schedule_engine.build_schedule
+
+    def recording_build(terms, method='emi'):
+        schedule = build(terms, method)
+        widths.append(schedule.mask.shape)
+        return schedule
+
+    monkeypatch.setattr(schedule_engine, 'build_schedule', recording_build)
+    projection = schedule_engine.project_portfolio(loans, 'emi')
+    # The 360-month loan does not pad the 12-month ones
+    assert sorted(widths) == [(1, 12), (1, 360), (2, 12)]
+
+    whole = build(schedule_engine.LoanTerms.from_loans(loans), 'emi')
+    assert projection['total_payment'] == pytest.approx(float(whole.payment.sum()), abs=0.01)
+    assert len(projection['months']) == 360
+    assert projection['months'][0]['payment'] == pytest.approx(float(whole.payment[:, 0].sum()), abs=0.01)
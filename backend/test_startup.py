@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds from a fresh interpreter to the first /health response; autoscaled
+# workers should be ready in under a second. Override for slow CI machines.
+COLD_START_BUDGET = float(os.getenv("SAVKAR_COLD_START_BUDGET", "1.0"))
+
+COLD_START = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+
+async def cold_start():
+    # Run the startup handlers through the ASGI lifespan protocol
+    lifespan = asyncio.Queue()
+    started = asyncio.Event()
+
+    async def lifespan_send(message):
+        started.set()
+
+    await lifespan.put({'type': 'lifespan.startup'})
+    task = asyncio.create_task(main.app({'type': 'lifespan', 'asgi': {'version': '3.0'}},
+                                        lifespan.get, lifespan_send))
+    await started.wait()
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': '/health', 'raw_path': b'/health', 'query_string': b'',
+             'root_path': '', 'headers': [], 'server': ('test', 80), 'client': ('test', 1)}
+    await main.app(scope, receive, send)
+    await lifespan.put({'type': 'lifespan.shutdown'})
+    await task
+    return sent[0]['status']
+
+status = asyncio.run(cold_start())
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'status': status,
+    'deferred': [m for m in ('firebase_admin', 'numpy') if m not in sys.modules],
+}))
+"""
+
+
+def test_cold_start_within_budget(tmp_path):
+    env = dict(os.environ, SAVKAR_STORAGE_BACKEND='memory', SAVKAR_BLOB_DIR=str(tmp_path / 'blobs'),
+               SAVKAR_LOG_LEVEL='WARNING')
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', COLD_START], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result['status'] == 200
+    assert result['deferred'] == ['firebase_admin', 'numpy']
+    assert result['seconds'] < COLD_START_BUDGET, f"cold start took {result['seconds']:.2f}s"
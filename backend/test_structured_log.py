@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import queue
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from structured_log import JsonFormatter, RawQueueHandler, Redacted, redact
+
+
+def test_redact_hides_blobs_and_shortens_payloads():
+    loan = {'borrower_name': 'A', 'profile_photo': 'x' * 5000, 'note': 'y' * 1000,
+            'payment_records': [{'amount': i} for i in range(20)]}
+    out = redact(loan)
+    assert out['borrower_name'] == 'A'
+    assert out['profile_photo'] == '<redacted 5000 chars>'
+    assert out['note'].endswith('<+800 chars>')
+    assert out['payment_records'][-1] == '<+15 more items>'
+
+
+def test_redacted_is_only_formatted_when_logged():
+    class Payload(dict):
+        formatted = 0
+
+        def items(self):
+            Payload.formatted += 1
+            return super().items()
+
+    logger = logging.getLogger('test_structured_log')
+    logger.setLevel(logging.INFO)
+    logger.debug("payload %s", Redacted(Payload(a=1)))
+    assert Payload.formatted == 0
+
+
+def test_json_formatter_includes_redacted_extra_fields():
+    record = logging.LogRecord('savkar', logging.INFO, __file__, 1, "loan %s", ('l1',), None)
+    record.payload = {'file_content': 'z' * 100}
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'loan l1'
+    assert entry['payload'] == {'file_content': '<redacted 100 chars>'}
+
+
+def test_queue_handler_snapshots_payloads_and_leaves_formatting_to_the_listener():
+    records = queue.SimpleQueue()
+    handler = RawQueueHandler(records)
+    payload = {'a': 1, 'photo': 'x' * 10}
+    logger = logging.getLogger('test_structured_log.queue')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning("loan %s of %s", Redacted(payload), 'l1')
+    finally:
+        logger.removeHandler(handler)
+    # The caller goes on to change the payload before the listener formats it
+    payload['a'] = 2
+    payload.update({f'k{i}': i for i in range(10)})
+
+    record = records.get_nowait()
+    assert record.msg == "loan %s of %s"
+    assert logging.Formatter('%(message)s').format(record) == "loan {'a': 1, 'photo': '<redacted 10 chars>'} of l1"
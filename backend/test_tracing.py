@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import local_store
+import tracing
+from metrics import firestore_op
+
+
+def test_local_store_calls_are_recorded_as_rpcs():
+    db = local_store.create_local_client('memory')
+    col = db.collection('loans')
+    trace = tracing.RequestTrace('GET', '/test')
+    token = tracing._current.set(trace)
+    try:
+        col.document('a').set({'n': 1})
+        col.document('a').get()
+        col.where('n', '==', 1).get()
+        col.count().get()
+    finally:
+        tracing._current.reset(token)
+    assert trace.summary()['rpc_calls'] == {
+        'commit': 1, 'batch_get_documents': 1, 'run_query': 1, 'run_aggregation_query': 1}
+
+    col.document('b').get()  # outside a request: not recorded
+    assert trace.rpc_count == 4
+
+
+def test_middleware_reports_header_file_and_alarm(tmp_path, monkeypatch, caplog):
+    trace_file = tmp_path / 'spans.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_FILE', str(trace_file))
+    monkeypatch.setattr(tracing, 'MAX_RPCS', 2)
+    db = local_store.create_local_client('memory')
+
+    @firestore_op("read")
+    def get_three(loan_id):
+        return [db.collection('loans').document(loan_id).get() for _ in range(3)]
+
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware, headers=True)
+
+    @app.get('/loans/{loan_id}')
+    def get_loan(loan_id: str):  # sync: runs in the threadpool
+        get_three(loan_id)
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger='tracing'):
+        response = TestClient(app).get('/loans/x')
+
+    assert response.headers['x-firestore-rpcs'] == '3'
+    assert 'desc="3 RPCs"' in response.headers['server-timing']
+    entry = json.loads(trace_file.read_text().strip())
+    assert entry['route'] == '/loans/{loan_id}'
+    assert entry['repo_calls'] == {'get_three': 1}
+    assert [span['kind'] for span in entry['spans']] == ['rpc', 'rpc', 'rpc', 'repo']
+    assert 'made 3 Firestore RPCs (limit 2)' in caplog.text
+
+
+def test_instrument_firestore_client_wraps_sync_and_async_methods():
+    class FakeApi:
+        def commit(self, request):
+            return 'committed'
+
+        def batch_get_documents(self, request):
+            return iter(['a', 'b'])
+
+        def run_aggregation_query(self, request):
+            yield 'partial'
+            raise RuntimeError('stream broke')
+
+        async def run_query(self, request):
+            async def rows():
+                yield 'row'
+            return rows()
+
+    class FakeClient:
+        _firestore_api = FakeApi()
+
+    client = FakeClient()
+    assert tracing.instrument_firestore_client(client)
+    tracing.instrument_firestore_client(client)  # idempotent
+
+    async def read_rows():
+        return [row async for row in await client._firestore_api.run_query({})]
+
+    trace = tracing.RequestTrace('POST', '/test')
+    token = tracing._current.set(trace)
+    try:
+        assert client._firestore_api.commit({}) == 'committed'
+        docs = client._firestore_api.batch_get_documents({})
+        assert next(docs) == 'a'
+        assert [span.name for span in trace.spans] == ['commit']  # the stream is still open
+        assert list(docs) == ['b']
+        assert asyncio.run(read_rows()) == ['row']
+        with pytest.raises(RuntimeError):
+            list(client._firestore_api.run_aggregation_query({}))
+    finally:
+        tracing._current.reset(token)
+    assert [(span.name, span.outcome) for span in trace.spans] == [
+        ('commit', 'ok'), ('batch_get_documents', 'ok'), ('run_query', 'ok'), ('run_aggregation_query', 'error')]
@@ -0,0 +1,294 @@
+"""
+Request-scoped tracing of repository calls and Firestore RPCs.
+
+TracingMiddleware starts a RequestTrace for every HTTP request and keeps it
+in a context variable, which Starlette carries into the threadpool that runs
+the sync endpoints. Two kinds of spans are recorded into it:
+
+  repo  every call of a repository function decorated with
+        metrics.firestore_op (get_loan_for_user, update_loan_for_user, ...)
+  rpc   every Firestore round trip: the methods of the Firestore gapic
+        client (instrument_firestore_client) or the equivalent entry points
+        of local_store (traced_rpc). Server-streaming RPCs (run_query, ...)
+        end when their response stream is exhausted, fails or is closed.
+
+Every RPC is also reported to the on_rpc() listeners (metrics), inside a
+request or not, with the repository function whose code made it.
+
+At the end of the request the trace is
+
+  - summarized in Server-Timing and X-Firestore-Rpcs response headers when
+    SAVKAR_TRACE_HEADERS=1 (browser dev tools show Server-Timing),
+  - appended as one JSON line with all spans to SAVKAR_TRACE_FILE, if set,
+  - logged as a warning when it made more than SAVKAR_TRACE_MAX_RPCS
+    Firestore RPCs (default 25, 0 disables the alarm).
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADERS = os.getenv("SAVKAR_TRACE_HEADERS", "0") == "1"
+TRACE_FILE = os.getenv("SAVKAR_TRACE_FILE") or None
+MAX_RPCS = int(os.getenv("SAVKAR_TRACE_MAX_RPCS", "25"))
+
+# The trace is also stored in the ASGI scope for outer middleware (metrics)
+SCOPE_KEY = 'savkar.trace'
+
+# Methods of the Firestore gapic client that are one round trip each
+FIRESTORE_RPCS = (
+    'batch_get_documents', 'get_document', 'run_query', 'run_aggregation_query', 'list_documents',
+    'list_collection_ids', 'commit', 'batch_write', 'begin_transaction', 'rollback',
+)
+# Those of them that return a stream of responses rather than one response
+STREAMING_RPCS = frozenset({'batch_get_documents', 'run_query', 'run_aggregation_query'})
+
+_file_lock = threading.Lock()
+
+
+def route_template(scope) -> str:
+    """Path template of the route the router matched ("/loans/{loan_id}")"""
+    route = scope.get('route')
+    return getattr(route, 'path_format', None) or getattr(route, 'path', None) or 'unmatched'
+
+
+class Span:
+    __slots__ = ('kind', 'name', 'start', 'duration', 'outcome')
+
+    def __init__(self, kind: str, name: str, start: float, duration: float, outcome: str):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.outcome = outcome
+
+
+class RequestTrace:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started = time.perf_counter()
+        self.duration = None
+        # list.append is atomic, so bulk-write threads can share the trace
+        self.spans: List[Span] = []
+
+    def add(self, kind: str, name: str, started: float, outcome: str = 'ok'):
+        self.spans.append(Span(kind, name, started - self.started, time.perf_counter() - started, outcome))
+
+    def _spans(self, kind: str) -> List[Span]:
+        return [span for span in self.spans if span.kind == kind]
+
+    @property
+    def rpc_count(self) -> int:
+        return len(self._spans('rpc'))
+
+    def summary(self) -> Dict[str, Any]:
+        rpcs = self._spans('rpc')
+        repo = self._spans('repo')
+        return {
+            'method': self.method,
+            'route': self.route or self.path,
+            'status': self.status,
+            'ms': round((self.duration or 0) * 1000, 2),
+            'rpcs': len(rpcs),
+            'rpc_ms': round(sum(span.duration for span in rpcs) * 1000, 2),
+            'rpc_calls': dict(Counter(span.name for span in rpcs)),
+            'repo_calls': dict(Counter(span.name for span in repo)),
+        }
+
+    def export(self) -> Dict[str, Any]:
+        entry = self.summary()
+        entry['path'] = self.path
+        entry['spans'] = [
+            {'kind': span.kind, 'name': span.name, 'start_ms': round(span.start * 1000, 3),
+             'ms': round(span.duration * 1000, 3), 'outcome': span.outcome}
+            for span in self.spans
+        ]
+        return entry
+
+    def server_timing(self) -> str:
+        rpcs = self._spans('rpc')
+        repo = self._spans('repo')
+        rpc_ms = sum(span.duration for span in rpcs) * 1000
+        repo_ms = sum(span.duration for span in repo) * 1000
+        return (f'repo;dur={repo_ms:.1f};desc="{len(repo)} calls", '
+                f'firestore;dur={rpc_ms:.1f};desc="{len(rpcs)} RPCs"')
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar('savkar_request_trace', default=None)
+# Innermost repository function running in this context, to attribute RPCs to
+_function: ContextVar[Optional[str]] = ContextVar('savkar_repo_function', default=None)
+# Called with (function, rpc, outcome) after every Firestore RPC
+_rpc_listeners: List[Callable[[Optional[str], str, str], None]] = []
+
+
+def current() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+def record(kind: str, name: str, started: float, outcome: str = 'ok'):
+    """Add a span that began at perf_counter() `started` to the current trace, if any"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(kind, name, started, outcome)
+
+
+def enter_function(name: str):
+    """Attribute the RPCs made until exit_function(token) to repository function `name`"""
+    return _function.set(name)
+
+
+def exit_function(token):
+    _function.reset(token)
+
+
+def on_rpc(listener: Callable[[Optional[str], str, str], None]):
+    """Call listener(function, rpc, outcome) after every Firestore RPC"""
+    _rpc_listeners.append(listener)
+
+
+def _rpc_done(trace: Optional[RequestTrace], function: Optional[str], name: str, started: float,
+              outcome: str = 'ok'):
+    # The trace is passed in: a stream may be finished outside the request's context
+    if trace is not None:
+        trace.add('rpc', name, started, outcome)
+    for listener in _rpc_listeners:
+        listener(function, name, outcome)
+
+
+def _traced_stream(stream, trace, function, name: str, started: float):
+    outcome = 'error'
+    try:
+        yield from stream
+        outcome = 'ok'
+    except GeneratorExit:
+        outcome = 'ok'  # the caller stopped reading early
+        raise
+    finally:
+        _rpc_done(trace, function, name, started, outcome)
+
+
+async def _traced_async_stream(stream, trace, function, name: str, started: float):
+    outcome = 'error'
+    try:
+        async for response in stream:
+            yield response
+        outcome = 'ok'
+    except GeneratorExit:
+        outcome = 'ok'
+        raise
+    finally:
+        _rpc_done(trace, function, name, started, outcome)
+
+
+def _traced(func, name: str, streaming: bool = False):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = _current.get()
+        if trace is None and not _rpc_listeners:
+            return func(*args, **kwargs)
+        function = _function.get()
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            _rpc_done(trace, function, name, started, 'error')
+            raise
+        if not inspect.isawaitable(result):
+            if streaming:
+                return _traced_stream(result, trace, function, name, started)
+            _rpc_done(trace, function, name, started)
+            return result
+
+        async def finish():
+            try:
+                value = await result
+            except Exception:
+                _rpc_done(trace, function, name, started, 'error')
+                raise
+            if streaming:
+                return _traced_async_stream(value, trace, function, name, started)
+            _rpc_done(trace, function, name, started)
+            return value
+        return finish()
+    return wrapper
+
+
+def traced_rpc(name: str):
+    """Decorator recording each call as one Firestore RPC named `name`"""
+    return lambda func: _traced(func, name)
+
+
+def instrument_firestore_client(client) -> bool:
+    """Record the RPCs of a google-cloud-firestore (Async)Client; the gapic
+    client is created once per Firestore client and reused for every call"""
+    try:
+        api = client._firestore_api
+    except Exception as e:
+        logger.debug(f"Firestore client not instrumented: {e}")
+        return False
+    for name in FIRESTORE_RPCS:
+        method = getattr(api, name, None)
+        if method is not None and not hasattr(method, '__wrapped__'):
+            setattr(api, name, _traced(method, name, streaming=name in STREAMING_RPCS))
+    return True
+
+
+def _finish(trace: RequestTrace):
+    if MAX_RPCS and trace.rpc_count > MAX_RPCS:
+        summary = trace.summary()
+        logger.warning(f"{trace.method} {summary['route']} made {summary['rpcs']} Firestore RPCs "
+                       f"(limit {MAX_RPCS}): {summary['repo_calls']}", extra={'trace': summary})
+    if TRACE_FILE:
+        line = json.dumps(trace.export(), default=str)
+        try:
+            with _file_lock, open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            logger.error(f"Error writing trace to {TRACE_FILE}: {e}")
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces each HTTP request (see module docstring)"""
+
+    def __init__(self, app, headers: bool = None):
+        self.app = app
+        self.headers = TRACE_HEADERS if headers is None else headers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope['method'], scope['path'])
+        scope[SCOPE_KEY] = trace
+        token = _current.set(trace)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                trace.status = message['status']
+                if self.headers:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', trace.server_timing().encode('latin-1')))
+                    headers.append((b'x-firestore-rpcs', str(trace.rpc_count).encode('latin-1')))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            trace.route = route_template(scope)
+            trace.duration = time.perf_counter() - trace.started
+            _finish(trace)
@@ -58,11 +58,7 @@ const CustomerProfile = () => {
   useEffect(() => {
     const fetchLoan = async () => {
       try {
-        const savkarUserId = "savkar_user_001";
-        const loans = await ApiService.getMyLoans(savkarUserId);
-
-        const loan = loans.find((loan) => loan.id === id);
-        if (!loan) throw new Error("Loan not found");
+        const loan = await ApiService.getLoan(id);
 
         setSelectedLoan(loan);
 
@@ -101,11 +97,16 @@ const CustomerProfile = () => {
         const loanDocuments = await ApiService.getDocumentsByLoanId(id);
         setDocuments(loanDocuments);
 
-        setPaymentRecords(
-          loan.paymentRecords || [
-            { id: Date.now(), date: "", amount: "", status: "Paid", note: "" },
-          ]
-        );
+        // Recorded payments are read-only; loans not yet migrated to the
+        // ledger still carry them in paymentRecords
+        const payments = await ApiService.getLoanPayments(id);
+        const recorded = (payments.length ? payments : loan.paymentRecords || [])
+          .filter((r) => r.amount || r.date)
+          .map((r) => ({ ...r, note: r.note || "", saved: true }));
+        setPaymentRecords([
+          ...recorded,
+          { id: Date.now(), date: "", amount: "", status: "Paid", note: "" },
+        ]);
       } catch (err) {
         console.error("Error fetching loan:", err);
         setError("Failed to load borrower profile, using dummy data...");
@@ -130,7 +131,7 @@ const CustomerProfile = () => {
   const downloadProfileImage = () => {
     if (!profileFormData.profilePhoto) return;
     const link = document.createElement("a");
-    link.href = profileFormData.profilePhoto;
+    link.href = ApiService.resolveFileUrl(profileFormData.profilePhoto);
     link.download = `${selectedLoan.borrowerName}-profile.jpg`;
     link.click();
   };
@@ -264,7 +265,6 @@ const CustomerProfile = () => {
         purava: profileFormData.purava || "N/A",
         permanentAddress: profileFormData.permanentAddress,
         jamindars: profileFormData.jamindars || [], // Ensure jamindars is always an array
-        paymentRecords: paymentRecords, // Add this line
       };
 
       console.log("Saving profile with data:", profileData);
@@ -277,19 +277,30 @@ const CustomerProfile = () => {
         await ApiService.createLoanProfile(selectedLoan.id, profileData);
       }
 
-      // Calculate total paid amount from payment records
-      const totalPaid = paymentRecords
-        .filter((r) => r.status === "Paid" && r.amount)
-        .reduce((sum, r) => sum + parseFloat(r.amount || 0), 0);
-
-      // Save loan data with payment records
-      const updatedData = {
-        ...selectedLoan,
-        paidAmount: totalPaid, // Update paid amount based on payment records
-        paymentRecords: paymentRecords, // Include payment records in the update
-      };
-
-      await ApiService.updateLoan(selectedLoan.id, updatedData);
+      // Append new payments; the server updates the loan's paid amount and status
+      const saved = [];
+      for (const record of paymentRecords) {
+        if (record.saved || !record.amount || !record.date) continue;
+        const receipt = await ApiService.createLoanPayment(selectedLoan.id, {
+          amount: parseFloat(record.amount),
+          date: record.date,
+          status: record.status,
+          note: record.note || null,
+        });
+        saved.push({ ...receipt.payment, note: receipt.payment.note || "", saved: true });
+        setSelectedLoan((prev) => ({
+          ...prev,
+          paidAmount: receipt.paidAmount,
+          status: receipt.status,
+        }));
+      }
+      if (saved.length) {
+        setPaymentRecords([
+          ...paymentRecords.filter((r) => r.saved),
+          ...saved,
+          { id: Date.now(), date: "", amount: "", status: "Paid", note: "" },
+        ]);
+      }
       alert("Profile updated successfully!");
     } catch (err) {
       console.error(err);
@@ -307,6 +318,11 @@ const CustomerProfile = () => {
     return content && content.startsWith("data:image/");
   };
 
+  const isImageDocument = (doc) =>
+    isImageDataUrl(doc.fileContent) ||
+    (doc.mimeType || "").startsWith("image/") ||
+    isImageFile(doc.fileName || doc.name);
+
   const handleViewDocument = (document) => setViewingDocument(document);
   const closeDocumentModal = () => setViewingDocument(null);
 
@@ -336,7 +352,7 @@ const CustomerProfile = () => {
             <div className="position-relative d-inline-block mb-3">
               <img
                 src={
-                  profileFormData.profilePhoto ||
+                  ApiService.resolveFileUrl(profileFormData.profilePhoto) ||
                   `https://ui-avatars.com/api/?name=${encodeURIComponent(
                     selectedLoan.borrowerName || "User"
                   )}&background=0D8ABC&color=fff&size=120`
@@ -747,6 +763,7 @@ const CustomerProfile = () => {
                       <input
                         type="date"
                         className="form-control"
+                        disabled={record.saved}
                         value={record.date}
                         onChange={(e) =>
                           handlePaymentChange(record.id, "date", e.target.value)
@@ -757,6 +774,7 @@ const CustomerProfile = () => {
                       <input
                         type="number"
                         className="form-control"
+                        disabled={record.saved}
                         value={record.amount}
                         onChange={(e) =>
                           handlePaymentChange(
@@ -770,6 +788,7 @@ const CustomerProfile = () => {
                     <td>
                       <select
                         className="form-select"
+                        disabled={record.saved}
                         value={record.status}
                         onChange={(e) =>
                           handlePaymentChange(
@@ -786,6 +805,7 @@ const CustomerProfile = () => {
                     <td>
                       <textarea
                         className="form-control"
+                        disabled={record.saved}
                         rows="1"
                         value={record.note}
                         onChange={(e) =>
@@ -796,6 +816,7 @@ const CustomerProfile = () => {
                     <td className="text-center">
                       <button
                         className="btn btn-danger btn-sm"
+                        disabled={record.saved}
                         onClick={() => handleDeletePaymentRow(record.id)}
                       >
                         −
@@ -878,11 +899,10 @@ const CustomerProfile = () => {
                       <td>{doc.name}</td>
                       <td>{doc.type}</td>
                       <td>
-                        {doc.fileContent &&
-                        (isImageDataUrl(doc.fileContent) ||
-                          isImageFile(doc.fileName || doc.name)) ? (
+                        {ApiService.documentFileUrl(doc) &&
+                        isImageDocument(doc) ? (
                           <img
-                            src={doc.fileContent}
+                            src={ApiService.documentFileUrl(doc)}
                             alt={doc.name}
                             className="document-preview"
                             onClick={() => handleViewDocument(doc)}
@@ -902,7 +922,7 @@ const CustomerProfile = () => {
                           className="btn btn-sm btn-light-primary me-1"
                           onClick={() => {
                             const link = document.createElement("a");
-                            link.href = doc.fileContent;
+                            link.href = ApiService.documentFileUrl(doc);
                             link.download = doc.fileName || doc.name;
                             link.click();
                           }}
@@ -960,11 +980,11 @@ const CustomerProfile = () => {
                 ></button>
               </div>
               <div className="modal-body text-center">
-                {viewingDocument.fileContent ? (
+                {ApiService.documentFileUrl(viewingDocument) ? (
                   <>
-                    {isImageDataUrl(viewingDocument.fileContent) ? (
+                    {isImageDocument(viewingDocument) ? (
                       <img
-                        src={viewingDocument.fileContent}
+                        src={ApiService.documentFileUrl(viewingDocument)}
                         alt={viewingDocument.name}
                         className="document-viewer-image"
                         style={{ maxWidth: "100%", maxHeight: "70vh" }}
@@ -1001,7 +1021,7 @@ const CustomerProfile = () => {
                   className="btn btn-primary"
                   onClick={() => {
                     const link = document.createElement("a");
-                    link.href = viewingDocument.fileContent;
+                    link.href = ApiService.documentFileUrl(viewingDocument);
                     link.download =
                       viewingDocument.fileName || viewingDocument.name;
                     link.click();
@@ -3,7 +3,7 @@ import ApiService from "../services/apiService";
 import * as XLSX from "xlsx";
 
 const Dashboard = () => {
-  const [allLoans, setAllLoans] = useState([]); // Store all loans data
+  const [allLoans, setAllLoans] = useState([]); // Loans with a due date in the selected range
   const [loans, setLoans] = useState([]); // For display purposes
   const [stats, setStats] = useState({
     totalLoans: 0,
@@ -45,9 +45,6 @@ const Dashboard = () => {
           pendingAmount: dashboardData.pendingAmount,
         });
 
-        const loansData = await ApiService.getAllLoans();
-        setAllLoans(loansData);
-        setLoans(loansData);
       } catch (err) {
         console.error("Dashboard: Error fetching data:", err);
         setError("Failed to load dashboard data. Please try again later.");
@@ -59,36 +56,28 @@ const Dashboard = () => {
     fetchData();
   }, []);
 
-  const getDueDate = (loan) => {
-    if (loan.status === "Closed") return null;
-    if (!loan.startDate) return null;
-
-    const start = new Date(loan.startDate);
-    const current = new Date();
-    const currentMonth = current.getMonth();
-    const currentYear = current.getFullYear();
-
-    // Check if the start date was the last day of its month
-    const lastDayOfStartMonth = new Date(
-      start.getFullYear(),
-      start.getMonth() + 1,
-      0
-    ).getDate();
-
-    const isLastDayOfMonth = start.getDate() === lastDayOfStartMonth;
-
-    // Generate due date for the current month
-    let dueDate;
-    if (isLastDayOfMonth) {
-      // If start date was last day → due date = last day of current month
-      dueDate = new Date(currentYear, currentMonth + 1, 0);
-    } else {
-      // Otherwise, keep same day number, but in current month/year
-      dueDate = new Date(currentYear, currentMonth, start.getDate());
-    }
-
-    return dueDate;
-  };
+  // Due dates are computed and stored by the server on every loan write
+  const getDueDate = (loan) =>
+    loan.nextDueDate ? new Date(loan.nextDueDate) : null;
+
+  // The server filters by due date and returns list summaries (no photos,
+  // jamindars or payment records), so only what the table shows is downloaded
+  useEffect(() => {
+    const fetchDueLoans = async () => {
+      try {
+        const loansData = await ApiService.getDueLoans({
+          from: fromDate,
+          to: toDate,
+        });
+        setAllLoans(loansData);
+      } catch (err) {
+        console.error("Dashboard: Error fetching due loans:", err);
+        setError("Failed to load dashboard data. Please try again later.");
+      }
+    };
+
+    fetchDueLoans();
+  }, [fromDate, toDate]);
 
   // Helper: calculate EMI
   const calculateEMI = (loan) => {
@@ -98,22 +87,9 @@ const Dashboard = () => {
       : 0;
   };
 
-  // Filter + Sort
+  // Sort
   useEffect(() => {
-    const filtered = allLoans.filter((loan) => {
-      const dueDate = getDueDate(loan);
-      if (!fromDate && !toDate) return true;
-      if (!dueDate) return false;
-      const from = fromDate ? new Date(fromDate) : null;
-      const to = toDate ? new Date(toDate) : null;
-
-      if (from && to) return dueDate >= from && dueDate <= to;
-      if (from) return dueDate >= from;
-      if (to) return dueDate <= to;
-      return true;
-    });
-
-    const sorted = [...filtered].sort((a, b) => {
+    const sorted = [...allLoans].sort((a, b) => {
       const dueA = getDueDate(a);
       const dueB = getDueDate(b);
 
@@ -126,7 +102,7 @@ const Dashboard = () => {
 
     setLoans(sorted);
     setCurrentPage(1); // reset to page 1 on filter/sort change
-  }, [allLoans, fromDate, toDate, sortOrder]);
+  }, [allLoans, sortOrder]);
 
   // Pagination logic
   const totalPages = Math.ceil(loans.length / recordsPerPage);
@@ -46,7 +46,7 @@ const LegalNotices = () => {
 
   const loadBorrowers = async () => {
     try {
-      const borrowersData = await ApiService.getAllLoans();
+      const borrowersData = await ApiService.getAllLoanSummaries();
       setBorrowers(borrowersData || []);
     } catch (error) {
       console.error("Error loading borrowers:", error);
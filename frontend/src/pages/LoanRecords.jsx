@@ -6,11 +6,12 @@ import "./LoanRecords.css";
 const LoanRecords = () => {
   const navigate = useNavigate();
 
-  // State for loan management
+  // State for loan management: one page of loans at a time
   const [loans, setLoans] = useState([]);
-  const [filteredLoans, setFilteredLoans] = useState([]);
+  const [searchResults, setSearchResults] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState("all");
+  const [totalLoans, setTotalLoans] = useState(0);
   const [showAddModal, setShowAddModal] = useState(false);
   const [editingLoan, setEditingLoan] = useState(null);
   const [formData, setFormData] = useState({
@@ -30,27 +31,31 @@ const LoanRecords = () => {
   const [error, setError] = useState(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [rowsPerPage, setRowsPerPage] = useState(10);
-  const totalPages = Math.ceil((filteredLoans?.length || 0) / rowsPerPage);
+  // pageCursors[i] fetches page i + 1; the server returns the next one with each page
+  const [pageCursors, setPageCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  // Slice data for current page
-  const currentLoans = filteredLoans?.slice(
-    (currentPage - 1) * rowsPerPage,
-    currentPage * rowsPerPage
-  );
+  const currentLoans = searchResults ?? loans;
 
   const handlePageChange = (page) => {
-    if (page >= 1 && page <= totalPages) setCurrentPage(page);
+    if (page < 1 || page > pageCursors.length) return;
+    if (page === pageCursors.length && !nextCursor) return;
+    loadLoans(page);
   };
 
   useEffect(() => {
-    loadLoans();
-  }, []);
+    loadLoans(1);
+  }, [statusFilter, rowsPerPage]);
 
   useEffect(() => {
-    filterLoans();
-  }, [loans, searchTerm, statusFilter]);
+    let cancelled = false;
+    filterLoans(() => cancelled);
+    return () => {
+      cancelled = true;
+    };
+  }, [searchTerm, statusFilter]);
 
-  const loadLoans = async () => {
+  const loadLoans = async (page = currentPage) => {
     setLoading(true);
     setError(null);
     try {
@@ -65,13 +70,28 @@ const LoanRecords = () => {
         return;
       }
 
-      // Use the savkar user ID
-      const savkarUserId = "savkar_user_001";
-      const res = await ApiService.getMyLoans(savkarUserId);
-
-      let loansData = Array.isArray(res) ? res : res?.data ?? [];
+      // Newest first; the status filter and paging run in Firestore. The list only
+      // needs the summary fields, the profile page fetches the full record
+      const cursors = page === 1 ? [null] : pageCursors;
+      const result = await ApiService.getLoanSummariesPage({
+        limit: rowsPerPage,
+        cursor: cursors[page - 1],
+        status: statusFilter !== "all" ? statusFilter : undefined,
+        orderBy: "-createdAt",
+      });
+      const loansData = Array.isArray(result.loans) ? result.loans : [];
       setLoans(loansData);
-      setFilteredLoans(loansData);
+      setNextCursor(result.nextCursor);
+      setPageCursors(
+        result.nextCursor ? [...cursors.slice(0, page), result.nextCursor] : cursors.slice(0, page)
+      );
+      setCurrentPage(page);
+
+      // The dashboard aggregates hold the loan count, no need to fetch every loan
+      const summary = await ApiService.getDashboardSummary();
+      setTotalLoans(
+        (summary.activeRecords || 0) + (summary.pendingRecords || 0) + (summary.closingRecords || 0)
+      );
     } catch (error) {
       console.error("LoanRecords: Error loading loans:", error);
 
@@ -97,7 +117,7 @@ const LoanRecords = () => {
         setError(`Failed to load loans: ${msg}`);
       }
       setLoans([]);
-      setFilteredLoans([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
@@ -130,18 +150,19 @@ const LoanRecords = () => {
         return;
       }
       let anySynced = 0;
-      for (let i = 0; i < localLoans.length; i++) {
-        const loan = localLoans[i];
-        // Skip if already marked as synced
-        if (loan.synced) continue;
-        try {
-          // Use global create loan endpoint
-          await ApiService.createLoan(loan);
-          localLoans[i].synced = true;
-          anySynced++;
-        } catch (e) {
-          console.warn("Sync loan failed for", loan, e);
-        }
+      // Skip loans already marked as synced and upload the rest in one request
+      const pending = localLoans.filter((loan) => !loan.synced);
+      if (pending.length > 0) {
+        const result = await ApiService.createLoansBulk(pending);
+        pending.forEach((loan, i) => {
+          if (result.ids[i]) {
+            loan.synced = true;
+            anySynced++;
+          }
+        });
+        result.errors.forEach(({ row, errors }) => {
+          console.warn("Sync loan failed for", pending[row - 1], errors);
+        });
       }
       // Persist back the synced flags
       window.localStorage.setItem("loan_records", JSON.stringify(localLoans));
@@ -153,26 +174,34 @@ const LoanRecords = () => {
     }
   };
 
-  const filterLoans = () => {
-    let filtered = loans;
-
-    if (searchTerm) {
-      filtered = filtered.filter((loan) => {
-        const name = (loan.borrowerName || loan.customerName || "")
-          .toString()
-          .toLowerCase();
-        const phone = (loan.phoneNumber || loan.customerPhone || "").toString();
-        return (
-          name.includes(searchTerm.toLowerCase()) || phone.includes(searchTerm)
-        );
-      });
+  const filterLoans = async (isCancelled = () => false) => {
+    if (!searchTerm.trim()) {
+      setSearchResults(null);
+      return;
     }
 
+    let filtered;
+    try {
+      // Ranked server-side search over the indexed name prefixes and phone suffixes
+      filtered = await ApiService.searchLoans(searchTerm.trim(), 200);
+    } catch (e) {
+      console.warn("Server search failed, filtering the current page", e);
+      filtered = loans.filter(matchesSearch);
+    }
+    if (isCancelled()) return;
+
     if (statusFilter !== "all") {
       filtered = filtered.filter((loan) => loan.status === statusFilter);
     }
+    setSearchResults(filtered);
+  };
 
-    setFilteredLoans(filtered);
+  const matchesSearch = (loan) => {
+    const name = (loan.borrowerName || loan.customerName || "")
+      .toString()
+      .toLowerCase();
+    const phone = (loan.phoneNumber || loan.customerPhone || "").toString();
+    return name.includes(searchTerm.toLowerCase()) || phone.includes(searchTerm);
   };
 
   const handleSubmit = async (e) => {
@@ -299,7 +328,7 @@ const LoanRecords = () => {
           <h5>Error Loading Loans</h5>
           <p>{error}</p>
           <div className="mt-3">
-            <button className="btn btn-primary me-2" onClick={loadLoans}>
+            <button className="btn btn-primary me-2" onClick={() => loadLoans()}>
               Retry Loading Loans
             </button>
             <button
@@ -350,7 +379,7 @@ const LoanRecords = () => {
         <div className="card p-2">
           <div className="d-flex align-items-center justify-content-around">
             <h6 className="text-muted">TOTAL LOANS</h6>
-            <h3 className="ms-4">{loans.length}</h3>
+            <h3 className="ms-4">{totalLoans}</h3>
           </div>
         </div>
         <button
@@ -534,14 +563,14 @@ const LoanRecords = () => {
           </div>
         </div>
 
-        {/* Pagination */}
-        {totalPages > 1 && (
+        {/* Pagination: forward through X-Next-Cursor, back through the cursors already seen */}
+        {!searchResults && (currentPage > 1 || nextCursor) && (
           <div className="card-footer d-flex justify-content-between align-items-center py-2">
             <div className="d-flex align-items-center gap-3">
               <small className="text-muted">
                 Showing {(currentPage - 1) * rowsPerPage + 1}–
-                {Math.min(currentPage * rowsPerPage, filteredLoans.length)} of
-                {filteredLoans.length} entries
+                {(currentPage - 1) * rowsPerPage + loans.length}
+                {statusFilter === "all" ? ` of ${totalLoans}` : ""} entries
               </small>
 
               <div className="d-flex align-items-center">
@@ -551,8 +580,8 @@ const LoanRecords = () => {
                   style={{ width: "80px" }}
                   value={rowsPerPage}
                   onChange={(e) => {
+                    // Reloads from the first page
                     setRowsPerPage(Number(e.target.value));
-                    setCurrentPage(1); // Reset to first page when rows per page changes
                   }}
                 >
                   <option value="5">5</option>
@@ -577,7 +606,7 @@ const LoanRecords = () => {
                   </button>
                 </li>
 
-                {[...Array(totalPages)].map((_, i) => (
+                {pageCursors.map((_, i) => (
                   <li
                     key={i}
                     className={`page-item ${
@@ -593,11 +622,7 @@ const LoanRecords = () => {
                   </li>
                 ))}
 
-                <li
-                  className={`page-item ${
-                    currentPage === totalPages ? "disabled" : ""
-                  }`}
-                >
+                <li className={`page-item ${!nextCursor ? "disabled" : ""}`}>
                   <button
                     className="page-link"
                     onClick={() => handlePageChange(currentPage + 1)}
@@ -77,6 +77,47 @@ class ApiService {
     return Array.isArray(response) ? response : [];
   }
 
+  // One page of loans; filters: { limit, cursor, status, loanType, orderBy, fields }
+  static async getLoansPage(params = {}) {
+    return this.fetchPage('/loans', params);
+  }
+
+  // One page of list-screen summaries (no photo, jamindars or payment records)
+  static async getLoanSummariesPage(params = {}) {
+    return this.fetchPage('/loans/summary', params);
+  }
+
+  static async fetchPage(path, params) {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== null && value !== '')
+    );
+    const response = await fetch(`${API_BASE_URL}${path}?${query}`);
+    if (!response.ok) {
+      throw new Error(`API Error: ${response.status} ${response.statusText}`);
+    }
+    return {
+      loans: await response.json(),
+      nextCursor: response.headers.get('X-Next-Cursor'),
+    };
+  }
+
+  // Every loan as a summary, following the server's cursors
+  static async getAllLoanSummaries() {
+    const loans = [];
+    let cursor = null;
+    do {
+      const page = await this.getLoanSummariesPage({ limit: 500, cursor });
+      loans.push(...page.loans);
+      cursor = page.nextCursor;
+    } while (cursor);
+    return loans;
+  }
+
+  // Full record of one loan, for the detail view
+  static async getLoan(loanId) {
+    return this.request(`/loans/${loanId}`);
+  }
+
   static async createLoan(loanData) {
     return this.request('/loans', {
       method: 'POST',
@@ -84,6 +125,14 @@ class ApiService {
     });
   }
 
+  // Returns { created, failed, ids, errors: [{ row, errors }] }; ids[i] is null for failed rows
+  static async createLoansBulk(loans) {
+    return this.request('/loans/bulk', {
+      method: 'POST',
+      body: loans,
+    });
+  }
+
   static async updateLoan(loanId, loanData) {
     return this.request(`/loans/${loanId}`, {
       method: 'PUT',
@@ -97,13 +146,84 @@ class ApiService {
     });
   }
 
-  static async updatePaidAmount(loanId, paidAmount) {
+  // With expectedVersion (the loan's `version`), the server answers 409 if the loan changed since
+  static async updatePaidAmount(loanId, paidAmount, expectedVersion = null) {
     return this.request(`/loans/${loanId}/paid-amount`, {
       method: 'PUT',
-      body: { paidAmount },
+      body: expectedVersion == null ? { paidAmount } : { paidAmount, expectedVersion },
+    });
+  }
+
+  // Loans by next due date (server-side range query); from/to are YYYY-MM-DD
+  static async getDueLoans({ from, to, overdue } = {}) {
+    const loans = [];
+    let cursor = null;
+    do {
+      const query = new URLSearchParams({ limit: '500' });
+      if (from) query.set('from', from);
+      if (to) query.set('to', to);
+      if (overdue) query.set('overdue', 'true');
+      if (cursor) query.set('cursor', cursor);
+      const response = await fetch(`${API_BASE_URL}/loans/due?${query}`);
+      if (!response.ok) {
+        throw new Error(`API Error: ${response.status} ${response.statusText}`);
+      }
+      loans.push(...(await response.json()));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return loans;
+  }
+
+  // Ranked borrower search by name prefix or last digits of the phone number
+  static async searchLoans(q, limit = 20) {
+    const query = new URLSearchParams({ q, limit: String(limit) });
+    return this.request(`/loans/search?${query}`);
+  }
+
+  // Server-side schedules; method is 'emi', 'interest_only' or 'daily'
+  static async getLoanSchedule(loanId, method = 'emi') {
+    return this.request(`/loans/${loanId}/schedule?method=${method}`);
+  }
+
+  static async getPortfolioProjection(method = 'emi') {
+    return this.request(`/portfolio/projection?method=${method}`);
+  }
+
+  // Payment ledger: payments are appended one at a time, never rewritten
+  static async getLoanPayments(loanId) {
+    const payments = [];
+    let cursor = null;
+    do {
+      const query = new URLSearchParams({ limit: '500' });
+      if (cursor) query.set('cursor', cursor);
+      const response = await fetch(`${API_BASE_URL}/loans/${loanId}/payments?${query}`);
+      if (!response.ok) {
+        throw new Error(`API Error: ${response.status} ${response.statusText}`);
+      }
+      payments.push(...(await response.json()));
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return payments;
+  }
+
+  // Returns { payment, paidAmount, status } with the loan totals after the payment
+  static async createLoanPayment(loanId, payment) {
+    return this.request(`/loans/${loanId}/payments`, {
+      method: 'POST',
+      body: payment,
     });
   }
 
+  // Files and photos kept in the backend blob store come back as /blobs/<hash> paths
+  static resolveFileUrl(value) {
+    return value && value.startsWith('/blobs/') ? `${API_BASE_URL}${value}` : value;
+  }
+
+  static documentFileUrl(doc) {
+    if (doc.fileContent) return doc.fileContent;
+    return doc.fileHash ? `${API_BASE_URL}/documents/${doc.id}/file` : '';
+  }
+
   // Documents (Global endpoints - NO UID required)
   static async getDocumentsByLoanId(loanId) {
     const response = await this.request(`/loans/${loanId}/documents`);
@@ -9,6 +9,9 @@ export interface Document {
   // Add file-related fields
   fileContent?: string; // Base64 encoded file content
   fileName?: string;    // Original file name
+  fileHash?: string;    // SHA-256 of the file in the backend blob store
+  fileSize?: number;    // Bytes
+  mimeType?: string;
 }
 
 export interface LoanRecord {
@@ -29,6 +32,7 @@ export interface LoanRecord {
   profilePhoto?: string; // Base64 encoded image
   occupation?: string;
   address?: string;
+  version?: number;     // Bumped by every write; send as expectedVersion for conditional updates
 }
 
 export interface LegalNotice {